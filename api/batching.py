@@ -0,0 +1,77 @@
+# api/batching.py
+import asyncio
+from concurrent.futures import Executor
+
+
+class MicroBatcher:
+    """把同時到達的請求合併成一批，交給同步的批次函式在執行緒池中處理。
+
+    第一個項目到達後最多等待 max_wait 秒或湊滿 max_size 個項目就送出；
+    一次只處理一批，處理期間到達的項目會自然累積成下一批。
+    """
+    def __init__(self, batch_fn, executor: Executor, max_size: int, max_wait: float):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, item):
+        """送出單一項目並等待它在批次中的結果。"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.batch_fn, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue else 0
+        }
@@ -0,0 +1,359 @@
+# api/server.py
+"""事實查核 HTTP API：在 FactChecker 外包一層非同步服務，與 Streamlit 介面分開部署。
+
+用法：
+    python -m api.server --host 127.0.0.1 --port 8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from aiohttp import web
+
+# 將專案根目錄加入 sys.path，以便匯入其他模組
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api.batching import MicroBatcher
+from knowledge_base.metadata_filters import normalize_filters, filters_key
+from reasoning.fact_checker import FactChecker
+from utils import telemetry
+from utils.serialization import json_default
+from utils.config import (
+    API_HOST,
+    API_PORT,
+    API_WORKER_THREADS,
+    API_MAX_CONCURRENT_CHECKS,
+    API_BATCH_MAX_SIZE,
+    API_BATCH_MAX_WAIT_MS,
+    API_JOB_TTL_SECONDS,
+    API_MAX_JOBS
+)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+_dumps = partial(json.dumps, ensure_ascii=False, default=json_default)
+
+
+def _json_response(request: web.Request, data: dict, status: int = 200) -> web.Response:
+    return web.json_response({"request_id": request["request_id"], **data}, status=status, dumps=_dumps)
+
+
+def _bad_request(request: web.Request, message: str) -> web.Response:
+    return _json_response(request, {"error": message}, status=400)
+
+
+@web.middleware
+async def request_id_middleware(request: web.Request, handler):
+    """沿用呼叫端提供的請求 ID，沒有時自動產生，並回傳在標頭中方便追蹤。"""
+    request["request_id"] = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+    response = await handler(request)
+    # 串流回應的標頭已在 prepare 時送出
+    if not response.prepared:
+        response.headers[REQUEST_ID_HEADER] = request["request_id"]
+    return response
+
+
+class FactCheckService:
+    """持有 FactChecker 與服務狀態：執行緒池、檢索的微批次處理器與非同步查核工作。"""
+    def __init__(self, fact_checker: FactChecker):
+        self.fact_checker = fact_checker
+        self.executor = ThreadPoolExecutor(max_workers=API_WORKER_THREADS, thread_name_prefix="api")
+        self.retriever = MicroBatcher(self._retrieve_batch, self.executor, API_BATCH_MAX_SIZE, API_BATCH_MAX_WAIT_MS / 1000)
+        self.check_slots = None
+        self.jobs = {}
+
+    async def start(self, app: web.Application):
+        self.check_slots = asyncio.Semaphore(API_MAX_CONCURRENT_CHECKS)
+        self.retriever.start()
+
+    async def stop(self, app: web.Application):
+        await self.retriever.stop()
+        for job in self.jobs.values():
+            if job.get("task"):
+                job["task"].cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def in_thread(self, fn, *args):
+        # 工作執行緒沿用目前請求的 Trace
+        return await asyncio.get_running_loop().run_in_executor(self.executor, telemetry.bind(fn), *args)
+
+    def _retrieve_batch(self, items: list[tuple[str, int, dict | None]]) -> list[tuple[list[dict], int]]:
+        """合併多個請求的主張一起檢索，回傳每個主張的 (證據, 預篩前的證據數)；k 或過濾條件不同的主張分組處理。
+
+        批次在沒有 Trace 的執行緒中執行，計數交由各請求以 FactChecker.count_evidence 記錄。
+        """
+        results = [None] * len(items)
+        groups = {}
+        for i, (claim, k, filters) in enumerate(items):
+            groups.setdefault((k, filters_key(filters)), []).append(i)
+        for indices in groups.values():
+            _, k, filters = items[indices[0]]
+            evidence, retrieved = self.fact_checker.search_evidence_batch([items[i][0] for i in indices], k, filters)
+            for i, claim_evidence, claim_retrieved in zip(indices, evidence, retrieved):
+                results[i] = (claim_evidence, claim_retrieved)
+        return results
+
+    async def retrieve(self, claims: list[str], k: int, filters: dict | None = None) -> tuple[list[list[dict]], list[int]]:
+        """回傳 (每個主張的證據, 每個主張預篩前的證據數)，格式同 FactChecker.search_evidence_batch。"""
+        results = await asyncio.gather(*(self.retriever.submit((claim, k, filters)) for claim in claims))
+        return [evidence for evidence, _ in results], [retrieved for _, retrieved in results]
+
+    async def knowledge_base_ready(self) -> bool:
+        return bool(await self.in_thread(lambda: self.fact_checker.collection))
+
+    async def run_check(self, query: str, emit=None, filters: dict | None = None, k: int = 5) -> dict:
+        """與 FactChecker.check 相同的流程（FactChecker.run_pipeline），但檢索與其他並行請求合併成批次。
+
+        提供 emit 時，各階段的事件（格式同 FactChecker.check_stream）會從工作執行緒中以 emit 送出；
+        filters 須已由 normalize_filters 整理過。
+        """
+        loop = asyncio.get_running_loop()
+
+        def retrieve(claims: list[str], k: int, filters: dict | None) -> tuple[list[list[dict]], list[int]]:
+            # 在工作執行緒中等待事件迴圈上的微批次處理器
+            return asyncio.run_coroutine_threadsafe(self.retrieve(claims, k, filters), loop).result()
+
+        with telemetry.start_trace("fact_check") as trace:
+            with telemetry.span("queue_wait"):
+                await self.check_slots.acquire()
+            try:
+                result = await self.in_thread(self.fact_checker.run_pipeline, query, emit, filters, k, retrieve)
+            finally:
+                self.check_slots.release()
+        if "error" not in result:
+            result["telemetry"] = trace.to_dict()
+        return result
+
+    def _evict_jobs(self):
+        now = time.time()
+        expired = [
+            request_id for request_id, job in self.jobs.items()
+            if job["status"] in ("done", "error") and now - job["finished_at"] > API_JOB_TTL_SECONDS
+        ]
+        for request_id in expired:
+            del self.jobs[request_id]
+
+    def submit_check(self, request_id: str, query: str, filters: dict | None = None, k: int = 5) -> dict | None:
+        """建立非同步查核工作；工作數已達上限時回傳 None。"""
+        self._evict_jobs()
+        if len(self.jobs) >= API_MAX_JOBS:
+            return None
+        job = {"status": "pending", "created_at": time.time(), "finished_at": None, "result": None, "error": None}
+        self.jobs[request_id] = job
+
+        async def run():
+            job["status"] = "running"
+            try:
+                job["result"] = await self.run_check(query, filters=filters, k=k)
+                job["status"] = "done"
+            except Exception as e:
+                job["error"] = f"{type(e).__name__}: {e}"
+                job["status"] = "error"
+            finally:
+                job["finished_at"] = time.time()
+                job.pop("task", None)
+
+        job["task"] = asyncio.create_task(run())
+        return job
+
+    @staticmethod
+    def job_view(job: dict) -> dict:
+        return {key: job[key] for key in ("status", "created_at", "finished_at", "result", "error") if job[key] is not None}
+
+
+def _service(request: web.Request) -> FactCheckService:
+    return request.app["service"]
+
+
+async def _read_json(request: web.Request) -> dict | None:
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def _read_filters(body: dict) -> dict | None:
+    """讀取請求中選填的 "filters" 欄位（date_from、date_to、source、status）；格式錯誤時拋出 ValueError。"""
+    return normalize_filters(body.get("filters"))
+
+
+def _read_k(body: dict) -> int:
+    """讀取請求中選填的 "k" 欄位（每個主張的證據數）；格式錯誤時拋出 ValueError。"""
+    k = body.get("k", 5)
+    if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= 50:
+        raise ValueError("Field 'k' must be an integer between 1 and 50.")
+    return k
+
+
+async def health(request: web.Request) -> web.Response:
+    service = _service(request)
+    jobs = {}
+    for job in service.jobs.values():
+        jobs[job["status"]] = jobs.get(job["status"], 0) + 1
+    return _json_response(request, {
+        **service.fact_checker.health(),
+        "retrieval_batching": service.retriever.stats(),
+        "jobs": jobs
+    })
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """GET /metrics：Prometheus 文字格式的各階段耗時直方圖與計數器。"""
+    return web.Response(text=telemetry.metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+
+async def extract_claims(request: web.Request) -> web.Response:
+    """POST /v1/claims {"text": ..., "rewrite": true}"""
+    body = await _read_json(request)
+    if not body or not isinstance(body.get("text"), str) or not body["text"].strip():
+        return _bad_request(request, "Field 'text' must be a non-empty string.")
+    service = _service(request)
+    text = body["text"]
+    if body.get("rewrite", True):
+        text, claims = await service.in_thread(service.fact_checker.understand_query, text)
+    else:
+        claims = await service.in_thread(service.fact_checker.extract_claims, text)
+    return _json_response(request, {"rewritten_query": text, "claims": claims})
+
+
+async def retrieve(request: web.Request) -> web.Response:
+    """POST /v1/retrieve {"claims": [...], "k": 5, "filters": {...}}；只做檢索，不呼叫 LLM。"""
+    body = await _read_json(request)
+    claims = body.get("claims") if body else None
+    if isinstance(claims, str):
+        claims = [claims]
+    if not claims or not all(isinstance(claim, str) and claim.strip() for claim in claims):
+        return _bad_request(request, "Field 'claims' must be a non-empty list of strings.")
+    try:
+        k = _read_k(body)
+        filters = _read_filters(body)
+    except ValueError as e:
+        return _bad_request(request, str(e))
+    service = _service(request)
+    if not await service.knowledge_base_ready():
+        return _json_response(request, {"error": "Knowledge base not available."}, status=503)
+    evidence_per_claim, retrieved_per_claim = await service.retrieve(claims, k, filters)
+    service.fact_checker.count_evidence(evidence_per_claim, retrieved_per_claim)
+    return _json_response(request, {
+        "results": [{"claim": claim, "evidence": evidence} for claim, evidence in zip(claims, evidence_per_claim)]
+    })
+
+
+async def check(request: web.Request) -> web.Response:
+    """POST /v1/check {"query": ..., "wait": false, "k": 5, "filters": {...}}
+
+    預設立即回傳 202 與請求 ID，之後以 GET /v1/check/{request_id} 取得結果；wait 為 true 時同步等待結果。
+    """
+    body = await _read_json(request)
+    if not body or not isinstance(body.get("query"), str) or not body["query"].strip():
+        return _bad_request(request, "Field 'query' must be a non-empty string.")
+    try:
+        k = _read_k(body)
+        filters = _read_filters(body)
+    except ValueError as e:
+        return _bad_request(request, str(e))
+    service = _service(request)
+    if body.get("wait", False):
+        result = await service.run_check(body["query"], filters=filters, k=k)
+        return _json_response(request, {"status": "done", "result": result})
+
+    request_id = request["request_id"]
+    if request_id in service.jobs:
+        return _json_response(request, {"error": "Duplicate request ID."}, status=409)
+    job = service.submit_check(request_id, body["query"], filters, k)
+    if job is None:
+        return _json_response(request, {"error": "Too many pending checks."}, status=503)
+    return _json_response(request, {"status": job["status"], "status_url": f"/v1/check/{request_id}"}, status=202)
+
+
+async def check_stream(request: web.Request) -> web.StreamResponse:
+    """POST /v1/check/stream {"query": ..., "k": 5, "filters": {...}}
+
+    以 NDJSON 逐行回傳查核過程的事件（格式同 FactChecker.check_stream），最後一行是 "result" 或 "error" 事件。
+    """
+    body = await _read_json(request)
+    if not body or not isinstance(body.get("query"), str) or not body["query"].strip():
+        return _bad_request(request, "Field 'query' must be a non-empty string.")
+    try:
+        k = _read_k(body)
+        filters = _read_filters(body)
+    except ValueError as e:
+        return _bad_request(request, str(e))
+    service = _service(request)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(event: dict):
+        # 事件可能來自工作執行緒，交回事件迴圈處理
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    async def run():
+        try:
+            result = await service.run_check(body["query"], emit, filters, k)
+            if "error" in result:
+                emit({"type": "error", "error": result["error"]})
+            else:
+                emit({"type": "result", "result": result})
+        except Exception as e:
+            emit({"type": "error", "error": f"{type(e).__name__}: {e}"})
+
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson", REQUEST_ID_HEADER: request["request_id"]})
+    await response.prepare(request)
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            event = await events.get()
+            await response.write((_dumps({"request_id": request["request_id"], **event}) + "\n").encode("utf-8"))
+            if event["type"] in ("result", "error"):
+                break
+    finally:
+        if not task.done():
+            task.cancel()
+    await response.write_eof()
+    return response
+
+
+async def check_status(request: web.Request) -> web.Response:
+    """GET /v1/check/{request_id}"""
+    job = _service(request).jobs.get(request.match_info["request_id"])
+    if job is None:
+        return _json_response(request, {"error": "Unknown request ID."}, status=404)
+    # 回傳的 request_id 是被查詢的工作，而不是這次輪詢請求本身
+    request["request_id"] = request.match_info["request_id"]
+    return _json_response(request, FactCheckService.job_view(job))
+
+
+def create_app(fact_checker: FactChecker | None = None) -> web.Application:
+    service = FactCheckService(fact_checker or FactChecker())
+    app = web.Application(middlewares=[request_id_middleware])
+    app["service"] = service
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_post("/v1/claims", extract_claims)
+    app.router.add_post("/v1/retrieve", retrieve)
+    app.router.add_post("/v1/check", check)
+    app.router.add_post("/v1/check/stream", check_stream)
+    app.router.add_get("/v1/check/{request_id}", check_status)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事實查核 HTTP API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# benchmarks/bench_alignment.py
+"""證據比對基準測試：以同一批檢索結果比較逐一比對 ("per_pair") 與批次 prompt ("batched") 兩種 ALIGNMENT_MODE
+的 LLM 呼叫次數、prompt / 生成 token 數、耗時與判決準確率。
+
+知識庫建立在暫存目錄中（預設使用 sample_data/mock_tfc_data.json），主張取自文章標題，
+標準答案由標題開頭的【查核結果】決定（錯誤、部分錯誤為 False，正確、事實為 True，其他不計入準確率）；
+也可用 --claims 指定 JSONL：{"claim": ..., "verdict": "True" | "False"}。
+兩種模式使用相同的證據，並停用 LLM 快取，每次比對都實際送往 Ollama。
+--stand-in 改用 load_test_api.py 的 Ollama 替身，此時只有呼叫次數、token 數與耗時有意義。
+
+用法：
+    python benchmarks/bench_alignment.py --output alignment.json
+    python benchmarks/bench_alignment.py --stand-in --hashing-embeddings
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, '..'))
+# 將專案根目錄與基準測試目錄加入 sys.path，以便匯入其他模組
+sys.path.append(ROOT_DIR)
+sys.path.append(BENCHMARK_DIR)
+
+from bench_retrieval import MOCK_DATA_PATH, build_knowledge_base, claim_from_title, load_templates, make_fact_checker, _git_revision
+from utils import config, telemetry
+
+ALIGNMENT_MODES = ("per_pair", "batched")
+# 標題開頭的查核結果對應到判決的標準答案
+GOLD_VERDICTS = {"錯誤": "False", "部分錯誤": "False", "正確": "True", "事實": "True"}
+
+
+def labeled_claims(articles: list[dict]) -> list[dict]:
+    claims = []
+    for article in articles:
+        match = re.match(r'^【([^】]*)】', article.get('title') or '')
+        claims.append({"claim": claim_from_title(article.get('title') or ''),
+                       "verdict": GOLD_VERDICTS.get(match.group(1)) if match else None})
+    return [item for item in claims if item["claim"]]
+
+
+def load_claims(path: str) -> list[dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def start_stand_in(latency: float) -> str:
+    """在背景執行緒的事件迴圈中啟動 Ollama 替身，回傳它的網址。"""
+    from load_test_api import OllamaStandIn, _free_port
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="ollama-stand-in", daemon=True).start()
+    port = _free_port()
+    asyncio.run_coroutine_threadsafe(OllamaStandIn(latency).start(port), loop).result()
+    return f"http://127.0.0.1:{port}"
+
+
+def pair_labels(alignments_per_claim: list[list[dict]]) -> dict[tuple[int, str], str]:
+    """(主張索引, 證據 ID) -> 比對標籤。"""
+    return {(i, alignment['evidence']['id']): alignment.get('label')
+            for i, alignments in enumerate(alignments_per_claim) for alignment in alignments}
+
+
+def run_mode(fact_checker, mode: str, labeled: list[dict], evidence_per_claim: list[list[dict]]) -> dict:
+    claims = [item['claim'] for item in labeled]
+    fact_checker.alignment_mode = mode
+    with contextlib.redirect_stdout(io.StringIO()), telemetry.start_trace("alignment_benchmark") as trace:
+        start = time.perf_counter()
+        alignments_per_claim, skipped_per_claim = fact_checker.align_claims(claims, evidence_per_claim)
+        seconds = time.perf_counter() - start
+    verdicts = [fact_checker.claim_result(claim, evidence_list, alignments, skipped)["final_verdict"]
+                for claim, evidence_list, alignments, skipped in zip(claims, evidence_per_claim, alignments_per_claim, skipped_per_claim)]
+    graded = [(verdict, item['verdict']) for verdict, item in zip(verdicts, labeled) if item.get('verdict')]
+    counters = trace.counters
+    return {
+        "seconds": seconds,
+        "ms_per_claim": seconds * 1000 / max(len(claims), 1),
+        "llm_calls": counters.get("llm_calls", 0),
+        "llm_errors": counters.get("llm_errors", 0),
+        "llm_pairs": counters.get("alignment_llm_pairs", 0),
+        "batch_fallbacks": counters.get("alignment_batch_fallbacks", 0),
+        "skipped_alignments": sum(skipped_per_claim),
+        "prompt_tokens": counters.get("llm_prompt_tokens", 0),
+        "completion_tokens": counters.get("llm_completion_tokens", 0),
+        "tokens_per_claim": (counters.get("llm_prompt_tokens", 0) + counters.get("llm_completion_tokens", 0)) / max(len(claims), 1),
+        "graded_claims": len(graded),
+        "verdict_accuracy": sum(verdict == gold for verdict, gold in graded) / len(graded) if graded else None,
+        "verdicts": verdicts,
+        "pair_labels": pair_labels(alignments_per_claim)
+    }
+
+
+def agreement(baseline: dict, result: dict) -> dict:
+    """相對於逐一比對的判決一致率，以及兩者都有結果的配對的標籤一致率。"""
+    verdicts = sum(a == b for a, b in zip(baseline["verdicts"], result["verdicts"])) / max(len(baseline["verdicts"]), 1)
+    shared = baseline["pair_labels"].keys() & result["pair_labels"].keys()
+    labels = sum(baseline["pair_labels"][key] == result["pair_labels"][key] for key in shared) / len(shared) if shared else None
+    return {"verdict_agreement": verdicts, "label_agreement": labels, "shared_pairs": len(shared)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--claims", help="標註好的主張 JSONL：{\"claim\": ..., \"verdict\": \"True\" | \"False\"}")
+    parser.add_argument("--data", default=MOCK_DATA_PATH, help="知識庫文章（JSON 陣列）")
+    parser.add_argument("--hashing-embeddings", action="store_true", help="以雜湊假向量取代嵌入模型")
+    parser.add_argument("--stand-in", action="store_true", help="以本機的 Ollama 替身取代真正的模型")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="替身每次回應的平均延遲（秒）")
+    parser.add_argument("--output", help="把結果寫成 JSON 檔；未指定時輸出到標準輸出")
+    args = parser.parse_args()
+
+    if args.hashing_embeddings:
+        from bench_indexing_memory import HashingEmbeddings
+        embedding_function = HashingEmbeddings(config.EMBEDDING_DIMENSION)
+    else:
+        from knowledge_base.indexing import get_embedding_function
+        embedding_function = get_embedding_function()
+
+    articles = load_templates(args.data)
+    labeled = load_claims(args.claims) if args.claims else labeled_claims(articles)
+
+    with tempfile.TemporaryDirectory(prefix="bench_alignment_") as workdir:
+        collection, lexical_index, vector_index, stats = build_knowledge_base(workdir, articles, embedding_function)
+        fact_checker = make_fact_checker(collection, lexical_index, embedding_function, vector_index)
+        # 停用快取，兩種模式的每次比對都實際呼叫 LLM
+        fact_checker.llm_cache = None
+        if args.stand_in:
+            import ollama
+            from reasoning.components import LazyComponent
+            host = start_stand_in(args.llm_latency)
+            fact_checker._components["llm_client"] = LazyComponent("Ollama client", lambda: ollama.Client(host=host))
+        with contextlib.redirect_stdout(io.StringIO()):
+            evidence_per_claim = fact_checker.retrieve_evidence_batch([item['claim'] for item in labeled], args.k)
+        print(f"Indexed {stats['articles']} articles / {collection.count()} chunks; aligning {len(labeled)} claims "
+              f"against {sum(map(len, evidence_per_claim))} evidence chunks", file=sys.stderr)
+        results = {mode: run_mode(fact_checker, mode, labeled, evidence_per_claim) for mode in ALIGNMENT_MODES}
+
+    results["batched"]["vs_per_pair"] = agreement(results["per_pair"], results["batched"])
+    for result in results.values():
+        result["pair_labels"] = len(result["pair_labels"])
+    report = {
+        "revision": _git_revision(),
+        "config": {"k": args.k, "model": "stand-in" if args.stand_in else config.OLLAMA_MODEL,
+                   "early_exit": config.ALIGNMENT_EARLY_EXIT, "llm_max_concurrency": config.LLM_MAX_CONCURRENCY,
+                   "prescreen": config.PRESCREEN_ENABLED},
+        "claims": len(labeled),
+        "results": results
+    }
+
+    header = f"{'mode':>8} | {'LLM calls':>9} | {'prompt tok':>10} | {'compl tok':>9} | {'tok/claim':>9} | {'seconds':>7} | {'fallbacks':>9} | {'accuracy':>8}"
+    print(header, file=sys.stderr)
+    print("-" * len(header), file=sys.stderr)
+    for mode, result in results.items():
+        accuracy = f"{result['verdict_accuracy']:.3f}" if result['verdict_accuracy'] is not None else "n/a"
+        print(f"{mode:>8} | {result['llm_calls']:>9} | {result['prompt_tokens']:>10} | {result['completion_tokens']:>9} | "
+              f"{result['tokens_per_claim']:>9.0f} | {result['seconds']:>7.2f} | {result['batch_fallbacks']:>9} | {accuracy:>8}", file=sys.stderr)
+    vs = results["batched"]["vs_per_pair"]
+    label_agreement = f"{vs['label_agreement']:.3f}" if vs['label_agreement'] is not None else "n/a"
+    print(f"batched vs per_pair: verdict agreement {vs['verdict_agreement']:.3f}, "
+          f"label agreement {label_agreement} over {vs['shared_pairs']} pairs", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# benchmarks/bench_ann.py
+"""近似最近鄰搜尋基準測試：比較 Chroma HNSW（不同 ef_search）與量化向量索引（int8 / float16、不同重新評分倍數）
+相對於精確搜尋的 recall@k 與單一查詢延遲。
+
+預設使用目前的知識庫：語料為 collection 中的所有向量，查詢為文章標題的嵌入向量。
+--synthetic 則建立暫時的 collection，以分群的隨機向量模擬較大的語料。
+
+用法：
+    python benchmarks/bench_ann.py --k 5 --ef-search 10 20 50 100 200
+    python benchmarks/bench_ann.py --synthetic 50000 --queries 200
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# 將專案根目錄加入 sys.path，以便匯入其他模組
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import chromadb
+
+from knowledge_base.article_store import ArticleStore
+from knowledge_base.vector_index import QuantizedVectorIndex, hnsw_configuration
+from utils.config import CHROMA_PATH, COLLECTION_NAME, EMBEDDING_DIMENSION
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def load_corpus(collection, page_size: int = 5000) -> tuple[list[str], np.ndarray]:
+    ids, vectors = [], []
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        ids.extend(page['ids'])
+        vectors.append(np.asarray(page['embeddings'], dtype=np.float32))
+    return ids, np.concatenate(vectors)
+
+
+def title_queries(n: int) -> np.ndarray:
+    from knowledge_base.indexing import get_embedding_function
+    titles = [article['title'] for article in ArticleStore() if article.get('title')][:n]
+    return np.asarray(get_embedding_function().embed_documents(titles), dtype=np.float32)
+
+
+def synthetic_collection(client, n: int, dimension: int, n_queries: int, seed: int = 0):
+    """以分群的高斯向量建立 collection，查詢為語料向量加上雜訊。"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(n // 200, 1), dimension)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.normal(size=(n, dimension)).astype(np.float32)
+    ids = [f"synthetic-{i}" for i in range(n)]
+    collection = client.create_collection(name="ann_benchmark", embedding_function=None, configuration=hnsw_configuration())
+    for start in range(0, n, 5000):
+        collection.add(ids=ids[start:start + 5000], embeddings=vectors[start:start + 5000])
+    queries = vectors[rng.integers(n, size=n_queries)] + 0.3 * rng.normal(size=(n_queries, dimension)).astype(np.float32)
+    return collection, queries
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    if space == "cosine":
+        corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    dots = queries @ corpus.T
+    dist = (corpus * corpus).sum(axis=1)[None, :] - 2 * dots if space == "l2" else -dots
+    return np.argsort(dist, axis=1, kind="stable")[:, :k]
+
+
+def evaluate(search_one, queries: np.ndarray, truth: list[set[str]], k: int) -> tuple[float, float, float]:
+    """逐一查詢，回傳 (recall@k, 平均延遲 ms, p95 延遲 ms)。"""
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = search_one(query)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len(expected & set(found[:k])) / len(expected))
+    return float(np.mean(recalls)), float(np.mean(latencies) * 1000), float(np.percentile(latencies, 95) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 50, 100, 200])
+    parser.add_argument("--dtypes", nargs="+", default=["int8", "float16"], choices=["int8", "float16"])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 1, 2, 4, 8], help="重新評分的候選倍數，0 表示不重新評分")
+    parser.add_argument("--synthetic", type=int, help="改用指定數量的合成向量建立暫時的 collection")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ann_bench_")
+    try:
+        if args.synthetic:
+            client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+            start = time.perf_counter()
+            collection, queries = synthetic_collection(client, args.synthetic, EMBEDDING_DIMENSION, args.queries)
+            print(f"Built synthetic collection with {args.synthetic} vectors in {time.perf_counter() - start:.1f}s "
+                  f"({_dir_size(os.path.join(workdir, 'chroma')) / 2**20:.1f} MiB on disk)")
+        else:
+            client = chromadb.PersistentClient(path=CHROMA_PATH)
+            collection = client.get_collection(name=COLLECTION_NAME)
+            queries = title_queries(args.queries)
+            print(f"Using {COLLECTION_NAME}: {collection.count()} vectors, {len(queries)} title queries "
+                  f"({_dir_size(CHROMA_PATH) / 2**20:.1f} MiB on disk)")
+
+        hnsw = collection.configuration["hnsw"]
+        space = hnsw["space"]
+        ids, corpus = load_corpus(collection)
+        k = min(args.k, len(ids))
+        truth = [{ids[i] for i in row} for row in exact_top_k(corpus, queries, k, space)]
+        print(f"space={space} M={hnsw['max_neighbors']} ef_construction={hnsw['ef_construction']} k={k}\n")
+
+        header = f"{'backend':<28} | {'recall@k':>8} | {'mean ms':>8} | {'p95 ms':>8}"
+        print(header)
+        print("-" * len(header))
+        original_ef = hnsw["ef_search"]
+        try:
+            for ef_search in args.ef_search:
+                collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+                search_one = lambda query: collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])['ids'][0]
+                recall, mean_ms, p95_ms = evaluate(search_one, queries, truth, k)
+                print(f"{f'chroma ef_search={ef_search}':<28} | {recall:>8.3f} | {mean_ms:>8.2f} | {p95_ms:>8.2f}")
+        finally:
+            collection.modify(configuration={"hnsw": {"ef_search": original_ef}})
+
+        for dtype in args.dtypes:
+            index = QuantizedVectorIndex(path=os.path.join(workdir, f"quantized_{dtype}"), dtype=dtype, space=space)
+            index.sync_with_collection(collection)
+            size = index.vectors.nbytes + index.sq_norms.nbytes + (index.scales.nbytes if index.scales is not None else 0)
+            print(f"-- {dtype}: {size / 2**20:.1f} MiB of vectors (float32 would be {corpus.nbytes / 2**20:.1f} MiB)")
+            for rescore in args.rescore:
+                search_one = lambda query: index.search(collection, query[None, :], k, rescore_factor=rescore)[0][0]
+                recall, mean_ms, p95_ms = evaluate(search_one, queries, truth, k)
+                label = f"{dtype} rescore x{rescore}" if rescore else f"{dtype} no rescore"
+                print(f"{label:<28} | {recall:>8.3f} | {mean_ms:>8.2f} | {p95_ms:>8.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
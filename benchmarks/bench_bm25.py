@@ -0,0 +1,88 @@
+# benchmarks/bench_bm25.py
+"""BM25 檢索延遲基準測試：比較不同語料規模下的評分方式。
+
+用法：
+    python benchmarks/bench_bm25.py --sizes 1000 10000 100000 --queries 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# 將專案根目錄加入 sys.path，以便匯入其他模組
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from knowledge_base.lexical_index import LexicalIndex
+from knowledge_base.text_processing import hash_words
+
+try:
+    from rank_bm25 import BM25Okapi
+except ImportError:
+    BM25Okapi = None
+
+
+def make_corpus(n_docs: int, vocab_size: int, rng: np.random.Generator) -> list[list[str]]:
+    """產生詞頻呈 Zipf 分布的合成語料。"""
+    lengths = rng.integers(50, 300, size=n_docs)
+    token_ids = rng.zipf(1.2, size=int(lengths.sum())) % vocab_size
+    corpus, start = [], 0
+    for length in lengths:
+        corpus.append([f"w{t}" for t in token_ids[start:start + length]])
+        start += length
+    return corpus
+
+
+def make_queries(n_queries: int, vocab_size: int, rng: np.random.Generator) -> list[list[str]]:
+    return [[f"w{t}" for t in rng.zipf(1.2, size=rng.integers(3, 12)) % vocab_size] for _ in range(n_queries)]
+
+
+def time_per_query(fn, queries) -> float:
+    start = time.perf_counter()
+    fn(queries)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--vocab", type=int, default=50000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    queries = make_queries(args.queries, args.vocab, rng)
+    header = f"{'docs':>8} | {'build s':>8} | {'rank_bm25':>10} | {'dense+sort':>10} | {'top_k':>8} | {'batch':>8}   (ms/query)"
+    print(header)
+    print("-" * len(header))
+
+    for n_docs in args.sizes:
+        corpus = make_corpus(n_docs, args.vocab, rng)
+        ids = [f"doc-{i}" for i in range(n_docs)]
+        with tempfile.TemporaryDirectory() as index_dir:
+            start = time.perf_counter()
+            index = LexicalIndex(index_dir)
+            index.add_documents(ids, [hash_words(doc) for doc in corpus])
+            build_seconds = time.perf_counter() - start
+
+            index = LexicalIndex(index_dir)
+            query_ids = [hash_words(q) for q in queries]
+            index.top_k(query_ids[0], args.k)  # 預熱記憶體映射
+
+            reference = "n/a"
+            if BM25Okapi is not None:
+                okapi = BM25Okapi(corpus)
+                reference = f"{time_per_query(lambda qs: [sorted(range(n_docs), key=okapi.get_scores(q).__getitem__, reverse=True)[:args.k] for q in qs], queries):10.2f}"
+
+            dense = time_per_query(lambda qs: [np.argsort(-index.get_scores(q))[:args.k] for q in qs], query_ids)
+            sparse = time_per_query(lambda qs: [index.top_k(q, args.k) for q in qs], query_ids)
+            batch = time_per_query(lambda qs: index.batch_top_k(qs, args.k), query_ids)
+
+        print(f"{n_docs:>8} | {build_seconds:>8.2f} | {reference:>10} | {dense:>10.2f} | {sparse:>8.2f} | {batch:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/bench_embedding_workers.py
+"""嵌入吞吐量基準測試：比較單一行程與不同工作行程數的每秒 chunk 數。
+
+以文章庫的 chunk 放大成指定數量後嵌入，工作池啟動（載入模型）的時間不計入吞吐量。
+
+用法：
+    python benchmarks/bench_embedding_workers.py --chunks 4000 --workers 1 2 4 8 --threads 1
+"""
+import argparse
+import os
+import sys
+import time
+
+# 將專案根目錄加入 sys.path，以便匯入其他模組
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from knowledge_base.embedding_pool import EmbeddingPool
+from utils.config import EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE
+from bench_tokenizer import load_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=4000)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--threads", type=int, default=1, help="每個工作行程的執行緒數")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.chunks)
+    print(f"{len(chunks)} chunks, model {args.model}, {os.cpu_count()} CPUs")
+    header = f"{'workers':>7} | {'threads':>7} | {'startup s':>9} | {'embed s':>8} | {'chunks/s':>9} | {'speedup':>7}"
+    print(header)
+    print("-" * len(header))
+
+    baseline = None
+    for workers in sorted(set(args.workers)):
+        start = time.perf_counter()
+        with EmbeddingPool(args.model, workers, args.batch_size, args.threads) as pool:
+            # 每個工作行程先編碼一個分片，確保模型都已載入
+            pool.embed(chunks[:workers * args.batch_size])
+            startup = time.perf_counter() - start
+            start = time.perf_counter()
+            vectors = pool.embed(chunks)
+            elapsed = time.perf_counter() - start
+        assert vectors.shape[0] == len(chunks)
+        throughput = len(chunks) / elapsed
+        baseline = baseline or throughput
+        print(f"{workers:>7} | {args.threads:>7} | {startup:>9.1f} | {elapsed:>8.1f} | {throughput:>9.0f} | {throughput / baseline:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# benchmarks/bench_indexing_memory.py
+"""建索引的記憶體基準測試：比較不同文章數下，串流流程與整批載入流程的峰值 RSS。
+
+每個規模都在獨立的子行程中執行，峰值 RSS 才不會互相影響。預設以雜湊產生的假向量
+取代嵌入模型，只量測流程本身；加上 --real-model 則使用 EMBEDDING_MODEL。
+
+用法：
+    python benchmarks/bench_indexing_memory.py --sizes 1000 5000 20000 --modes streaming in-memory
+"""
+import argparse
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# 將專案根目錄加入 sys.path，以便匯入其他模組
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from knowledge_base.article_store import ArticleStore
+
+
+class HashingEmbeddings:
+    """以文字雜湊為種子產生的固定向量，用來取代嵌入模型。"""
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+            vectors.append(np.random.default_rng(seed).standard_normal(self.dim, dtype=np.float32).tolist())
+        return vectors
+
+
+def write_synthetic_store(path: str, n_articles: int):
+    """以現有文章為範本產生 n_articles 篇內容各不相同的文章，逐篇寫入 JSON Lines。"""
+    templates = [article for article in ArticleStore() if article.get('content')]
+    if not templates:
+        raise SystemExit("No articles found in the article store to use as templates.")
+
+    def generate():
+        for i in range(n_articles):
+            template = templates[i % len(templates)]
+            yield {
+                **template,
+                "url": f"{template['url']}#synthetic-{i}",
+                "content": f"{template['content']} 第{i}篇。"
+            }
+
+    ArticleStore(path, legacy_path=None).append(generate())
+
+
+def run_worker(args):
+    """在子行程中建立一次索引，輸出一行 JSON 結果。"""
+    import chromadb
+    from knowledge_base.indexing import _apply_chunk_diff, chunk_documents, get_embedding_function, index_articles
+    from knowledge_base.lexical_index import LexicalIndex
+    from knowledge_base.text_processing import preprocess_documents
+
+    client = chromadb.PersistentClient(path=os.path.join(args.workdir, "chroma"))
+    collection = client.get_or_create_collection(name="bench_collection", embedding_function=None)
+    lexical_index = LexicalIndex(path=os.path.join(args.workdir, "lexical"))
+    embedding_function = get_embedding_function() if args.real_model else HashingEmbeddings(args.dim)
+    store = ArticleStore(args.store, legacy_path=None)
+
+    start = time.perf_counter()
+    if args.worker == "streaming":
+        # 合成文章彼此近似重複，關閉過濾才能與整份載入的做法比較相同的 chunk 數
+        stats = index_articles(store, full_rebuild=True, collection=collection,
+                               lexical_index=lexical_index, embedding_function=embedding_function, deduplicate=False)
+        n_chunks = stats["chunks"]
+    else:
+        # 原本的做法：整份文章載入記憶體、一次切完所有 chunk，再寫入
+        documents = preprocess_documents(list(store))
+        chunks, token_ids = chunk_documents(documents, lexical_index.tokenizer)
+        added, _ = _apply_chunk_diff(collection, chunks, None, embedding_function)
+        token_ids_by_id = {chunk.id: ids for chunk, ids in zip(chunks, token_ids)}
+        lexical_index.add_documents(
+            [chunk.id for chunk in added], [token_ids_by_id[chunk.id] for chunk in added], [chunk.metadata for chunk in added]
+        )
+        n_chunks = len(chunks)
+    elapsed = time.perf_counter() - start
+
+    # Linux 上 ru_maxrss 的單位是 KB
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print("RESULT " + json.dumps({"chunks": n_chunks, "seconds": elapsed, "peak_rss_mb": peak_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 5000, 20000])
+    parser.add_argument("--modes", nargs="+", default=["streaming", "in-memory"], choices=["streaming", "in-memory"])
+    parser.add_argument("--dim", type=int, default=64, help="假向量的維度")
+    parser.add_argument("--real-model", action="store_true", help="使用實際的嵌入模型")
+    parser.add_argument("--worker", choices=["streaming", "in-memory"], help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    header = f"{'articles':>9} | {'mode':>10} | {'chunks':>8} | {'seconds':>8} | {'peak RSS (MB)':>13}"
+    print(header)
+    print("-" * len(header))
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store_path = os.path.join(tmpdir, "articles.jsonl")
+            write_synthetic_store(store_path, size)
+            for mode in args.modes:
+                workdir = os.path.join(tmpdir, mode)
+                cmd = [sys.executable, os.path.abspath(__file__), "--worker", mode, "--store", store_path,
+                       "--workdir", workdir, "--dim", str(args.dim)]
+                if args.real_model:
+                    cmd.append("--real-model")
+                output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+                result = json.loads(next(line for line in output.splitlines() if line.startswith("RESULT "))[7:])
+                print(f"{size:>9} | {mode:>10} | {result['chunks']:>8} | {result['seconds']:>8.1f} | {result['peak_rss_mb']:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
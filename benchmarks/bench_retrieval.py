@@ -0,0 +1,271 @@
+# benchmarks/bench_retrieval.py
+"""檢索基準測試：以標註好的「主張 -> 文章」配對，比較純向量、純 BM25 與混合 RRF 檢索的
+延遲百分位數、吞吐量、記憶體與 recall@k / MRR，結果輸出為 JSON 方便追蹤回歸。
+
+知識庫建立在暫存目錄中：預設使用 sample_data/mock_tfc_data.json，
+--synthetic-chunks 則以這些文章為範本放大成指定的 chunk 數（每篇加上唯一的案例編號作為標註依據）。
+預設的主張取自文章標題（去掉【查核結果】前綴），也可用 --claims 指定 JSONL：{"claim": ..., "urls": [...]}。
+--hashing-embeddings 的假向量沒有語意，此時向量檢索的 recall 與 MRR 沒有意義，只適合量測延遲與記憶體。
+
+用法：
+    python benchmarks/bench_retrieval.py --output results.json
+    python benchmarks/bench_retrieval.py --synthetic-chunks 100000 --queries 500 --hashing-embeddings
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, '..'))
+# 將專案根目錄加入 sys.path，以便匯入其他模組
+sys.path.append(ROOT_DIR)
+
+from utils import config, telemetry
+
+MOCK_DATA_PATH = os.path.join(ROOT_DIR, "sample_data", "mock_tfc_data.json")
+MODES = ("vector", "bm25", "hybrid")
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status", 'r') as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 的單位是 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def claim_from_title(title: str) -> str:
+    """去掉標題開頭的【查核結果】，避免把答案洩漏給檢索。"""
+    return re.sub(r'^【[^】]*】', '', title).strip()
+
+
+def load_templates(path: str = MOCK_DATA_PATH) -> list[dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [article for article in json.load(f) if article.get('content')]
+
+
+def synthetic_articles(templates: list[dict], n_articles: int, seed: int = 0) -> list[dict]:
+    """以範本文章產生 n_articles 篇文章：句子順序打亂，標題與內文加上唯一的案例編號。"""
+    rng = np.random.default_rng(seed)
+    articles = []
+    for i in range(n_articles):
+        template = templates[i % len(templates)]
+        sentences = [s for s in re.split(r'(?<=[。！？])', template['content']) if s.strip()]
+        order = rng.permutation(len(sentences))
+        case = f"案例{i:07d}"
+        articles.append({
+            **template,
+            "url": f"{template['url']}#synthetic-{i}",
+            "title": f"{template['title']}（{case}）",
+            "content": f"{case}：" + "".join(sentences[j] for j in order)
+        })
+    return articles
+
+
+def labeled_claims(articles: list[dict], n: int | None, seed: int = 0) -> list[dict]:
+    """每篇文章的標題作為一個主張，相關文章就是它本身。"""
+    claims = [{"claim": claim_from_title(article['title']), "urls": [article['url']]} for article in articles if article.get('title')]
+    if n is not None and n < len(claims):
+        rng = np.random.default_rng(seed)
+        claims = [claims[i] for i in sorted(rng.choice(len(claims), size=n, replace=False))]
+    return claims
+
+
+def load_claims(path: str) -> list[dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_knowledge_base(workdir: str, articles: list[dict], embedding_function) -> tuple:
+    """在暫存目錄建立 Chroma collection 與 BM25 索引（VECTOR_BACKEND 為 "quantized" 時再加上量化索引），
+    回傳 (collection, lexical_index, vector_index, 索引統計)。"""
+    import chromadb
+    from knowledge_base.indexing import index_articles
+    from knowledge_base.lexical_index import LexicalIndex
+    from knowledge_base.vector_index import QuantizedVectorIndex, hnsw_configuration
+
+    client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+    collection = client.get_or_create_collection(name="bench_retrieval", embedding_function=None, configuration=hnsw_configuration())
+    lexical_index = LexicalIndex(path=os.path.join(workdir, "lexical"))
+    vector_index = QuantizedVectorIndex(path=os.path.join(workdir, "quantized")) if config.VECTOR_BACKEND == "quantized" else None
+    # 合成文章由同一批範本打亂句子而成，彼此近似重複，不做近似重複過濾
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = index_articles(articles, full_rebuild=True, collection=collection, lexical_index=lexical_index,
+                               embedding_function=embedding_function, vector_index=vector_index,
+                               deduplicate=False)
+    return collection, lexical_index, vector_index, stats
+
+
+def make_fact_checker(collection, lexical_index, embedding_function, vector_index=None):
+    """建立使用暫存知識庫的 FactChecker。"""
+    from reasoning.components import LazyComponent
+    from reasoning.fact_checker import FactChecker
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        fact_checker = FactChecker(startup="lazy")
+    fact_checker._components["vector_store"] = LazyComponent("ChromaDB", lambda: collection)
+    fact_checker._components["lexical_index"] = LazyComponent("BM25 index", lambda: lexical_index)
+    fact_checker._components["embedding_model"] = LazyComponent("embedding model", lambda: embedding_function)
+    if vector_index is not None:
+        fact_checker._components["vector_index"] = LazyComponent("quantized vector index", lambda: vector_index)
+    return fact_checker
+
+
+def retrieve(fact_checker, mode: str, claims: list[str], k: int) -> list[list[dict]]:
+    if mode == "vector":
+        return fact_checker._vector_search_batch(claims, k)
+    if mode == "bm25":
+        return fact_checker._lexical_search_batch(claims, k)
+    return fact_checker.retrieve_evidence_batch(claims, k)
+
+
+def score(evidence_per_claim: list[list[dict]], labeled: list[dict]) -> dict:
+    """recall@k：相關文章中至少有一個 chunk 出現在 top-k 的比例；MRR：第一個相關 chunk 排名的倒數平均。"""
+    recalls, reciprocal_ranks = [], []
+    for evidence, item in zip(evidence_per_claim, labeled):
+        relevant = set(item['urls'])
+        urls = [chunk['metadata'].get('url') for chunk in evidence]
+        recalls.append(len(relevant & set(urls)) / len(relevant))
+        rank = next((i + 1 for i, url in enumerate(urls) if url in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    return {"recall_at_k": float(np.mean(recalls)), "mrr": float(np.mean(reciprocal_ranks))}
+
+
+def run_mode(fact_checker, mode: str, labeled: list[dict], k: int, batch_size: int, repeat: int) -> dict:
+    """逐一查詢量測延遲百分位數，再以 batch_size 批次重播量測吞吐量。"""
+    claims = [item['claim'] for item in labeled]
+    rss_before = _rss_mb()
+    with contextlib.redirect_stdout(io.StringIO()):
+        # 暖機：載入元件與模型，不列入計時
+        retrieve(fact_checker, mode, claims[:1], k)
+        latencies = []
+        with telemetry.start_trace("retrieval_benchmark") as trace:
+            for _ in range(repeat):
+                # 清空主張嵌入的快取，每次重播都需要重新嵌入
+                fact_checker._embedding_cache.clear()
+                for claim in claims:
+                    start = time.perf_counter()
+                    retrieve(fact_checker, mode, [claim], k)
+                    latencies.append(time.perf_counter() - start)
+
+        fact_checker._embedding_cache.clear()
+        evidence_per_claim = []
+        start = time.perf_counter()
+        for offset in range(0, len(claims), batch_size):
+            evidence_per_claim.extend(retrieve(fact_checker, mode, claims[offset:offset + batch_size], k))
+        batch_seconds = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "queries": len(claims),
+        "latency_ms": {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(np.mean(latencies) * 1000)},
+        "throughput_qps": len(latencies) / sum(latencies),
+        "batched_throughput_qps": len(claims) / batch_seconds,
+        # 各階段在單一查詢中的平均耗時
+        "stage_ms_per_query": {name: stage["total_ms"] / len(latencies) for name, stage in trace.stages.items()},
+        "rss_mb": _rss_mb(),
+        "rss_delta_mb": _rss_mb() - rss_before,
+        **score(evidence_per_claim, labeled)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, help="抽樣的主張數（預設全部）")
+    parser.add_argument("--claims", help="標註好的主張 JSONL：{\"claim\": ..., \"urls\": [...]}")
+    parser.add_argument("--synthetic-chunks", type=int, help="以範本文章放大到大約這個 chunk 數")
+    parser.add_argument("--data", default=MOCK_DATA_PATH, help="範本文章（JSON 陣列）")
+    parser.add_argument("--hashing-embeddings", action="store_true", help="以雜湊假向量取代嵌入模型，只量測流程本身")
+    parser.add_argument("--dim", type=int, default=config.EMBEDDING_DIMENSION, help="假向量的維度")
+    parser.add_argument("--batch-size", type=int, default=32, help="量測吞吐量時每批的主張數")
+    parser.add_argument("--repeat", type=int, default=1, help="量測延遲時重播主張集的次數")
+    parser.add_argument("--output", help="把結果寫成 JSON 檔；未指定時輸出到標準輸出")
+    args = parser.parse_args()
+
+    if args.hashing_embeddings:
+        sys.path.append(BENCHMARK_DIR)
+        from bench_indexing_memory import HashingEmbeddings
+        embedding_function = HashingEmbeddings(args.dim)
+    else:
+        from knowledge_base.indexing import get_embedding_function
+        embedding_function = get_embedding_function()
+
+    articles = load_templates(args.data)
+    if args.synthetic_chunks:
+        from knowledge_base.indexing import chunk_documents
+        from knowledge_base.text_processing import get_tokenizer, preprocess_documents
+        chunks, _ = chunk_documents(preprocess_documents(articles), get_tokenizer())
+        n_articles = max(1, round(args.synthetic_chunks * len(articles) / max(len(chunks), 1)))
+        articles = synthetic_articles(articles, n_articles)
+    labeled = load_claims(args.claims) if args.claims else labeled_claims(articles, args.queries)
+
+    with tempfile.TemporaryDirectory(prefix="bench_retrieval_") as workdir:
+        start = time.perf_counter()
+        collection, lexical_index, vector_index, stats = build_knowledge_base(workdir, articles, embedding_function)
+        build_seconds = time.perf_counter() - start
+        print(f"Indexed {stats['articles']} articles / {collection.count()} chunks in {build_seconds:.1f}s; "
+              f"replaying {len(labeled)} claims with k={args.k}", file=sys.stderr)
+        fact_checker = make_fact_checker(collection, lexical_index, embedding_function, vector_index)
+        results = {mode: run_mode(fact_checker, mode, labeled, args.k, args.batch_size, args.repeat) for mode in args.modes}
+
+    report = {
+        "revision": _git_revision(),
+        "config": {
+            "k": args.k,
+            "tokenizer": lexical_index.tokenizer.signature,
+            "chunk_size": config.CHUNK_SIZE,
+            "chunk_overlap": config.CHUNK_OVERLAP,
+            "embedding_model": "hashing" if args.hashing_embeddings else config.EMBEDDING_MODEL,
+            "vector_backend": config.VECTOR_BACKEND,
+            "hnsw": {"space": config.HNSW_SPACE, "M": config.HNSW_M,
+                     "ef_construction": config.HNSW_EF_CONSTRUCTION, "ef_search": config.HNSW_EF_SEARCH}
+        },
+        "corpus": {"articles": stats["articles"], "chunks": collection.count(), "claims": len(labeled),
+                   "synthetic": bool(args.synthetic_chunks), "build_seconds": build_seconds},
+        "peak_rss_mb": _peak_rss_mb(),
+        "results": results
+    }
+
+    header = f"{'mode':>7} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | {'qps':>7} | {'batch qps':>9} | {'RSS MB':>7} | {'recall@k':>8} | {'MRR':>5}"
+    print(header, file=sys.stderr)
+    print("-" * len(header), file=sys.stderr)
+    for mode, result in results.items():
+        latency = result["latency_ms"]
+        print(f"{mode:>7} | {latency['p50']:>7.2f} | {latency['p95']:>7.2f} | {latency['p99']:>7.2f} | "
+              f"{result['throughput_qps']:>7.1f} | {result['batched_throughput_qps']:>9.1f} | {result['rss_mb']:>7.0f} | "
+              f"{result['recall_at_k']:>8.3f} | {result['mrr']:>5.3f}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_startup.py
+"""FactChecker 冷啟動基準測試：拆解匯入時間與各元件的載入時間，比較不同的啟動模式。
+
+每個模式都在新的子行程中執行，量到的是行程的冷啟動時間。
+
+用法：
+    python benchmarks/bench_startup.py --modes lazy background eager
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# 將專案根目錄加入 sys.path，以便匯入其他模組
+sys.path.append(ROOT_DIR)
+
+HEAVY_MODULES = ["numpy", "chromadb", "ollama", "langchain_community.embeddings", "sentence_transformers"]
+
+
+def run_worker(mode: str):
+    """在子行程中建立 FactChecker，輸出一行 JSON 結果。"""
+    start = time.perf_counter()
+    from reasoning.fact_checker import FactChecker
+    import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fact_checker = FactChecker(startup=mode)
+    construct_seconds = time.perf_counter() - start
+    fact_checker.wait_until_ready()
+    ready_seconds = time.perf_counter() - start
+
+    components = {name: status["seconds"] for name, status in fact_checker.health()["components"].items()}
+    print("RESULT " + json.dumps({
+        "import": import_seconds,
+        "construct": construct_seconds,
+        "ready": ready_seconds,
+        "components": components
+    }))
+
+
+def measure_import(module: str) -> float | None:
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT_DIR)
+    return float(result.stdout.strip().splitlines()[-1]) if result.returncode == 0 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["lazy", "background", "eager"], choices=["lazy", "background", "eager"])
+    parser.add_argument("--worker", choices=["lazy", "background", "eager"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+        return
+
+    print("Cold import time of heavy dependencies:")
+    for module in HEAVY_MODULES:
+        seconds = measure_import(module)
+        print(f"  {module:<32} " + (f"{seconds:6.2f}s" if seconds is not None else "not installed"))
+
+    print()
+    names = None
+    for mode in args.modes:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", mode],
+                                capture_output=True, text=True, check=True, cwd=ROOT_DIR).stdout
+        result = json.loads(next(line for line in output.splitlines() if line.startswith("RESULT "))[7:])
+        if names is None:
+            names = list(result["components"])
+            header = f"{'mode':>10} | {'import':>7} | {'construct':>9} | {'ready':>7} | " + " | ".join(f"{name:>15}" for name in names)
+            print(header)
+            print("-" * len(header))
+        components = " | ".join(f"{result['components'][name] or 0:>14.2f}s" for name in names)
+        print(f"{mode:>10} | {result['import']:>6.2f}s | {result['construct']:>8.2f}s | {result['ready']:>6.2f}s | {components}")
+
+
+if __name__ == "__main__":
+    main()
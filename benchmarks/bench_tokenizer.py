@@ -0,0 +1,60 @@
+# benchmarks/bench_tokenizer.py
+"""斷詞速度基準測試：以文章庫 (data/processed_articles.jsonl) 的 chunk 放大成指定規模後斷詞。
+
+用法：
+    python benchmarks/bench_tokenizer.py --chunks 100000 --tokenizers char_ngram jieba
+"""
+import argparse
+import os
+import sys
+import time
+
+# 將專案根目錄加入 sys.path，以便匯入其他模組
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from knowledge_base.text_processing import clean_text, get_tokenizer
+from knowledge_base.article_store import ArticleStore
+from utils.config import CHUNK_SIZE
+
+
+def load_chunks(n_chunks: int) -> list[str]:
+    """把現有文章依 CHUNK_SIZE 切塊，不足時重複使用以達到指定數量。"""
+    base = []
+    for article in ArticleStore():
+        content = clean_text(article.get('content', ''))
+        base.extend(content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE))
+    return [base[i % len(base)] for i in range(n_chunks)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--tokenizers", nargs="+", default=["char_ngram"])
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.chunks)
+    n_chars = sum(len(chunk) for chunk in chunks)
+    print(f"{len(chunks)} chunks, {n_chars / 1e6:.1f}M characters")
+    header = f"{'tokenizer':>16} | {'seconds':>8} | {'chunks/s':>10} | {'MB chars/s':>10} | {'tokens/chunk':>12}"
+    print(header)
+    print("-" * len(header))
+
+    candidates = [("str.split", lambda texts: [text.split() for text in texts])]
+    for name in args.tokenizers:
+        try:
+            tokenizer = get_tokenizer(name)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        candidates.append((name, lambda texts, t=tokenizer: [t.encode(text) for text in texts]))
+        candidates.append((f"{name} batch", tokenizer.encode_batch))
+
+    for name, encode_all in candidates:
+        start = time.perf_counter()
+        n_tokens = sum(len(token_ids) for token_ids in encode_all(chunks))
+        seconds = time.perf_counter() - start
+        print(f"{name:>16} | {seconds:>8.2f} | {len(chunks) / seconds:>10.0f} | {n_chars / seconds / 1e6:>10.2f} | {n_tokens / len(chunks):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
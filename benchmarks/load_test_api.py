@@ -0,0 +1,287 @@
+# benchmarks/load_test_api.py
+"""事實查核 API 負載測試：以本機的 Ollama 替身取代真正的模型，量測服務本身的延遲與吞吐量。
+
+替身實作 Ollama 的 /api/chat，依 prompt 類型回傳固定格式的回應並模擬推論延遲，
+同時記錄同時在途的請求數，用來確認 LLM_MAX_IN_FLIGHT 的上限有生效。
+stream 端點另外量測第一個主張判決送達的時間。
+API 服務在子行程中啟動並指向替身；知識庫（chroma_db 與 BM25 索引）需事先建立。
+
+用法：
+    python benchmarks/load_test_api.py --requests 200 --concurrency 32 --endpoint check
+    python benchmarks/load_test_api.py --requests 50 --concurrency 8 --endpoint stream
+    python benchmarks/load_test_api.py --url http://127.0.0.1:8000 --endpoint retrieve
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+from aiohttp import ClientSession, web
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# 將專案根目錄加入 sys.path，以便匯入其他模組
+sys.path.append(ROOT_DIR)
+
+from knowledge_base.article_store import ArticleStore
+
+
+class OllamaStandIn:
+    """模擬 Ollama /api/chat 的本機伺服器。"""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    def _reply(self, prompt: str) -> str:
+        if "證據列表 (Evidence List)" in prompt:
+            count = len(re.findall(r'^\[\d+\] 發布日期', prompt, re.M))
+            return json.dumps({"results": [
+                {"index": i, "label": "中立", "reasoning": "替身回應。", "confidence_score": 0.5} for i in range(1, count + 1)
+            ]}, ensure_ascii=False)
+        if "主張 (Claim)" in prompt:
+            return json.dumps({"label": "中立", "reasoning": "替身回應。", "confidence_score": 0.5}, ensure_ascii=False)
+        match = re.search(r'使用者輸入: "(.*)"', prompt, re.S)
+        if match and "rewritten_query" in prompt:
+            sentences = [s for s in re.split(r'[，。！？]', match.group(1)) if s.strip()]
+            return json.dumps({"rewritten_query": match.group(1), "claims": sentences[:3] or [match.group(1)]}, ensure_ascii=False)
+        match = re.search(r'輸入文本: (.*)', prompt)
+        if match:
+            sentences = [s for s in re.split(r'[，。！？]', match.group(1)) if s.strip()]
+            return json.dumps({"claims": sentences[:3] or [match.group(1)]}, ensure_ascii=False)
+        match = re.search(r'使用者輸入: "(.*)"', prompt, re.S)
+        return match.group(1) if match else prompt[-50:]
+
+    @staticmethod
+    def _message(body: dict, content: str, done: bool, reply: str = "") -> dict:
+        message = {
+            "model": body.get("model", "stand-in"),
+            "created_at": "2024-01-01T00:00:00Z",
+            "message": {"role": "assistant", "content": content},
+            "done": done
+        }
+        if done:
+            # 以字元數近似 token 數，放在最後一個片段，與 Ollama 相同
+            message["done_reason"] = "stop"
+            message["prompt_eval_count"] = len(body["messages"][-1]["content"])
+            message["eval_count"] = len(reply)
+        return message
+
+    async def chat(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # 延遲加上一些抖動，接近真實模型的推論時間分布
+            delay = self.latency * np.random.uniform(0.5, 1.5)
+            content = self._reply(body["messages"][-1]["content"])
+            if not body.get("stream"):
+                await asyncio.sleep(delay)
+                return web.json_response(self._message(body, content, True, content))
+            # 串流模式：延遲平均分攤到每段 token
+            pieces = [content[i:i + 4] for i in range(0, len(content), 4)] or [""]
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await response.prepare(request)
+            for piece in pieces:
+                await asyncio.sleep(delay / len(pieces))
+                await response.write((json.dumps(self._message(body, piece, False), ensure_ascii=False) + "\n").encode("utf-8"))
+            await response.write((json.dumps(self._message(body, "", True, content)) + "\n").encode("utf-8"))
+            await response.write_eof()
+            return response
+        finally:
+            self.in_flight -= 1
+
+    async def start(self, port: int) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post("/api/chat", self.chat)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        return runner
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def load_queries(n: int) -> list[str]:
+    """以文章標題作為查詢；加上編號讓每個查詢都不同，避免 LLM 快取直接命中。"""
+    titles = [article['title'] for article in ArticleStore() if article.get('title')]
+    return [f"{titles[i % len(titles)]}（{i}）" for i in range(n)]
+
+
+async def wait_for_health(session: ClientSession, url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{url}/health") as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"API at {url} did not become healthy within {timeout}s")
+
+
+async def _read_stream(response) -> tuple[float | None, dict | None]:
+    """讀取 NDJSON 事件串流，回傳 (第一個主張判決的時間點, 最後一個事件)。"""
+    first_result_at, event = None, None
+    async for line in response.content:
+        if not line.strip():
+            continue
+        event = json.loads(line)
+        if event["type"] == "claim_result" and first_result_at is None:
+            first_result_at = time.perf_counter()
+    return first_result_at, event
+
+
+def _add_counters(totals: dict, body: dict | None):
+    """累加查核結果 telemetry 中的計數器。"""
+    result = (body or {}).get("result") or {}
+    for name, value in result.get("telemetry", {}).get("counters", {}).items():
+        totals[name] = totals.get(name, 0) + value
+
+
+def _prometheus_counters(text: str) -> dict[str, float]:
+    """讀取 /metrics 中沒有標籤的 fact_checker_*_total 計數器。"""
+    return {match.group(1): float(match.group(2)) for match in re.finditer(r'^fact_checker_(\w+)_total (\S+)$', text, re.M)}
+
+
+async def fetch_counters(session: ClientSession, url: str) -> dict[str, float]:
+    async with session.get(f"{url}/metrics") as response:
+        return _prometheus_counters(await response.text())
+
+
+# 合併檢索時主張嵌入的快取統計由同一批的所有請求共用，只記在行程層級的指標
+BATCH_LEVEL_COUNTERS = {"embedding_cache_hits", "embedding_cache_misses"}
+
+
+def counter_mismatches(trace_totals: dict, before: dict, after: dict) -> dict[str, tuple[float, float]]:
+    """比較各請求 Trace 計數器的總和與 /metrics 計數器的增量，回傳不一致的 {名稱: (Trace 總和, /metrics 增量)}。
+
+    只適用於負載測試期間沒有其他請求的服務（替身模式）。
+    """
+    mismatches = {}
+    for name in (trace_totals.keys() | after.keys()) - BATCH_LEVEL_COUNTERS:
+        traced, exported = trace_totals.get(name, 0), after.get(name, 0) - before.get(name, 0)
+        if abs(traced - exported) > 1e-6:
+            mismatches[name] = (traced, exported)
+    return mismatches
+
+
+async def run_load(url: str, endpoint: str, queries: list[str], concurrency: int, k: int) -> tuple[list[float], list[float], int, float, dict]:
+    latencies, first_results, errors = [], [], 0
+    counters = {}
+    queue = asyncio.Queue()
+    for query in queries:
+        queue.put_nowait(query)
+
+    async def worker(session: ClientSession):
+        nonlocal errors
+        while not queue.empty():
+            query = queue.get_nowait()
+            if endpoint == "check":
+                path, payload = "/v1/check", {"query": query, "wait": True}
+            elif endpoint == "stream":
+                path, payload = "/v1/check/stream", {"query": query}
+            elif endpoint == "claims":
+                path, payload = "/v1/claims", {"text": query}
+            else:
+                path, payload = "/v1/retrieve", {"claims": [query], "k": k}
+            start = time.perf_counter()
+            async with session.post(f"{url}{path}", json=payload) as response:
+                if endpoint == "stream" and response.status == 200:
+                    first_result_at, body = await _read_stream(response)
+                    if first_result_at is not None:
+                        first_results.append(first_result_at - start)
+                    if not body or body["type"] != "result":
+                        errors += 1
+                    _add_counters(counters, body)
+                else:
+                    body = await response.json()
+                    if response.status != 200 or "error" in body or "error" in body.get("result", {}):
+                        errors += 1
+                    _add_counters(counters, body)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    return latencies, first_results, errors, time.perf_counter() - start, counters
+
+
+async def main_async(args):
+    stand_in = OllamaStandIn(args.llm_latency)
+    runner = None
+    server = None
+    url = args.url
+    try:
+        if url is None:
+            stand_in_port, api_port = _free_port(), _free_port()
+            runner = await stand_in.start(stand_in_port)
+            env = dict(os.environ, OLLAMA_HOST=f"http://127.0.0.1:{stand_in_port}")
+            server = subprocess.Popen(
+                [sys.executable, "-m", "api.server", "--port", str(api_port)],
+                cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            url = f"http://127.0.0.1:{api_port}"
+        async with ClientSession() as session:
+            await wait_for_health(session, url, args.startup_timeout)
+            counters_before = await fetch_counters(session, url)
+
+        queries = load_queries(args.requests)
+        latencies, first_results, errors, elapsed, trace_counters = await run_load(url, args.endpoint, queries, args.concurrency, args.k)
+        async with ClientSession() as session:
+            async with session.get(f"{url}/health") as response:
+                health = await response.json()
+            counters_after = await fetch_counters(session, url)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if runner is not None:
+            await runner.cleanup()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"endpoint={args.endpoint} requests={len(latencies)} concurrency={args.concurrency} errors={errors}")
+    print(f"throughput: {len(latencies) / elapsed:.1f} req/s")
+    print(f"latency: p50 {p50 * 1000:.0f} ms | p95 {p95 * 1000:.0f} ms | p99 {p99 * 1000:.0f} ms")
+    if first_results:
+        p50, p95 = np.percentile(first_results, [50, 95])
+        print(f"time to first claim verdict: p50 {p50 * 1000:.0f} ms | p95 {p95 * 1000:.0f} ms")
+    print(f"retrieval batching: {health.get('retrieval_batching')}")
+    if args.url is None:
+        print(f"LLM stand-in: {stand_in.calls} calls, max {stand_in.max_in_flight} in flight")
+        if args.endpoint in ("check", "stream"):
+            # 每個計數都應恰好記在一次查核的 Trace 與行程層級的指標中
+            mismatches = counter_mismatches(trace_counters, counters_before, counters_after)
+            if mismatches:
+                print(f"telemetry mismatch (trace total, /metrics delta): {mismatches}")
+                sys.exit(1)
+            print(f"telemetry: /metrics agrees with result telemetry for {len(trace_counters)} counters")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="對已在執行的 API 服務進行測試，不啟動替身與服務")
+    parser.add_argument("--endpoint", choices=["check", "stream", "claims", "retrieve"], default="check")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="替身每次回應的平均延遲（秒）")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# knowledge_base/article_store.py
+import json
+import os
+from collections.abc import Iterable, Iterator
+
+from utils.config import PROCESSED_DATA_PATH, LEGACY_PROCESSED_DATA_PATH
+
+
+class ArticleStore:
+    """以 JSON Lines 儲存的文章庫：文章以追加方式寫入，讀取時逐行串流，不必整份載入記憶體。
+
+    同一網址可能被寫入多次（文章有更新），讀取時以最後寫入的版本為準；
+    compact() 會移除已被取代的舊版本。
+    """
+    def __init__(self, path: str = PROCESSED_DATA_PATH, legacy_path: str | None = LEGACY_PROCESSED_DATA_PATH):
+        self.path = path
+        if legacy_path and not os.path.exists(path) and os.path.exists(legacy_path):
+            self._migrate(legacy_path)
+
+    def _migrate(self, legacy_path: str):
+        """把舊版的 JSON 陣列檔轉存為 JSON Lines（只在文章庫還不存在時執行一次）。"""
+        print(f"Migrating {legacy_path} to JSON Lines at {self.path}")
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            articles = json.load(f)
+        self._write_all(articles)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _records(self) -> Iterator[tuple[int, dict]]:
+        """逐行讀取 (位元組位置, 文章)；略過中斷時可能寫到一半的行。"""
+        if not self.exists():
+            return
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                start, offset = offset, offset + len(line)
+                if not line.strip():
+                    continue
+                try:
+                    yield start, json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    @staticmethod
+    def _key(offset: int, article: dict):
+        return article.get('url') or offset
+
+    def _latest_offsets(self) -> dict:
+        """每個網址最後一個版本所在的位置；只保留網址與整數，不保留文章內容。"""
+        return {self._key(offset, article): offset for offset, article in self._records()}
+
+    def __iter__(self) -> Iterator[dict]:
+        """依寫入順序串流每篇文章的最新版本。"""
+        latest = self._latest_offsets()
+        for offset, article in self._records():
+            if latest[self._key(offset, article)] == offset:
+                yield article
+
+    def tee(self, articles: Iterable[dict], overwrite: bool = False) -> Iterator[dict]:
+        """把流經的文章逐篇寫入文章庫後再交給下游。
+
+        overwrite 為 True 時寫入暫存檔，整個串流順利結束且至少有一篇文章時才取代原本的文章庫。
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        target = f"{self.path}.tmp" if overwrite else self.path
+        if not overwrite:
+            self._ensure_trailing_newline()
+        completed = False
+        written = 0
+        try:
+            with open(target, 'w' if overwrite else 'a', encoding='utf-8') as f:
+                for article in articles:
+                    f.write(json.dumps(article, ensure_ascii=False) + "\n")
+                    f.flush()
+                    written += 1
+                    yield article
+            completed = True
+        finally:
+            if overwrite:
+                if completed and written:
+                    os.replace(target, self.path)
+                elif os.path.exists(target):
+                    os.remove(target)
+
+    def append(self, articles: Iterable[dict]) -> int:
+        """追加寫入文章，回傳寫入的篇數。"""
+        return sum(1 for _ in self.tee(articles))
+
+    def compact(self) -> int:
+        """移除已被新版本取代的文章，回傳保留的篇數。"""
+        if not self.exists():
+            return 0
+        return self._write_all(iter(self))
+
+    def _write_all(self, articles: Iterable[dict]) -> int:
+        return sum(1 for _ in self.tee(articles, overwrite=True))
+
+    def _ensure_trailing_newline(self):
+        if not self.exists():
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
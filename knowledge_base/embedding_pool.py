@@ -0,0 +1,115 @@
+# knowledge_base/embedding_pool.py
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_WORKERS,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_THREADS_PER_WORKER
+)
+
+# 結果矩陣優先放在記憶體檔案系統，工作行程寫入時不會真的落到磁碟
+_SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# 每個工作行程各自持有一份模型，只在行程啟動時載入一次
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int):
+    # 執行緒數必須在載入 PyTorch 之前設定才會生效
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    from sentence_transformers import SentenceTransformer
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    global _worker_model
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _worker_dimension() -> int:
+    return _worker_model.get_sentence_embedding_dimension()
+
+
+def _embed_into(path: str, shape: tuple[int, int], start: int, texts: list[str], batch_size: int) -> int:
+    """在工作行程中編碼一個分片，直接寫入共用的記憶體映射矩陣的對應列，只回傳列數。"""
+    vectors = _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    out = np.memmap(path, dtype=np.float32, mode="r+", shape=shape)
+    out[start:start + len(texts)] = vectors
+    out.flush()
+    del out
+    return len(texts)
+
+
+class EmbeddingPool:
+    """多行程的嵌入工作池，適合多核心、沒有 GPU 的建索引主機。
+
+    chunk 依 batch_size 切成分片分派給各工作行程，每個行程只載入一次模型；
+    嵌入結果透過記憶體映射檔案傳回，不經過 pickle。介面與 LangChain 的
+    embed_documents 相同，可直接取代 SentenceTransformerEmbeddings 用於建索引。
+    """
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL,
+        workers: int = EMBEDDING_WORKERS,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        threads_per_worker: int = EMBEDDING_THREADS_PER_WORKER
+    ):
+        self.model_name = model_name
+        self.workers = workers
+        self.batch_size = batch_size
+        # 使用 spawn 而非 fork，避免子行程繼承父行程中 PyTorch 與 Chroma 的執行緒狀態
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, threads_per_worker)
+        )
+        self._dimension = None
+        print(f"Started {workers} embedding workers ({threads_per_worker} threads each) for model: {model_name}")
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = self.executor.submit(_worker_dimension).result()
+        return self._dimension
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """將文字分片平行編碼，回傳 (len(texts), dimension) 的 float32 矩陣。"""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        shape = (len(texts), self.dimension)
+        fd, path = tempfile.mkstemp(prefix="embeddings-", suffix=".f32", dir=_SHARED_DIR)
+        try:
+            os.ftruncate(fd, shape[0] * shape[1] * np.dtype(np.float32).itemsize)
+            futures = [
+                self.executor.submit(_embed_into, path, shape, start, texts[start:start + self.batch_size], self.batch_size)
+                for start in range(0, len(texts), self.batch_size)
+            ]
+            for future in futures:
+                future.result()
+            return np.array(np.memmap(path, dtype=np.float32, mode="r", shape=shape))
+        finally:
+            os.close(fd)
+            os.remove(path)
+
+    def embed_documents(self, texts: list[str]) -> np.ndarray:
+        return self.embed(texts)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
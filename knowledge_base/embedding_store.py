@@ -0,0 +1,226 @@
+# knowledge_base/embedding_store.py
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from utils.config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_STORE_PATH,
+    EMBEDDING_STORE_DTYPE
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl，只保證同一行程內的寫入安全
+    fcntl = None
+
+RECORDS_FILE = "embeddings.bin"
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+# 新增的列先放在字典中，累積到這個數量才併入排序好的鍵陣列
+_MERGE_THRESHOLD = 65536
+
+
+def content_keys(texts: list[str]) -> np.ndarray:
+    """以文字內容的 64 位元雜湊作為嵌入向量的鍵。"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little') for text in texts),
+        dtype=np.uint64,
+        count=len(texts)
+    )
+
+
+class EmbeddingStore:
+    """以內容雜湊定址的嵌入向量磁碟儲存，依模型名稱、維度與精度分開存放。
+
+    每筆紀錄是 (鍵, 向量) 的固定長度結構，只以追加方式寫入單一檔案並以記憶體映射讀取；
+    查詢時對排序好的鍵做二分搜尋。同一份檔案可以被多個行程同時讀寫。
+    """
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL,
+        dimension: int = EMBEDDING_DIMENSION,
+        root: str = EMBEDDING_STORE_PATH,
+        dtype: str = EMBEDDING_STORE_DTYPE
+    ):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        namespace = f"{re.sub(r'[^0-9A-Za-z._-]+', '_', model_name)}-{dimension}-{self.dtype.name}"
+        self.path = os.path.join(root, namespace)
+        self.record_dtype = np.dtype([("key", "<u8"), ("vector", self.dtype, (dimension,))])
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        meta_path = os.path.join(self.path, META_FILE)
+        if not os.path.exists(meta_path):
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({"model": model_name, "dimension": dimension, "dtype": self.dtype.name}, f, ensure_ascii=False)
+        self._reset()
+
+    @property
+    def records_path(self) -> str:
+        return os.path.join(self.path, RECORDS_FILE)
+
+    def _reset(self):
+        self._records = None
+        self._inode = None
+        self._rows = 0
+        self._sorted_keys = np.empty(0, dtype=np.uint64)
+        self._sorted_rows = np.empty(0, dtype=np.int64)
+        self._recent = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._rows
+
+    def _refresh(self):
+        """讀入其他行程（或自己）新追加的列；檔案被壓縮取代時整個重新載入。"""
+        try:
+            stat = os.stat(self.records_path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if self._inode is not None and stat.st_ino != self._inode:
+            self._reset()
+        # 寫到一半的最後一筆紀錄不計入
+        rows = stat.st_size // self.record_dtype.itemsize
+        if rows == self._rows:
+            return
+        self._records = np.memmap(self.records_path, dtype=self.record_dtype, mode='r', shape=(rows,))
+        self._inode = stat.st_ino
+        new_keys = np.asarray(self._records["key"][self._rows:rows])
+        self._recent.update(zip(new_keys.tolist(), range(self._rows, rows)))
+        self._rows = rows
+        if len(self._recent) >= _MERGE_THRESHOLD or not self._sorted_keys.size:
+            self._merge_recent()
+
+    def _merge_recent(self):
+        if not self._recent:
+            return
+        keys = np.concatenate([self._sorted_keys, np.fromiter(self._recent.keys(), dtype=np.uint64, count=len(self._recent))])
+        rows = np.concatenate([self._sorted_rows, np.fromiter(self._recent.values(), dtype=np.int64, count=len(self._recent))])
+        order = np.argsort(keys, kind='stable')
+        self._sorted_keys, self._sorted_rows = keys[order], rows[order]
+        self._recent = {}
+
+    def _find_rows(self, keys: np.ndarray) -> np.ndarray:
+        """回傳每個鍵所在的列，找不到的為 -1。"""
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if self._sorted_keys.size:
+            positions = np.minimum(np.searchsorted(self._sorted_keys, keys), self._sorted_keys.size - 1)
+            found = self._sorted_keys[positions] == keys
+            rows[found] = self._sorted_rows[positions[found]]
+        if self._recent:
+            for i in np.flatnonzero(rows < 0):
+                rows[i] = self._recent.get(int(keys[i]), -1)
+        return rows
+
+    def lookup(self, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """回傳 (float32 向量矩陣, 是否命中的布林陣列)；未命中的列為 0。"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        vectors = np.zeros((len(keys), self.dimension), dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            rows = self._find_rows(keys)
+            found = rows >= 0
+            if found.any():
+                vectors[found] = self._records["vector"][rows[found]]
+        return vectors, found
+
+    @contextmanager
+    def _file_lock(self):
+        with open(os.path.join(self.path, LOCK_FILE), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, keys: np.ndarray, vectors) -> int:
+        """追加尚未儲存的向量，回傳實際寫入的筆數。"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected embeddings of dimension {self.dimension}, got shape {vectors.shape}. "
+                             f"Check EMBEDDING_DIMENSION for model {self.model_name}.")
+        with self._lock, self._file_lock():
+            self._refresh()
+            # 同一批內重複的鍵只寫一次
+            _, first = np.unique(keys, return_index=True)
+            first = np.sort(first)
+            new = first[self._find_rows(keys[first]) < 0]
+            if not new.size:
+                return 0
+            records = np.empty(new.size, dtype=self.record_dtype)
+            records["key"] = keys[new]
+            records["vector"] = vectors[new]
+            with open(self.records_path, 'ab') as f:
+                f.write(records.tobytes())
+            self._refresh()
+        return int(new.size)
+
+    def compact(self, referenced_keys: np.ndarray) -> tuple[int, int]:
+        """只保留仍被引用的向量（重複的鍵只留一筆），回傳 (保留筆數, 移除筆數)。"""
+        referenced_keys = np.asarray(referenced_keys, dtype=np.uint64)
+        with self._lock, self._file_lock():
+            self._refresh()
+            if not self._rows:
+                return 0, 0
+            keys = np.asarray(self._records["key"])
+            _, first = np.unique(keys, return_index=True)
+            keep = np.sort(first[np.isin(keys[first], referenced_keys)])
+            tmp_path = f"{self.records_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                # 分段寫出，不需把整個矩陣讀進記憶體
+                for start in range(0, keep.size, _MERGE_THRESHOLD):
+                    f.write(np.asarray(self._records[keep[start:start + _MERGE_THRESHOLD]]).tobytes())
+            removed = self._rows - int(keep.size)
+            self._records = None
+            os.replace(tmp_path, self.records_path)
+            self._reset()
+            self._refresh()
+        return int(keep.size), removed
+
+
+class CachedEmbeddings:
+    """先查 EmbeddingStore、只對未命中的文字執行模型的嵌入函式包裝。
+
+    模型以 load_model 延遲載入：全部命中時完全不需載入模型。介面與 LangChain 的 Embeddings 相同。
+    """
+    def __init__(self, store: EmbeddingStore, load_model):
+        self.store = store
+        self._load_model = load_model
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                self._model = self._load_model()
+            return self._model
+
+    def embed_documents(self, texts: list[str]) -> np.ndarray:
+        keys = content_keys(texts)
+        vectors, found = self.store.lookup(keys)
+        missing = np.flatnonzero(~found)
+        self.counters["hits"] += len(texts) - missing.size
+        self.counters["misses"] += missing.size
+        if missing.size:
+            computed = np.asarray(self.model.embed_documents([texts[i] for i in missing]), dtype=np.float32)
+            vectors[missing] = computed
+            self.store.add(keys[missing], computed)
+        return vectors
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed_documents([text])[0]
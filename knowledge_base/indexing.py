@@ -1,10 +1,13 @@
-
 # knowledge_base/indexing.py
-import json
+import base64
+import hashlib
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
+
 import chromadb
+import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 
 from utils.config import (
@@ -13,81 +16,412 @@ from utils.config import (
     CHUNK_OVERLAP,
     EMBEDDING_MODEL,
     CHROMA_PATH,
-    COLLECTION_NAME
+    COLLECTION_NAME,
+    UPSERT_BATCH_SIZE,
+    LEXICAL_FLUSH_CHUNKS,
+    EMBEDDING_WORKERS,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_STORE_ENABLED,
+    EMBEDDING_STORE_MAX_GARBAGE_RATIO,
+    VECTOR_BACKEND,
+    TELEMETRY_PROMETHEUS_TEXTFILE,
+    NEAR_DUPLICATE_DETECTION,
+    NEAR_DUPLICATE_NUM_PERM
 )
-from .text_processing import preprocess_documents
+from utils import telemetry
+from .text_processing import iter_preprocessed, get_tokenizer, minhash_batch, NearDuplicateFilter
+from .lexical_index import LexicalIndex
+from .metadata_filters import DATE_FIELD, date_to_int
+from .article_store import ArticleStore
+from .embedding_pool import EmbeddingPool
+from .embedding_store import EmbeddingStore, CachedEmbeddings, content_keys
+from .vector_index import QuantizedVectorIndex, hnsw_configuration, apply_hnsw_search_params
 
 def load_and_process_data(file_path: str = PROCESSED_DATA_PATH) -> list[dict]:
-    """載入、預處理並回傳文件。"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            documents = json.load(f)
-    except FileNotFoundError:
+    """載入、預處理並回傳文件（整份載入記憶體；大量文章請直接串流 ArticleStore）。"""
+    store = ArticleStore(file_path)
+    if not store.exists():
         print(f"Error: Data file not found at {file_path}")
         return []
-    
-    return preprocess_documents(documents)
 
-def chunk_documents(documents: list[dict]) -> list[Document]:
-    """將文件切塊並保留元資料。"""
-    text_splitter = RecursiveCharacterTextSplitter(
+    return list(iter_preprocessed(store))
+
+def make_chunk_id(url: str, chunk_index: int, content: str) -> str:
+    """由文章網址、chunk 在文章中的位置與內容雜湊組成確定性的 chunk ID；內容不變時 ID 也不變。"""
+    url_hash = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+    content_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+    return f"{url_hash}-{chunk_index:04d}-{content_hash}"
+
+def _split_document(doc: dict, text_splitter: RecursiveCharacterTextSplitter) -> list[Document]:
+    if not doc.get('content'):
+        return []
+    # 為每個 chunk 複製同一份 metadata
+    metadata = {
+        "source": doc.get('source', 'unknown'),
+        "url": doc.get('url', ''),
+        "title": doc.get('title', ''),
+        "scraped_at": doc.get('scraped_at', ''),
+        "publication_date": doc.get('publication_date') or '',
+        # 可排序的數值日期，供檢索時以日期範圍過濾
+        DATE_FIELD: date_to_int(doc.get('publication_date')),
+        # 由報告頁首解析出的欄位（見 text_processing.preprocess_document）
+        "status": doc.get('status') or '',
+        "category": doc.get('category') or '',
+        "report_id": doc.get('report_id') or ''
+    }
+    # LangChain 的 splitter 會處理文本切分
+    return [
+        Document(id=make_chunk_id(metadata['url'], chunk_index, split), page_content=split, metadata=dict(metadata))
+        for chunk_index, split in enumerate(text_splitter.split_text(doc['content']))
+    ]
+
+def _make_text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP,
         length_function=len,
     )
+
+def drop_near_duplicates(chunks: list[Document], near_duplicates: NearDuplicateFilter | None) -> list[Document]:
+    """依序檢查每個 chunk，略過與其他文章已保留的 chunk 近似重複者；MinHash 簽章記在 metadata 中供之後的增量更新使用。"""
+    if near_duplicates is None or not chunks:
+        return chunks
+    kept = []
+    for chunk, signature in zip(chunks, minhash_batch([chunk.page_content for chunk in chunks])):
+        if signature is None:
+            kept.append(chunk)
+            continue
+        url = chunk.metadata['url']
+        if near_duplicates.find(signature, url) is not None:
+            continue
+        near_duplicates.add(signature, url)
+        chunk.metadata['minhash'] = base64.b64encode(signature.astype('<u4').tobytes()).decode('ascii')
+        kept.append(chunk)
+    near_duplicates.skipped += len(chunks) - len(kept)
+    telemetry.count("near_duplicate_chunks", len(chunks) - len(kept))
+    return kept
+
+def chunk_documents(documents: list[dict], tokenizer=None, near_duplicates: NearDuplicateFilter | None = None) -> tuple[list[Document], list[np.ndarray]]:
+    """將文件切塊並保留元資料，同時為每個 chunk 斷詞一次，回傳 (chunks, token_ids)。"""
+    tokenizer = tokenizer or get_tokenizer()
+    text_splitter = _make_text_splitter()
     chunks = []
     for doc in documents:
-        if not doc.get('content'):
-            continue
-        # LangChain 的 splitter 會處理文本切分
-        splits = text_splitter.split_text(doc['content'])
-        for split in splits:
-            # 為每個 chunk 建立一個新的 Document 物件，並複製 metadata
-            metadata = {
-                "source": doc.get('source', 'unknown'),
-                "url": doc.get('url', ''),
-                "title": doc.get('title', ''),
-                "scraped_at": doc.get('scraped_at', ''),
-                "publication_date": doc.get('publication_date', '')
-            }
-            chunk_doc = Document(page_content=split, metadata=metadata)
-            chunks.append(chunk_doc)
-    return chunks
-
-def build_vector_store(chunks: list[Document]):
-    """建立並儲存向量資料庫。"""
+        chunks.extend(_split_document(doc, text_splitter))
+    chunks = drop_near_duplicates(chunks, near_duplicates)
+    # BM25 需要的 token ID 在此整批預先算好，建立索引時不需重新斷詞
+    token_ids = tokenizer.encode_batch([chunk.page_content for chunk in chunks])
+    return chunks, token_ids
+
+def iter_chunk_batches(
+    documents: Iterable[dict],
+    tokenizer=None,
+    batch_size: int = UPSERT_BATCH_SIZE,
+    near_duplicates: NearDuplicateFilter | None = None
+) -> Iterator[tuple[list[str], list[Document], list[np.ndarray]]]:
+    """串流切塊：每累積約 batch_size 個 chunk 就交出 (文章網址, chunks, token_ids)。
+
+    批次只在文章之間切開，同一篇文章的 chunk 一定在同一個批次，差異更新才能以文章為範圍。
+    提供 near_duplicates 時，與先前文章近似重複的 chunk 不會出現在批次中。
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    text_splitter = _make_text_splitter()
+    urls, chunks = [], []
+    for doc in documents:
+        urls.append(doc.get('url', ''))
+        chunks.extend(drop_near_duplicates(_split_document(doc, text_splitter), near_duplicates))
+        if len(chunks) >= batch_size:
+            yield urls, chunks, tokenizer.encode_batch([chunk.page_content for chunk in chunks])
+            urls, chunks = [], []
+    if urls:
+        yield urls, chunks, tokenizer.encode_batch([chunk.page_content for chunk in chunks])
+
+def _load_embedding_model() -> SentenceTransformerEmbeddings | EmbeddingPool:
+    """載入嵌入模型；EMBEDDING_WORKERS 大於 1 時改用多行程的 EmbeddingPool。"""
+    if EMBEDDING_WORKERS > 1:
+        return EmbeddingPool()
     print(f"Creating embeddings with model: {EMBEDDING_MODEL}")
+    return SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+
+@lru_cache(maxsize=1)
+def get_embedding_function() -> SentenceTransformerEmbeddings | EmbeddingPool | CachedEmbeddings:
+    """取得建索引用的嵌入函式，之後重複使用。
+
+    啟用 EMBEDDING_STORE_ENABLED 時先查磁碟上的嵌入向量儲存，模型只在有未命中的文字時才載入。
+    """
+    if EMBEDDING_STORE_ENABLED:
+        return CachedEmbeddings(EmbeddingStore(), _load_embedding_model)
+    return _load_embedding_model()
+
+def get_collection():
+    """開啟（必要時以 HNSW 設定建立）持久化的 Chroma collection；嵌入向量由我們自行計算後傳入。"""
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    collection = client.get_or_create_collection(name=COLLECTION_NAME, embedding_function=None, configuration=hnsw_configuration())
+    mismatched = apply_hnsw_search_params(collection)
+    if mismatched:
+        print(f"Warning: collection was built with different HNSW settings ({', '.join(mismatched)}). "
+              f"Run `python -m knowledge_base.indexing --recreate` to rebuild it with the configured values.")
+    return collection
+
+def recreate_collection():
+    """刪除 collection 後以目前的 HNSW 設定重新建立；chunk ID 不變，重新索引時 BM25 中的 chunk 會以更新處理。"""
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    try:
+        client.delete_collection(name=COLLECTION_NAME)
+    except Exception:
+        pass
+    return get_collection()
+
+def _existing_chunk_ids(collection, urls: list[str] | None) -> list[str]:
+    """取得 collection 中屬於指定文章的 chunk ID；urls 為 None 時回傳全部。"""
+    if urls is None:
+        return collection.get(include=[])['ids']
+    existing = []
+    for start in range(0, len(urls), UPSERT_BATCH_SIZE):
+        existing.extend(collection.get(where={"url": {"$in": urls[start:start + UPSERT_BATCH_SIZE]}}, include=[])['ids'])
+    return existing
+
+def _apply_chunk_diff(collection, chunks: list[Document], scope_urls: list[str] | None, embedding_function=None) -> tuple[list[Document], list[str]]:
+    """只嵌入並 upsert collection 中還沒有的 chunk，刪除範圍內已不存在的 chunk，回傳 (新增的 chunks, 刪除的 ID)。"""
+    # 相同內容的 chunk 有相同的 ID，重複出現的文章只保留一份
+    chunks_by_id = {chunk.id: chunk for chunk in chunks}
+    with telemetry.span("diff_existing"):
+        existing_ids = set(_existing_chunk_ids(collection, scope_urls))
+    to_add = [chunk for chunk_id, chunk in chunks_by_id.items() if chunk_id not in existing_ids]
+    to_delete = sorted(existing_ids - chunks_by_id.keys())
+
+    if to_add:
+        embedding_function = embedding_function or get_embedding_function()
+        # 整批一次嵌入，多行程模式下才能讓所有工作行程同時忙碌；寫入 Chroma 則只在這個行程進行
+        with telemetry.span("embed", texts=len(to_add)):
+            embeddings = embedding_function.embed_documents([chunk.page_content for chunk in to_add])
+        with telemetry.span("upsert", chunks=len(to_add)):
+            for start in range(0, len(to_add), UPSERT_BATCH_SIZE):
+                batch = to_add[start:start + UPSERT_BATCH_SIZE]
+                collection.upsert(
+                    ids=[chunk.id for chunk in batch],
+                    embeddings=embeddings[start:start + UPSERT_BATCH_SIZE],
+                    documents=[chunk.page_content for chunk in batch],
+                    metadatas=[chunk.metadata for chunk in batch]
+                )
+    if to_delete:
+        with telemetry.span("delete", chunks=len(to_delete)):
+            for start in range(0, len(to_delete), UPSERT_BATCH_SIZE):
+                collection.delete(ids=to_delete[start:start + UPSERT_BATCH_SIZE])
+    telemetry.count("chunks_embedded", len(to_add))
+    telemetry.count("chunks_deleted", len(to_delete))
+    return to_add, to_delete
+
+def build_vector_store(chunks: list[Document], scope_urls: list[str] | None = None) -> tuple[object, list[str], list[str]]:
+    """以差異更新的方式寫入向量資料庫，回傳 (collection, 新增的 chunk ID, 刪除的 chunk ID)。
+
+    只有 collection 中還沒有的 chunk 會被嵌入並 upsert；在範圍內（scope_urls 的文章，
+    為 None 時則是整個 collection）但已不屬於這次結果的 chunk 會被刪除。
+    """
     print(f"Storing vector store at: {CHROMA_PATH}")
-    
-    # 建立 embedding 函式
-    embedding_function = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
-    
-    # 建立 ChromaDB client
-    # 這會將資料庫持久化到磁碟
-    vector_store = Chroma.from_documents(
-        documents=chunks, 
-        embedding=embedding_function,
-        collection_name=COLLECTION_NAME,
-        persist_directory=CHROMA_PATH
-    )
-    
-    print(f"Successfully built and saved vector store with {len(chunks)} chunks.")
-    return vector_store
-
-def build_knowledge_base():
-    """執行完整的知識庫建立流程。"""
-    documents = load_and_process_data()
-    if not documents:
-        print("No documents to process. Exiting knowledge base build.")
-        return
-    
-    chunks = chunk_documents(documents)
-    if not chunks:
-        print("No chunks were created from the documents. Exiting.")
+    collection = get_collection()
+    to_add, to_delete = _apply_chunk_diff(collection, chunks, scope_urls)
+    print(f"Vector store diff: {len(to_add)} added, {len(to_delete)} deleted "
+          f"({collection.count()} chunks in total).")
+    return collection, [chunk.id for chunk in to_add], to_delete
+
+def _delete_unseen_articles(collection, seen_urls: set[str], page_size: int = 1000) -> list[str]:
+    """完整同步時，分頁掃描 collection 並刪除不屬於這次任何文章的 chunk。"""
+    stale_ids = []
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        stale_ids.extend(
+            chunk_id for chunk_id, metadata in zip(page['ids'], page['metadatas'])
+            if (metadata or {}).get('url', '') not in seen_urls
+        )
+        offset += len(page['ids'])
+    for start in range(0, len(stale_ids), UPSERT_BATCH_SIZE):
+        collection.delete(ids=stale_ids[start:start + UPSERT_BATCH_SIZE])
+    return stale_ids
+
+def compact_embedding_store(collection, store: EmbeddingStore | None = None, max_garbage_ratio: float = EMBEDDING_STORE_MAX_GARBAGE_RATIO, page_size: int = 1000):
+    """壓縮嵌入向量儲存，只保留 collection 中仍引用的向量；未被引用的比例未超過門檻時不做任何事。"""
+    store = store or EmbeddingStore()
+    n_rows, n_live = len(store), collection.count()
+    if n_rows <= n_live * (1 + max_garbage_ratio):
         return
-        
-    build_vector_store(chunks)
+    referenced = []
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        referenced.append(content_keys(page['documents']))
+        offset += len(page['ids'])
+    kept, removed = store.compact(np.concatenate(referenced) if referenced else np.empty(0, dtype=np.uint64))
+    print(f"Compacted embedding store: kept {kept}, removed {removed} unreferenced vectors.")
+
+def _open_lexical_index(tokenizer) -> LexicalIndex:
+    lexical_index = LexicalIndex(tokenizer=tokenizer)
+    if lexical_index.exists() and not lexical_index.is_compatible():
+        lexical_index.clear()
+    return lexical_index
+
+def build_lexical_index(
+    collection, added: dict[str, np.ndarray], deleted: list[str], tokenizer=None, metadatas: dict[str, dict] | None = None
+) -> LexicalIndex:
+    """把向量資料庫的同一份差異套用到 BM25 索引；added 為 chunk ID 對應預先斷詞的 token ID，metadatas 為其過濾用的 metadata。"""
+    lexical_index = _open_lexical_index(tokenizer)
+    lexical_index.delete(deleted)
+    if added:
+        lexical_index.add_documents(
+            list(added.keys()), list(added.values()),
+            [metadatas.get(chunk_id, {}) for chunk_id in added] if metadatas is not None else None
+        )
+    # 索引與 Chroma 仍不一致時（例如剛換了斷詞器），從 Chroma 補齊缺少的部分
+    if lexical_index.is_stale(collection):
+        lexical_index.sync_with_collection(collection)
+    print(f"Successfully updated lexical index (+{len(added)} / -{len(deleted)} chunks, {len(lexical_index)} in total).")
+    return lexical_index
+
+def index_articles(
+    articles: Iterable[dict],
+    full_rebuild: bool = False,
+    collection=None,
+    lexical_index: LexicalIndex | None = None,
+    embedding_function=None,
+    vector_index: QuantizedVectorIndex | None = None,
+    batch_size: int | None = None,
+    lexical_flush_chunks: int = LEXICAL_FLUSH_CHUNKS,
+    deduplicate: bool = NEAR_DUPLICATE_DETECTION
+) -> dict:
+    """串流建立知識庫：清理 -> 切塊 -> 分批嵌入 -> upsert，記憶體用量與文章總數無關。
+
+    每個批次以其中的文章為範圍做差異更新；BM25 的新增部分累積到 lexical_flush_chunks
+    才寫成一個分段。full_rebuild 為 True 時，最後會刪除不在這次串流中的文章的 chunk。
+    deduplicate 為 True 時略過與其他文章近似重複的 chunk；增量更新會先載入 collection 中既有 chunk 的 MinHash 簽章。
+    """
+    with telemetry.start_trace("index") as trace:
+        stats = _index_articles(
+            articles, full_rebuild, collection, lexical_index, embedding_function, vector_index, batch_size,
+            lexical_flush_chunks, deduplicate
+        )
+    stats["stages"] = trace.to_dict()["stages"]
+    print(telemetry.format_stages(stats["stages"], trace.duration * 1000))
+    if TELEMETRY_PROMETHEUS_TEXTFILE:
+        telemetry.metrics.write_textfile(TELEMETRY_PROMETHEUS_TEXTFILE)
+    return stats
+
+def _load_near_duplicate_filter(collection, page_size: int = 1000) -> NearDuplicateFilter:
+    """以 collection 中既有 chunk 的 MinHash 簽章建立近似重複過濾器（沒有簽章或簽章長度不同的 chunk 略過）。"""
+    near_duplicates = NearDuplicateFilter()
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        for metadata in page['metadatas']:
+            if metadata and metadata.get('minhash'):
+                signature = np.frombuffer(base64.b64decode(metadata['minhash']), dtype='<u4')
+                if len(signature) == NEAR_DUPLICATE_NUM_PERM:
+                    near_duplicates.add(signature, metadata.get('url', ''))
+        offset += len(page['ids'])
+    return near_duplicates
+
+def _index_articles(
+    articles, full_rebuild, collection, lexical_index, embedding_function, vector_index, batch_size, lexical_flush_chunks, deduplicate
+) -> dict:
+    collection = collection if collection is not None else get_collection()
+    # 多行程嵌入時，每批至少要能分給每個工作行程一個分片
+    batch_size = batch_size or max(UPSERT_BATCH_SIZE, EMBEDDING_WORKERS * EMBEDDING_BATCH_SIZE)
+    tokenizer = lexical_index.tokenizer if lexical_index is not None else get_tokenizer()
+    lexical_index = lexical_index if lexical_index is not None else _open_lexical_index(tokenizer)
+    stats = {"articles": 0, "chunks": 0, "added": 0, "deleted": 0}
+    seen_urls = set()
+    # 尚未寫入 BM25 的新增 chunk（ID -> (token ID, metadata)），依加入順序排列
+    pending = {}
+
+    def flush_lexical():
+        if pending:
+            with telemetry.span("lexical_flush", chunks=len(pending)):
+                token_ids, metadatas = zip(*pending.values())
+                lexical_index.add_documents(list(pending.keys()), list(token_ids), list(metadatas))
+            pending.clear()
+
+    def delete_lexical(chunk_ids):
+        # 還在緩衝區的 chunk 直接丟棄，已寫入索引的才標記刪除
+        lexical_index.delete([chunk_id for chunk_id in chunk_ids if pending.pop(chunk_id, None) is None])
+
+    # 清理、切塊與斷詞都在產生器中進行，取得每一批的時間記為 "chunk" 區段
+    near_duplicates = None
+    if deduplicate:
+        # 完整同步以這次串流為準，先出現的文章保留；增量更新則要與已索引的文章比對
+        near_duplicates = NearDuplicateFilter() if full_rebuild else _load_near_duplicate_filter(collection)
+    batches = telemetry.timed(iter_chunk_batches(iter_preprocessed(articles), tokenizer, batch_size, near_duplicates), "chunk")
+    for urls, chunks, token_ids in batches:
+        scope_urls = sorted(set(urls))
+        added, deleted = _apply_chunk_diff(collection, chunks, scope_urls, embedding_function)
+        delete_lexical(deleted)
+        token_ids_by_id = {chunk.id: ids for chunk, ids in zip(chunks, token_ids)}
+        for chunk in added:
+            pending[chunk.id] = (token_ids_by_id[chunk.id], chunk.metadata)
+        if len(pending) >= lexical_flush_chunks:
+            flush_lexical()
+
+        seen_urls.update(scope_urls)
+        stats["articles"] += len(urls)
+        stats["chunks"] += len(chunks)
+        stats["added"] += len(added)
+        stats["deleted"] += len(deleted)
+        print(f"Indexed {stats['articles']} articles / {stats['chunks']} chunks "
+              f"(+{stats['added']} / -{stats['deleted']} changed)")
+    flush_lexical()
+
+    # 沒有任何文章時不做完整同步，避免來源暫時失效時清空整個知識庫
+    if full_rebuild and seen_urls:
+        with telemetry.span("delete_unseen"):
+            stale_ids = _delete_unseen_articles(collection, seen_urls)
+        delete_lexical(stale_ids)
+        stats["deleted"] += len(stale_ids)
+
+    if full_rebuild and seen_urls and embedding_function is None and EMBEDDING_STORE_ENABLED:
+        with telemetry.span("compact_embedding_store"):
+            compact_embedding_store(collection, get_embedding_function().store)
+
+    # 索引與 Chroma 仍不一致時（例如剛換了斷詞器），從 Chroma 補齊缺少的部分
+    if lexical_index.is_stale(collection):
+        with telemetry.span("lexical_sync"):
+            lexical_index.sync_with_collection(collection)
+    if vector_index is None and VECTOR_BACKEND == "quantized":
+        vector_index = QuantizedVectorIndex()
+    if vector_index is not None:
+        if stats["added"] or stats["deleted"] or vector_index.is_stale(collection):
+            with telemetry.span("vector_index_sync"):
+                vector_index.sync_with_collection(collection)
+    if near_duplicates is not None:
+        stats["near_duplicates"] = near_duplicates.skipped
+        print(f"Skipped {near_duplicates.skipped} near-duplicate chunks.")
+    print(f"Knowledge base updated: {stats['articles']} articles, +{stats['added']} / -{stats['deleted']} chunks "
+          f"({collection.count()} in vector store, {len(lexical_index)} in lexical index).")
+    return stats
+
+def build_knowledge_base(documents: Iterable[dict] | None = None, recreate: bool = False) -> dict:
+    """執行知識庫建立流程；提供 documents 時只更新這些文章，否則以整個文章庫為準同步。
+
+    recreate 為 True 時先以目前的 HNSW 設定重建 collection；啟用嵌入向量儲存時不必重新嵌入。
+    """
+    full_rebuild = documents is None
+    if full_rebuild:
+        store = ArticleStore()
+        if not store.exists():
+            print(f"Error: Data file not found at {store.path}")
+            return {"articles": 0, "chunks": 0, "added": 0, "deleted": 0}
+        documents = store
+    collection = recreate_collection() if recreate else None
+    return index_articles(documents, full_rebuild=full_rebuild, collection=collection)
 
 if __name__ == '__main__':
     # 可以直接執行此腳本來建立知識庫
-    build_knowledge_base()
+    import argparse
+    parser = argparse.ArgumentParser(description="以文章庫建立知識庫。")
+    parser.add_argument("--recreate", action="store_true", help="以目前的 HNSW 設定重建 Chroma collection")
+    args = parser.parse_args()
+    build_knowledge_base(recreate=args.recreate)
@@ -0,0 +1,625 @@
+# knowledge_base/lexical_index.py
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from utils.serialization import write_json
+from utils.config import (
+    LEXICAL_INDEX_PATH,
+    BM25_K1,
+    BM25_B,
+    LEXICAL_MAX_SEGMENTS,
+    LEXICAL_MAX_DELETED_RATIO
+)
+from .metadata_filters import DATE_FIELD, FACET_FIELDS, encode_facets, facet_mask, filters_key
+from .text_processing import get_tokenizer
+
+MANIFEST_FILE = "manifest.json"
+DELETED_FILE = "deleted.json"
+FORMAT_VERSION = 2
+# posting 數乘上此倍數仍小於文件數時，改以稀疏方式累加分數
+SPARSE_ACCUMULATION_RATIO = 8
+# 每個分段為每篇文件儲存的過濾欄位：數值日期與字典編碼後的欄位
+FACET_ARRAYS = (DATE_FIELD, *FACET_FIELDS)
+# 快取的過濾遮罩數量上限
+FILTER_MASK_CACHE_SIZE = 32
+
+
+def ids_fingerprint(ids) -> int:
+    """與順序無關的 chunk ID 集合指紋：各 ID 的 64 位元 blake2b 做 XOR，可隨新增與刪除逐步更新。"""
+    fingerprint = 0
+    for doc_id in set(ids):
+        fingerprint ^= int.from_bytes(hashlib.blake2b(doc_id.encode('utf-8'), digest_size=8).digest(), 'little')
+    return fingerprint
+
+
+def _build_csr(term_ids: np.ndarray, doc_idx: np.ndarray, tfs: np.ndarray) -> tuple[np.ndarray, ...]:
+    """將 (term, doc, tf) 三元組整理成以詞彙為列的 CSR 倒排表。"""
+    order = np.lexsort((doc_idx, term_ids))
+    term_ids, doc_idx, tfs = term_ids[order], doc_idx[order], tfs[order]
+    terms, starts = np.unique(term_ids, return_index=True)
+    indptr = np.append(starts, len(term_ids)).astype(np.int64)
+    return terms, indptr, doc_idx.astype(np.int32), tfs.astype(np.float32)
+
+
+class _Segment:
+    """單一不可變的索引分段，陣列以記憶體映射方式延遲載入。"""
+    def __init__(self, path: str, n_docs: int):
+        self.path = path
+        self.n_docs = n_docs
+        self._arrays = {}
+        self._doc_ids = None
+
+    def _array(self, name: str) -> np.ndarray:
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+        return self._arrays[name]
+
+    @property
+    def terms(self) -> np.ndarray:
+        return self._array("terms")
+
+    @property
+    def indptr(self) -> np.ndarray:
+        return self._array("indptr")
+
+    @property
+    def docs(self) -> np.ndarray:
+        return self._array("docs")
+
+    @property
+    def tfs(self) -> np.ndarray:
+        return self._array("tfs")
+
+    @property
+    def doc_len(self) -> np.ndarray:
+        return self._array("doc_len")
+
+    def facet(self, name: str) -> np.ndarray:
+        return self._array(f"facet_{name}")
+
+    @property
+    def doc_ids(self) -> list[str]:
+        if self._doc_ids is None:
+            with open(os.path.join(self.path, "doc_ids.json"), 'r', encoding='utf-8') as f:
+                self._doc_ids = json.load(f)
+        return self._doc_ids
+
+    def postings(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        """回傳某詞彙在此分段的 (文件索引, 詞頻)。"""
+        terms = self.terms
+        pos = int(np.searchsorted(terms, term_id))
+        if pos >= len(terms) or terms[pos] != term_id:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        start, end = self.indptr[pos], self.indptr[pos + 1]
+        return self.docs[start:end], self.tfs[start:end]
+
+    def triples(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """將 CSR 展開回 (term, doc, tf) 三元組，供合併分段使用。"""
+        counts = np.diff(self.indptr)
+        return np.repeat(np.asarray(self.terms), counts), np.asarray(self.docs), np.asarray(self.tfs)
+
+    @staticmethod
+    def write(path: str, doc_ids: list[str], token_id_lists: list[np.ndarray], facets: dict[str, np.ndarray]) -> dict:
+        """由已轉為 ID 的文件建立新分段並寫入磁碟。"""
+        os.makedirs(path, exist_ok=True)
+        term_parts, doc_parts, tf_parts = [], [], []
+        doc_len = np.zeros(len(doc_ids), dtype=np.int32)
+        for i, token_ids in enumerate(token_id_lists):
+            doc_len[i] = len(token_ids)
+            if len(token_ids) == 0:
+                continue
+            terms, counts = np.unique(token_ids, return_counts=True)
+            term_parts.append(terms)
+            doc_parts.append(np.full(len(terms), i, dtype=np.int32))
+            tf_parts.append(counts)
+
+        if term_parts:
+            terms, indptr, docs, tfs = _build_csr(
+                np.concatenate(term_parts), np.concatenate(doc_parts), np.concatenate(tf_parts)
+            )
+        else:
+            terms, indptr = np.empty(0, dtype=np.uint64), np.zeros(1, dtype=np.int64)
+            docs, tfs = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        return _Segment._save(path, doc_ids, terms, indptr, docs, tfs, doc_len, facets)
+
+    @staticmethod
+    def _save(path, doc_ids, terms, indptr, docs, tfs, doc_len, facets) -> dict:
+        os.makedirs(path, exist_ok=True)
+        for name, array in (("terms", terms), ("indptr", indptr), ("docs", docs), ("tfs", tfs), ("doc_len", doc_len)):
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        for name in FACET_ARRAYS:
+            np.save(os.path.join(path, f"facet_{name}.npy"), facets[name])
+        write_json(os.path.join(path, "doc_ids.json"), list(doc_ids))
+        return {
+            "name": os.path.basename(path),
+            "n_docs": len(doc_ids),
+            "total_len": int(np.sum(doc_len, dtype=np.int64))
+        }
+
+
+class LexicalIndex:
+    """持久化於磁碟的 BM25 索引。
+
+    索引由多個不可變分段組成，每個分段以 CSR 格式儲存倒排表，全域的詞彙表與 IDF
+    陣列放在索引根目錄。所有陣列皆以記憶體映射方式延遲載入；新增文件時只寫入新分段，
+    刪除則以墓碑記錄，分段過多或刪除比例過高時才合併。
+
+    索引只處理 token ID；文字由 `tokenizer` 轉換，其簽章記錄在 manifest 中，
+    換了斷詞器的索引會被視為過期。
+
+    每篇文件另存發布日期與字典編碼後的來源、查核結果，檢索時可依過濾條件
+    （見 metadata_filters）產生位元遮罩，在累加分數前就排除不符合的文件。
+    """
+    def __init__(self, path: str = LEXICAL_INDEX_PATH, k1: float = BM25_K1, b: float = BM25_B, tokenizer=None):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer or get_tokenizer()
+        self._reset_cache()
+        self.manifest = self._read_manifest()
+
+    def _reset_cache(self):
+        self._segments = None
+        self._terms = None
+        self._idf = None
+        self._doc_ids = None
+        self._id_to_index = None
+        self._doc_len = None
+        self._deleted = None
+        self._deleted_mask = None
+        self._length_norm = None
+        self._facets = None
+        self._filter_masks = {}
+
+    # ---- 中繼資料 ----
+
+    def _read_manifest(self) -> dict:
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {
+                "version": FORMAT_VERSION,
+                "tokenizer": self.tokenizer.signature,
+                "segments": [],
+                "n_docs": 0,
+                "total_len": 0,
+                "facets": {},
+                "fingerprint": 0
+            }
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self):
+        os.makedirs(self.path, exist_ok=True)
+        write_json(os.path.join(self.path, MANIFEST_FILE), self.manifest)
+
+    def exists(self) -> bool:
+        """索引是否已經建立過。"""
+        return os.path.exists(os.path.join(self.path, MANIFEST_FILE))
+
+    def is_compatible(self) -> bool:
+        """索引的格式版本與斷詞器是否與目前的程式相同。"""
+        return self.manifest.get("version") == FORMAT_VERSION and self.manifest.get("tokenizer") == self.tokenizer.signature
+
+    @property
+    def n_docs(self) -> int:
+        """所有分段中的文件數（包含尚未合併掉的已刪除文件）。"""
+        return self.manifest["n_docs"]
+
+    def __len__(self) -> int:
+        return self.n_docs - len(self.deleted)
+
+    @property
+    def avgdl(self) -> float:
+        return self.manifest["total_len"] / self.n_docs if self.n_docs else 0.0
+
+    # ---- 延遲載入的陣列 ----
+
+    @property
+    def segments(self) -> list[_Segment]:
+        if self._segments is None:
+            self._segments = [
+                _Segment(os.path.join(self.path, seg["name"]), seg["n_docs"])
+                for seg in self.manifest["segments"]
+            ]
+        return self._segments
+
+    @property
+    def terms(self) -> np.ndarray:
+        if self._terms is None:
+            self._terms = self._load_global("terms", np.uint64)
+        return self._terms
+
+    @property
+    def idf(self) -> np.ndarray:
+        if self._idf is None:
+            self._idf = self._load_global("idf", np.float32)
+        return self._idf
+
+    def _load_global(self, name: str, dtype) -> np.ndarray:
+        array_path = os.path.join(self.path, f"{name}.npy")
+        if not os.path.exists(array_path):
+            return np.empty(0, dtype=dtype)
+        return np.load(array_path, mmap_mode='r')
+
+    @property
+    def doc_ids(self) -> list[str]:
+        """全域文件索引對應到 Chroma chunk ID 的列表。"""
+        if self._doc_ids is None:
+            self._doc_ids = [doc_id for seg in self.segments for doc_id in seg.doc_ids]
+        return self._doc_ids
+
+    @property
+    def doc_len(self) -> np.ndarray:
+        if self._doc_len is None:
+            parts = [np.asarray(seg.doc_len, dtype=np.float32) for seg in self.segments]
+            self._doc_len = np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+        return self._doc_len
+
+    @property
+    def deleted(self) -> set[int]:
+        """已刪除文件的全域索引位置（以位置而非 ID 記錄，才能區分同一 ID 的新舊版本）。"""
+        if self._deleted is None:
+            deleted_path = os.path.join(self.path, DELETED_FILE)
+            if os.path.exists(deleted_path):
+                with open(deleted_path, 'r', encoding='utf-8') as f:
+                    self._deleted = set(json.load(f))
+            else:
+                self._deleted = set()
+        return self._deleted
+
+    @property
+    def deleted_mask(self) -> np.ndarray | None:
+        """已刪除文件的布林遮罩；沒有刪除時回傳 None 以省去遮罩運算。"""
+        if self._deleted_mask is None and self.deleted:
+            mask = np.zeros(self.n_docs, dtype=bool)
+            mask[list(self.deleted)] = True
+            self._deleted_mask = mask
+        return self._deleted_mask
+
+    @property
+    def facets(self) -> dict[str, np.ndarray]:
+        """每篇文件的過濾欄位：DATE_FIELD 為 YYYYMMDD 整數，其餘為 manifest 中字典的編號（-1 為未知）。"""
+        if self._facets is None:
+            self._facets = {}
+            for name in FACET_ARRAYS:
+                parts = [np.asarray(seg.facet(name), dtype=np.int32) for seg in self.segments]
+                self._facets[name] = np.concatenate(parts) if parts else np.empty(0, dtype=np.int32)
+        return self._facets
+
+    def _encode_facets(self, metadatas: list[dict] | None, n_docs: int) -> dict[str, np.ndarray]:
+        """把 chunk 的 metadata 轉成分段中的過濾欄位陣列，新的欄位值會加到 manifest 的字典中。"""
+        return encode_facets(metadatas or [{}] * n_docs, self.manifest.setdefault("facets", {}))
+
+    def excluded_mask(self, filters: dict | None) -> np.ndarray | None:
+        """已刪除或不符合過濾條件（由 metadata_filters.normalize_filters 整理）的文件遮罩；沒有要排除的文件時回傳 None。"""
+        if not filters:
+            return self.deleted_mask
+        key = filters_key(filters)
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            allowed = facet_mask(self.facets, self.manifest.get("facets", {}), filters, self.n_docs)
+            if self.deleted_mask is not None:
+                allowed &= ~self.deleted_mask
+            mask = ~allowed
+            if len(self._filter_masks) >= FILTER_MASK_CACHE_SIZE:
+                self._filter_masks.clear()
+            self._filter_masks[key] = mask
+        return mask
+
+    def _positions(self, ids) -> set[int]:
+        """回傳給定 chunk ID 目前有效版本的全域索引位置。"""
+        if self._id_to_index is None:
+            self._id_to_index = {}
+            for i, doc_id in enumerate(self.doc_ids):
+                if i not in self.deleted:
+                    self._id_to_index[doc_id] = i
+        return {self._id_to_index[doc_id] for doc_id in ids if doc_id in self._id_to_index}
+
+    def live_ids(self) -> set[str]:
+        """目前有效（未刪除）的 chunk ID 集合。"""
+        return {doc_id for i, doc_id in enumerate(self.doc_ids) if i not in self.deleted}
+
+    @property
+    def fingerprint(self) -> int:
+        """有效 chunk ID 的 ids_fingerprint，記錄在 manifest 中；舊版索引沒有記錄時才從文件列表計算。"""
+        if "fingerprint" not in self.manifest:
+            return ids_fingerprint(self.live_ids())
+        return self.manifest["fingerprint"]
+
+    # ---- 寫入 ----
+
+    def add_documents(self, ids: list[str], token_id_lists: list[np.ndarray], metadatas: list[dict] | None = None):
+        """將新的 chunk（已轉為 token ID）寫成一個新分段，並更新全域詞彙表與 IDF。
+
+        metadatas 為各 chunk 的 metadata，用於檢索時的過濾；沒有提供時這些 chunk 不會符合任何過濾條件。
+        """
+        if not ids:
+            return
+        # 重新加入既有的 ID 視為更新：舊版本先標記刪除
+        replaced = self._positions(ids)
+        deleted = self.deleted | replaced
+        fingerprint = self.fingerprint ^ ids_fingerprint(self.doc_ids[i] for i in replaced) ^ ids_fingerprint(ids)
+
+        segment_name = f"seg_{uuid.uuid4().hex[:12]}"
+        seg_info = _Segment.write(
+            os.path.join(self.path, segment_name), ids, token_id_lists, self._encode_facets(metadatas, len(ids))
+        )
+
+        new_terms = np.unique(np.concatenate(token_id_lists)) if token_id_lists else np.empty(0, dtype=np.uint64)
+        df_delta = self._document_frequencies(token_id_lists, new_terms)
+        self._merge_global_stats(new_terms, df_delta, seg_info["n_docs"])
+
+        self.manifest["segments"].append(seg_info)
+        self.manifest["n_docs"] += seg_info["n_docs"]
+        self.manifest["total_len"] += seg_info["total_len"]
+        self.manifest["fingerprint"] = fingerprint
+        self._save_deleted(deleted)
+        self._write_global_stats()
+        self._write_manifest()
+        self._reset_cache()
+        self._maybe_compact()
+
+    def add_texts(self, ids: list[str], texts: list[str], metadatas: list[dict] | None = None):
+        """以索引的斷詞器處理文字後加入索引。"""
+        self.add_documents(ids, self.tokenizer.encode_batch(texts), metadatas)
+
+    def delete(self, ids):
+        """以墓碑方式刪除 chunk，待合併時才真正移除。"""
+        if not ids:
+            return
+        positions = self._positions(ids)
+        if not positions:
+            return
+        self.manifest["fingerprint"] = self.fingerprint ^ ids_fingerprint(self.doc_ids[i] for i in positions)
+        self._save_deleted(self.deleted | positions)
+        self._write_manifest()
+        self._reset_cache()
+        self._maybe_compact()
+
+    def clear(self):
+        """移除所有分段與全域統計，改用目前的斷詞器重新開始。"""
+        old_segments = [seg.path for seg in self.segments]
+        for name in ("terms", "df", "idf"):
+            array_path = os.path.join(self.path, f"{name}.npy")
+            if os.path.exists(array_path):
+                os.remove(array_path)
+        self.manifest = {
+            "version": FORMAT_VERSION,
+            "tokenizer": self.tokenizer.signature,
+            "segments": [],
+            "n_docs": 0,
+            "total_len": 0,
+            "facets": {},
+            "fingerprint": 0
+        }
+        self._save_deleted(set())
+        self._write_manifest()
+        self._reset_cache()
+        for path in old_segments:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _save_deleted(self, deleted: set[int]):
+        os.makedirs(self.path, exist_ok=True)
+        write_json(os.path.join(self.path, DELETED_FILE), sorted(deleted))
+
+    @staticmethod
+    def _document_frequencies(token_id_lists: list[np.ndarray], terms: np.ndarray) -> np.ndarray:
+        df = np.zeros(len(terms), dtype=np.int64)
+        for token_ids in token_id_lists:
+            if len(token_ids):
+                df[np.searchsorted(terms, np.unique(token_ids))] += 1
+        return df
+
+    def _merge_global_stats(self, new_terms: np.ndarray, df_delta: np.ndarray, added_docs: int):
+        old_terms = np.asarray(self.terms)
+        old_df = self._current_df(old_terms)
+        merged = np.union1d(old_terms, new_terms).astype(np.uint64)
+        df = np.zeros(len(merged), dtype=np.int64)
+        df[np.searchsorted(merged, old_terms)] += old_df
+        df[np.searchsorted(merged, new_terms)] += df_delta
+        self._pending_stats = (merged, df, self.n_docs + added_docs)
+
+    def _current_df(self, terms: np.ndarray) -> np.ndarray:
+        df_path = os.path.join(self.path, "df.npy")
+        if not len(terms) or not os.path.exists(df_path):
+            return np.zeros(len(terms), dtype=np.int64)
+        return np.load(df_path).astype(np.int64)
+
+    def _write_global_stats(self):
+        terms, df, n_docs = self._pending_stats
+        # 使用 Lucene 式的 IDF，確保高頻詞彙的權重不會變成負值
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        os.makedirs(self.path, exist_ok=True)
+        for name, array in (("terms", terms), ("df", df), ("idf", idf)):
+            tmp_path = os.path.join(self.path, f"{name}.tmp.npy")
+            np.save(tmp_path, array)
+            os.replace(tmp_path, os.path.join(self.path, f"{name}.npy"))
+        self._pending_stats = None
+
+    def _maybe_compact(self):
+        too_many_segments = len(self.manifest["segments"]) > LEXICAL_MAX_SEGMENTS
+        too_many_deleted = self.n_docs and len(self.deleted) / self.n_docs > LEXICAL_MAX_DELETED_RATIO
+        if too_many_segments or too_many_deleted:
+            self.compact()
+
+    def compact(self):
+        """將所有分段合併為單一分段，並清除已刪除的文件。"""
+        if not self.segments:
+            return
+        print(f"Compacting lexical index ({len(self.segments)} segments, {len(self.deleted)} deleted)...")
+        mask = self.deleted_mask
+        keep = ~mask if mask is not None else np.ones(self.n_docs, dtype=bool)
+        new_index = np.cumsum(keep) - 1
+
+        term_parts, doc_parts, tf_parts = [], [], []
+        offset = 0
+        for seg in self.segments:
+            terms, docs, tfs = seg.triples()
+            global_docs = docs.astype(np.int64) + offset
+            alive = keep[global_docs]
+            term_parts.append(terms[alive])
+            doc_parts.append(new_index[global_docs[alive]])
+            tf_parts.append(tfs[alive])
+            offset += seg.n_docs
+
+        doc_ids = [doc_id for doc_id, alive in zip(self.doc_ids, keep) if alive]
+        doc_len = np.asarray(self.doc_len, dtype=np.int32)[keep]
+        facets = {name: column[keep] for name, column in self.facets.items()}
+        terms, indptr, docs, tfs = _build_csr(
+            np.concatenate(term_parts), np.concatenate(doc_parts), np.concatenate(tf_parts)
+        )
+        old_segments = [seg.path for seg in self.segments]
+        segment_name = f"seg_{uuid.uuid4().hex[:12]}"
+        seg_info = _Segment._save(os.path.join(self.path, segment_name), doc_ids, terms, indptr, docs, tfs, doc_len, facets)
+
+        df = np.diff(indptr)
+        self._pending_stats = (terms, df, len(doc_ids))
+        self._write_global_stats()
+        self.manifest["segments"] = [seg_info]
+        self.manifest["n_docs"] = seg_info["n_docs"]
+        self.manifest["total_len"] = seg_info["total_len"]
+        self._save_deleted(set())
+        self._write_manifest()
+        self._reset_cache()
+        for path in old_segments:
+            shutil.rmtree(path, ignore_errors=True)
+
+    # ---- 查詢 ----
+
+    @property
+    def length_norm(self) -> np.ndarray:
+        """每篇文件的長度正規化項 k1 * (1 - b + b * dl / avgdl)，只計算一次。"""
+        if self._length_norm is None:
+            self._length_norm = (self.k1 * (1 - self.b + self.b * self.doc_len / self.avgdl)).astype(np.float32)
+        return self._length_norm
+
+    def _gather_postings(self, term_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """收集查詢詞彙在所有分段中的倒排表，回傳 (全域文件索引, 各筆 posting 的 BM25 分數貢獻)。"""
+        terms, idf = self.terms, self.idf
+        if not len(terms) or not len(term_ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # 重複的查詢詞彙以次數加權，結果與逐詞累加相同
+        query_terms, counts = np.unique(term_ids, return_counts=True)
+        pos = np.searchsorted(terms, query_terms)
+        found = pos < len(terms)
+        found[found] = terms[pos[found]] == query_terms[found]
+        query_terms = query_terms[found]
+        weights = (idf[pos[found]] * counts[found]).astype(np.float32)
+
+        doc_parts, tf_parts, weight_parts = [], [], []
+        offset = 0
+        for seg in self.segments:
+            seg_terms, indptr = seg.terms, seg.indptr
+            seg_pos = np.searchsorted(seg_terms, query_terms)
+            for term_id, p, weight in zip(query_terms, seg_pos, weights):
+                if p < len(seg_terms) and seg_terms[p] == term_id:
+                    start, end = indptr[p], indptr[p + 1]
+                    doc_parts.append(seg.docs[start:end].astype(np.int64) + offset)
+                    tf_parts.append(seg.tfs[start:end])
+                    weight_parts.append(np.full(end - start, weight, dtype=np.float32))
+            offset += seg.n_docs
+
+        if not doc_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        docs = np.concatenate(doc_parts)
+        tfs = np.concatenate(tf_parts)
+        contributions = np.concatenate(weight_parts) * tfs * (self.k1 + 1) / (tfs + self.length_norm[docs])
+        return docs, contributions
+
+    def get_scores(self, query_token_ids: np.ndarray) -> np.ndarray:
+        """計算查詢對所有文件的 BM25 分數（與 rank_bm25 的 get_scores 介面相同）。"""
+        docs, contributions = self._gather_postings(query_token_ids)
+        scores = np.bincount(docs, weights=contributions, minlength=self.n_docs).astype(np.float32)
+        mask = self.deleted_mask
+        if mask is not None:
+            scores[mask] = 0.0
+        return scores
+
+    def top_k(self, query_token_ids: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """回傳單一查詢分數最高的 k 篇文件 (全域文件索引, 分數)，依分數遞減排序。"""
+        return self.batch_top_k([query_token_ids], k)[0]
+
+    def batch_top_k(self, queries: list[np.ndarray], k: int, filters: dict | None = None) -> list[tuple[np.ndarray, np.ndarray]]:
+        """在一次呼叫中為多個查詢計算 BM25 top-k，各自依分數遞減排序；filters 只保留符合條件的文件。"""
+        if not self.n_docs or k <= 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+        excluded = self.excluded_mask(filters) if filters else None
+        return [self._select_top_k(*self._gather_postings(token_ids), k, excluded) for token_ids in queries]
+
+    def _select_top_k(
+        self, docs: np.ndarray, contributions: np.ndarray, k: int, excluded: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """把 posting 貢獻累加成文件分數，並以 argpartition 選出前 k 名。
+
+        只會觸及至少包含一個查詢詞彙的文件：posting 數量遠小於語料時以排序去重累加，
+        否則改用長度為語料大小的 bincount，兩者都不需要對整個語料排序。
+        有過濾遮罩時先剔除被排除文件的 posting，再累加分數。
+        """
+        if excluded is not None:
+            keep = ~excluded[docs]
+            docs, contributions = docs[keep], contributions[keep]
+        if len(docs) * SPARSE_ACCUMULATION_RATIO < self.n_docs:
+            candidates, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=contributions)
+        else:
+            dense_scores = np.bincount(docs, weights=contributions, minlength=self.n_docs)
+            candidates = np.flatnonzero(dense_scores)
+            scores = dense_scores[candidates]
+
+        mask = self.deleted_mask if excluded is None else None
+        if mask is not None:
+            alive = ~mask[candidates]
+            candidates, scores = candidates[alive], scores[alive]
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        order = top[np.argsort(-scores[top], kind='stable')]
+        return candidates[order].astype(np.int64), scores[order].astype(np.float32)
+
+    # ---- 與 Chroma 同步 ----
+
+    def is_stale(self, collection) -> bool:
+        """若索引尚未建立、格式或斷詞器已更換，或有效的 chunk ID 與 Chroma collection 不一致，則視為過期。
+
+        先比較文件數，數量相同時再比較 ID 集合的指紋，才能發現數量恰好相同的新增與刪除。
+        """
+        return (
+            not self.exists()
+            or not self.is_compatible()
+            or len(self) != collection.count()
+            or self.fingerprint != ids_fingerprint(collection.get(include=[])['ids'])
+        )
+
+    def sync_with_collection(self, collection, batch_size: int = 1000):
+        """比對 Chroma 中的 chunk ID，只補上新增的 chunk 並刪除已移除的 chunk。"""
+        if self.exists() and not self.is_compatible():
+            print(f"Lexical index was built with format version {self.manifest.get('version')} "
+                  f"and tokenizer '{self.manifest.get('tokenizer')}'. Rebuilding...")
+            self.clear()
+
+        current_ids = collection.get(include=[])['ids']
+        known_ids = self.live_ids()
+        current_set = set(current_ids)
+
+        removed = known_ids - current_set
+        if removed:
+            print(f"Removing {len(removed)} stale chunks from lexical index.")
+            self.delete(removed)
+
+        added = [doc_id for doc_id in current_ids if doc_id not in known_ids]
+        for start in range(0, len(added), batch_size):
+            batch = collection.get(ids=added[start:start + batch_size], include=["documents", "metadatas"])
+            self.add_texts(batch['ids'], batch['documents'], batch['metadatas'])
+        if added:
+            print(f"Added {len(added)} new chunks to lexical index.")
+        # 舊版索引的 manifest 沒有指紋，同步後補上
+        self.manifest["fingerprint"] = self.fingerprint
+        self._write_manifest()
@@ -0,0 +1,132 @@
+# knowledge_base/metadata_filters.py
+"""檢索前的 metadata 過濾條件：發布日期範圍、來源與查核結果。
+
+過濾條件以 dict 表示，可用的鍵為 date_from、date_to（含當天）、source 與 status（字串或字串列表）。
+同一份條件會轉成 Chroma 的 where 子句，也會由 BM25 索引轉成文件的位元遮罩，
+讓不符合的 chunk 在評分前就被排除，不必占用 k 個名額、再花一次 LLM 呼叫才被淘汰。
+"""
+import datetime
+import re
+
+import numpy as np
+
+# 建索引時寫入 chunk metadata 的數值日期欄位 (YYYYMMDD，未知為 0)，可直接比較大小
+DATE_FIELD = "publication_day"
+# 以值比對的欄位，同時也是 BM25 索引中以字典編碼儲存的欄位
+FACET_FIELDS = ("source", "status")
+
+_DATE_PATTERN = re.compile(r'(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})')
+
+
+def date_to_int(value) -> int:
+    """把 2025-09-12、2025/9/12、2025年9月12日、20250912 或 date 轉成 20250912；無法解析時回傳 0。"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.year * 10000 + value.month * 100 + value.day
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        return 0
+    value = value.strip()
+    match = _DATE_PATTERN.search(value)
+    if match:
+        year, month, day = map(int, match.groups())
+    elif re.fullmatch(r'\d{8}', value):
+        year, month, day = int(value[:4]), int(value[4:6]), int(value[6:])
+    else:
+        return 0
+    try:
+        datetime.date(year, month, day)
+    except ValueError:
+        return 0
+    return year * 10000 + month * 100 + day
+
+
+def normalize_filters(filters: dict | None) -> dict | None:
+    """檢查並整理過濾條件：日期轉成整數、來源與查核結果轉成排序後的列表；沒有任何條件時回傳 None。
+
+    條件格式錯誤時拋出 ValueError。
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("Filters must be an object.")
+    unknown = set(filters) - {"date_from", "date_to", *FACET_FIELDS}
+    if unknown:
+        raise ValueError(f"Unknown filter fields: {', '.join(sorted(unknown))}")
+
+    normalized = {}
+    for key in ("date_from", "date_to"):
+        if filters.get(key) in (None, ""):
+            continue
+        day = date_to_int(filters[key])
+        if not day:
+            raise ValueError(f"Filter '{key}' is not a valid date: {filters[key]!r}")
+        normalized[key] = day
+    if normalized.get("date_from", 0) > normalized.get("date_to", 99999999):
+        raise ValueError("Filter 'date_from' is later than 'date_to'.")
+    for key in FACET_FIELDS:
+        values = filters.get(key)
+        if values in (None, "", []):
+            continue
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, (list, tuple)) or not all(isinstance(value, str) for value in values):
+            raise ValueError(f"Filter '{key}' must be a string or a list of strings.")
+        normalized[key] = sorted(set(values))
+    return normalized or None
+
+
+def to_chroma_where(filters: dict | None) -> dict | None:
+    """把整理過的過濾條件轉成 Chroma 的 where 子句。"""
+    if not filters:
+        return None
+    clauses = []
+    if "date_from" in filters:
+        clauses.append({DATE_FIELD: {"$gte": filters["date_from"]}})
+    if "date_to" in filters:
+        clauses.append({DATE_FIELD: {"$lte": filters["date_to"]}})
+    for key in FACET_FIELDS:
+        if key in filters:
+            clauses.append({key: {"$in": filters[key]}})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def filters_key(filters: dict | None) -> tuple:
+    """可雜湊的過濾條件，用於快取與分組。"""
+    return tuple(sorted((key, tuple(value) if isinstance(value, list) else value) for key, value in (filters or {}).items()))
+
+
+def encode_facets(metadatas: list[dict], vocabulary: dict[str, list]) -> dict[str, np.ndarray]:
+    """把 chunk 的 metadata 轉成過濾欄位陣列：DATE_FIELD 為整數日期，其餘為 vocabulary 中的編號（-1 為未知）。
+
+    新出現的欄位值會直接加到 vocabulary 中。
+    """
+    facets = {DATE_FIELD: np.array([int((metadata or {}).get(DATE_FIELD) or 0) for metadata in metadatas], dtype=np.int32)}
+    for name in FACET_FIELDS:
+        values = vocabulary.setdefault(name, [])
+        codes = {value: i for i, value in enumerate(values)}
+        column = np.full(len(metadatas), -1, dtype=np.int32)
+        for i, metadata in enumerate(metadatas):
+            value = (metadata or {}).get(name)
+            if value is None:
+                continue
+            if value not in codes:
+                codes[value] = len(values)
+                values.append(value)
+            column[i] = codes[value]
+        facets[name] = column
+    return facets
+
+
+def facet_mask(facets: dict[str, np.ndarray], vocabulary: dict[str, list], filters: dict, n_docs: int) -> np.ndarray:
+    """回傳符合（整理過的）過濾條件的文件布林遮罩。"""
+    allowed = np.ones(n_docs, dtype=bool)
+    if "date_from" in filters:
+        allowed &= facets[DATE_FIELD] >= filters["date_from"]
+    if "date_to" in filters:
+        allowed &= facets[DATE_FIELD] <= filters["date_to"]
+    for name in FACET_FIELDS:
+        if name in filters:
+            codes = [i for i, value in enumerate(vocabulary.get(name, [])) if value in filters[name]]
+            allowed &= np.isin(facets[name], codes)
+    return allowed
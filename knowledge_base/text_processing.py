@@ -1,6 +1,46 @@
-
 # knowledge_base/text_processing.py
+import hashlib
 import re
+import unicodedata
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
+
+import numpy as np
+
+from utils.config import (
+    LEXICAL_TOKENIZER,
+    TOKENIZER_NGRAM_RANGE,
+    TOKENIZER_USER_DICT,
+    STRIP_BOILERPLATE,
+    NEAR_DUPLICATE_THRESHOLD,
+    NEAR_DUPLICATE_NUM_PERM,
+    NEAR_DUPLICATE_BANDS,
+    NEAR_DUPLICATE_SHINGLE_SIZE
+)
+
+# 中日韓統一表意文字（含擴充區與相容字）
+_CJK_RANGES = ((0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF), (0x20000, 0x2FA1F))
+# 非中文的詞彙（英文、數字）以整個詞為單位
+_WORD_PATTERN = re.compile(r'[0-9a-zÀ-ɏ]+', re.IGNORECASE)
+# 每個字元的 Unicode 碼位最多 21 位元，n-gram 直接把碼位打包成 ID，不需要詞彙表
+_CODEPOINT_BITS = 21
+# 雜湊詞彙 ID 的最高位元固定為 1，與 n-gram 的 ID 空間不重疊
+_HASHED_WORD_FLAG = 1 << 63
+
+# TFC 報告頁首的欄位標籤（單獨一行，值在下一行）
+_REPORT_FIELD_LABELS = {
+    "發佈": "publication_date",
+    "更新": "updated_date",
+    "報告編號": "report_id",
+}
+_FIELD_LABEL_PATTERN = re.compile(r'^([^\s：:]{1,8})[：:]$')
+# 每篇報告都重複出現的網站元件：分享按鈕與頁內目錄
+_BOILERPLATE_PATTERNS = [re.compile(pattern) for pattern in (
+    r'^Share on \w+$',
+    r'^(Email|Print) this Page$',
+)]
+_TABLE_OF_CONTENTS = ("內容", "背景", "查核")
+
 
 def clean_text(text: str) -> str:
     """簡單的文本清理函式。"""
@@ -8,9 +48,245 @@ def clean_text(text: str) -> str:
     text = text.strip()
     return text
 
+def _is_boilerplate(line: str) -> bool:
+    return any(pattern.match(line) for pattern in _BOILERPLATE_PATTERNS)
+
+def extract_report_fields(content: str) -> tuple[str, dict]:
+    """拆解 TFC 報告的頁首，回傳 (去除頁首與網站元件後的內文, 結構化欄位)。
+
+    頁首的格式為：標題、副標、查核結果、分類，接著是「發佈：」「報告編號：」「責任編輯：」等
+    標籤與值各佔一行的欄位（整組會重複一次），再來是頁內目錄與分享按鈕。
+    標題與副標保留在內文開頭；找不到「發佈：」時只移除網站元件。
+    """
+    lines = [line.strip() for line in content.split('\n')]
+    lines = [line for line in lines if line and not _is_boilerplate(line)]
+    header_start = next((i for i, line in enumerate(lines) if _FIELD_LABEL_PATTERN.match(line)), None)
+    if header_start is None or header_start < 2 or lines[header_start][:-1] not in _REPORT_FIELD_LABELS:
+        return "\n".join(lines), {}
+
+    fields = {"status": lines[header_start - 2], "category": lines[header_start - 1]}
+    i = header_start
+    # 欄位區：標籤後面接著值；重複的一組頁首以相同的查核結果與分類開頭
+    while i < len(lines):
+        match = _FIELD_LABEL_PATTERN.match(lines[i])
+        if match:
+            key = _REPORT_FIELD_LABELS.get(match.group(1))
+            has_value = i + 1 < len(lines) and not _FIELD_LABEL_PATTERN.match(lines[i + 1])
+            if key and has_value:
+                fields.setdefault(key, lines[i + 1])
+            i += 2 if has_value else 1
+        elif lines[i:i + 2] == [fields["status"], fields["category"]]:
+            i += 2
+        elif lines[i] in _TABLE_OF_CONTENTS or lines[i] in ("、", "，"):
+            i += 1
+        else:
+            break
+    title_lines = lines[:header_start - 2]
+    if title_lines:
+        fields["title"] = title_lines[0]
+    return "\n".join(title_lines + lines[i:]), fields
+
+def preprocess_document(doc: dict) -> dict:
+    """清理單篇文件：去除頁首與網站元件、把頁首的結構化欄位寫入文件，再整理空白。
+
+    頁首解析出的查核結果、發佈日期與報告編號優先於爬蟲從列表頁取得的值
+    （列表頁的「狀態」實際上常是分類）。
+    """
+    if not isinstance(doc.get('content'), str):
+        return doc
+    content = doc['content']
+    if STRIP_BOILERPLATE:
+        content, fields = extract_report_fields(content)
+        for key in ("status", "category", "publication_date", "updated_date", "report_id"):
+            if fields.get(key):
+                doc[key] = fields[key]
+        if fields.get("title") and doc.get('title', 'N/A') in ('', 'N/A'):
+            doc['title'] = fields["title"]
+    doc['content'] = clean_text(content)
+    return doc
+
 def preprocess_documents(documents: list[dict]) -> list[dict]:
     """對整批文件進行預處理。"""
     for doc in documents:
-        if 'content' in doc and isinstance(doc['content'], str):
-            doc['content'] = clean_text(doc['content'])
+        preprocess_document(doc)
     return documents
+
+def iter_preprocessed(documents: Iterable[dict]) -> Iterator[dict]:
+    """逐篇預處理文件的產生器版本，供串流建索引使用。"""
+    for doc in documents:
+        yield preprocess_document(doc)
+
+@lru_cache(maxsize=1 << 18)
+def _hash_word(word: str) -> int:
+    return _HASHED_WORD_FLAG | int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=7).digest(), 'little')
+
+def hash_words(words: list[str]) -> np.ndarray:
+    """將詞彙字串映射為穩定的 64 位元整數 ID（與行程、平台無關）。"""
+    return np.fromiter(map(_hash_word, words), dtype=np.uint64, count=len(words))
+
+
+class CharNgramTokenizer:
+    """中文字元 n-gram 斷詞器。
+
+    連續的中文字元切成 n-gram（預設為單字加雙字），英文與數字則以整個詞為單位。
+    中文 n-gram 的 ID 由字元碼位直接打包而成，整段文字以 NumPy 一次向量化處理。
+    """
+    def __init__(self, ngram_range: tuple[int, int] = TOKENIZER_NGRAM_RANGE):
+        self.min_n, self.max_n = ngram_range
+        if not 1 <= self.min_n <= self.max_n <= 3:
+            raise ValueError(f"Unsupported n-gram range: {ngram_range}")
+        self.signature = f"char_ngram:{self.min_n}-{self.max_n}"
+
+    def encode(self, text: str) -> np.ndarray:
+        """將文字轉為 token ID 陣列。"""
+        return self.encode_batch([text])[0]
+
+    def encode_batch(self, texts: list[str]) -> list[np.ndarray]:
+        """一次處理多段文字：串接後整批向量化斷詞，再依位置切回各段。"""
+        if not texts:
+            return []
+        # 以換行串接：換行不是中文字元，n-gram 不會跨越兩段文字
+        joined = "\n".join(texts)
+        starts = np.cumsum([0] + [len(text) + 1 for text in texts[:-1]])
+
+        raw = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32).copy()
+        # 全形英數與符號轉半形（等同 NFKC 對這個區段的處理，但不需逐字呼叫 unicodedata）
+        fullwidth = (raw >= 0xFF01) & (raw <= 0xFF5E)
+        if fullwidth.any():
+            raw[fullwidth] -= 0xFEE0
+            joined = raw.tobytes().decode('utf-32-le')
+        is_cjk = np.zeros(len(raw), dtype=bool)
+        for low, high in _CJK_RANGES:
+            is_cjk |= (raw >= low) & (raw <= high)
+        codepoints = raw.astype(np.uint64)
+
+        id_parts, position_parts = [], []
+        for n in range(self.min_n, self.max_n + 1):
+            if len(codepoints) < n:
+                break
+            length = len(codepoints) - n + 1
+            valid = is_cjk[:length].copy()
+            ids = codepoints[:length].copy()
+            for offset in range(1, n):
+                valid &= is_cjk[offset:length + offset]
+                ids = (ids << np.uint64(_CODEPOINT_BITS)) | codepoints[offset:length + offset]
+            id_parts.append(ids[valid])
+            position_parts.append(np.flatnonzero(valid))
+
+        matches = list(_WORD_PATTERN.finditer(joined))
+        id_parts.append(hash_words([m.group().lower() for m in matches]))
+        position_parts.append(np.fromiter((m.start() for m in matches), dtype=np.int64, count=len(matches)))
+
+        ids = np.concatenate(id_parts)
+        owners = np.searchsorted(starts, np.concatenate(position_parts), side='right') - 1
+        order = np.argsort(owners, kind='stable')
+        bounds = np.searchsorted(owners[order], np.arange(1, len(texts)))
+        return np.split(ids[order], bounds)
+
+
+class DictionaryTokenizer:
+    """以 jieba 詞典斷詞的斷詞器（選用，需要另外安裝 jieba）。"""
+    def __init__(self, user_dict: str | None = TOKENIZER_USER_DICT):
+        try:
+            import jieba
+        except ImportError as e:
+            raise ImportError("The dictionary tokenizer requires jieba. Install it with `pip install jieba`.") from e
+        self._tokenizer = jieba.Tokenizer()
+        if user_dict:
+            self._tokenizer.load_userdict(user_dict)
+        self.signature = f"jieba:{user_dict or 'default'}"
+
+    def encode(self, text: str) -> np.ndarray:
+        """將文字轉為 token ID 陣列。"""
+        text = unicodedata.normalize('NFKC', text).lower()
+        words = [w for w in self._tokenizer.cut_for_search(text) if not w.isspace() and re.search(r'\w', w)]
+        return hash_words(words)
+
+    def encode_batch(self, texts: list[str]) -> list[np.ndarray]:
+        """逐段斷詞（jieba 沒有批次介面）。"""
+        return [self.encode(text) for text in texts]
+
+
+TOKENIZERS = {
+    "char_ngram": CharNgramTokenizer,
+    "jieba": DictionaryTokenizer,
+}
+
+def get_tokenizer(name: str = LEXICAL_TOKENIZER):
+    """依名稱取得斷詞器。"""
+    if name not in TOKENIZERS:
+        raise ValueError(f"Unknown tokenizer '{name}'. Available: {', '.join(TOKENIZERS)}")
+    return TOKENIZERS[name]()
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 的最後混合步驟：把 n-gram 打包的碼位打散成均勻分布的 64 位元雜湊。"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+@lru_cache(maxsize=4)
+def _minhash_seeds(num_perm: int) -> np.ndarray:
+    # 固定的種子，簽章在不同行程與不同次執行之間可以互相比較
+    return np.random.default_rng(20240521).integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+@lru_cache(maxsize=4)
+def _shingle_tokenizer(shingle_size: int) -> "CharNgramTokenizer":
+    return CharNgramTokenizer((shingle_size, shingle_size))
+
+def minhash_batch(
+    texts: list[str],
+    num_perm: int = NEAR_DUPLICATE_NUM_PERM,
+    shingle_size: int = NEAR_DUPLICATE_SHINGLE_SIZE
+) -> list[np.ndarray | None]:
+    """計算每段文字以字元 shingle 為特徵的 MinHash 簽章（num_perm 個 uint32）；沒有任何 shingle 的文字回傳 None。"""
+    seeds = _minhash_seeds(num_perm)
+    signatures = []
+    with np.errstate(over='ignore'):
+        for shingles in _shingle_tokenizer(shingle_size).encode_batch(texts):
+            if not len(shingles):
+                signatures.append(None)
+                continue
+            hashes = _mix64(np.unique(shingles)[:, None] ^ seeds[None, :])
+            signatures.append((hashes.min(axis=0) >> np.uint64(32)).astype(np.uint32))
+    return signatures
+
+
+class NearDuplicateFilter:
+    """以 MinHash 與 LSH 分段偵測近似重複的文字；估計的 Jaccard 相似度達到 threshold 即視為重複。
+
+    簽章切成 bands 段，任一段完全相同的項目才是候選，再以整個簽章估計相似度確認。
+    同一個 key（文章網址）內的文字不互相比對，重新索引有變動的文章時，新版本不會被自己的舊版本擋掉。
+    """
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD, bands: int = NEAR_DUPLICATE_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self._signatures = []
+        self._keys = []
+        self._buckets = [{} for _ in range(bands)]
+        # 被呼叫端判定為重複而略過的文字數
+        self.skipped = 0
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [band.tobytes() for band in np.array_split(signature, self.bands)]
+
+    def find(self, signature: np.ndarray, key: str = "") -> str | None:
+        """回傳與 signature 近似重複的既有項目所屬的 key；沒有時回傳 None。"""
+        checked = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            for index in buckets.get(band_key, ()):
+                if index in checked or self._keys[index] == key:
+                    continue
+                checked.add(index)
+                if np.mean(self._signatures[index] == signature) >= self.threshold:
+                    return self._keys[index]
+        return None
+
+    def add(self, signature: np.ndarray, key: str = ""):
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._keys.append(key)
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, []).append(index)
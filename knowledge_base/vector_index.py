@@ -0,0 +1,322 @@
+# knowledge_base/vector_index.py
+import json
+import os
+import uuid
+
+import numpy as np
+
+from utils.serialization import write_json
+from utils.config import (
+    HNSW_SPACE,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    QUANTIZED_INDEX_PATH,
+    QUANTIZED_INDEX_DTYPE,
+    QUANTIZED_RESCORE_FACTOR
+)
+from .lexical_index import FACET_ARRAYS, FILTER_MASK_CACHE_SIZE, ids_fingerprint
+from .metadata_filters import encode_facets, facet_mask, filters_key
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 2
+# 計算近似距離時每次處理的向量列數，限制暫存的 float32 區塊大小
+SCAN_BLOCK_ROWS = 65536
+
+
+# ---- Chroma HNSW 參數 ----
+
+def hnsw_configuration() -> dict:
+    """建立 collection 時使用的 HNSW 設定。"""
+    return {"hnsw": {
+        "space": HNSW_SPACE,
+        "max_neighbors": HNSW_M,
+        "ef_construction": HNSW_EF_CONSTRUCTION,
+        "ef_search": HNSW_EF_SEARCH
+    }}
+
+
+def apply_hnsw_search_params(collection) -> list[str]:
+    """把 ef_search 調整為設定值，回傳與設定不符、只能重建 collection 才能套用的參數名稱。"""
+    current = (collection.configuration or {}).get("hnsw") or {}
+    wanted = hnsw_configuration()["hnsw"]
+    if current.get("ef_search") != wanted["ef_search"]:
+        collection.modify(configuration={"hnsw": {"ef_search": wanted["ef_search"]}})
+    return [name for name in ("space", "max_neighbors", "ef_construction") if current.get(name) != wanted[name]]
+
+
+# ---- 量化向量索引 ----
+
+def quantize(vectors: np.ndarray, dtype: str) -> tuple[np.ndarray, np.ndarray | None]:
+    """int8 為每列對稱量化（回傳每列的縮放係數）；float16 直接轉型。"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype != "int8":
+        raise ValueError(f"Unsupported quantized index dtype: {dtype}")
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedVectorIndex:
+    """以 int8 或 float16 儲存 Chroma collection 向量的本地索引，做暴力搜尋後以原始向量重新評分。
+
+    量化後的向量只有 float32 的 1/4 或 1/2 大小，以記憶體映射方式讀取；搜尋時先以量化向量
+    取出 k * rescore_factor 個候選，再從 Chroma 取回這些候選的 float32 向量計算精確距離。
+    距離的定義與 collection 的 HNSW_SPACE 相同，因此兩種後端的結果可以直接比較。
+    每個向量另存與 LexicalIndex 相同的過濾欄位，metadata 過濾不必再查詢 Chroma。
+    """
+    def __init__(self, path: str = QUANTIZED_INDEX_PATH, dtype: str = QUANTIZED_INDEX_DTYPE, space: str = HNSW_SPACE):
+        if space not in ("l2", "ip", "cosine"):
+            raise ValueError(f"Unsupported distance space: {space}")
+        self.path = path
+        self.dtype = dtype
+        self.space = space
+        self.manifest = self._read_manifest()
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self._ids = None
+        self._vectors = None
+        self._scales = None
+        self._sq_norms = None
+        self._facets = None
+        self._filter_masks = {}
+
+    def _read_manifest(self) -> dict:
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {"version": FORMAT_VERSION, "dtype": self.dtype, "space": self.space, "n": 0, "prefix": None, "facets": {}}
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.path, MANIFEST_FILE))
+
+    def __len__(self) -> int:
+        return self.manifest["n"]
+
+    def _file(self, name: str, prefix: str | None = None) -> str:
+        return os.path.join(self.path, f"{prefix or self.manifest['prefix']}.{name}")
+
+    @property
+    def ids(self) -> list[str]:
+        if self._ids is None:
+            if not len(self):
+                self._ids = []
+            else:
+                with open(self._file("ids.json"), 'r', encoding='utf-8') as f:
+                    self._ids = json.load(f)
+        return self._ids
+
+    def _array(self, name: str) -> np.ndarray | None:
+        path = self._file(f"{name}.npy")
+        return np.load(path, mmap_mode='r') if os.path.exists(path) else None
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._vectors is None:
+            self._vectors = self._array("vectors")
+        return self._vectors
+
+    @property
+    def scales(self) -> np.ndarray | None:
+        if self._scales is None and self.manifest["dtype"] == "int8":
+            self._scales = self._array("scales")
+        return self._scales
+
+    @property
+    def sq_norms(self) -> np.ndarray:
+        if self._sq_norms is None:
+            self._sq_norms = self._array("sq_norms")
+        return self._sq_norms
+
+    @property
+    def facets(self) -> dict[str, np.ndarray]:
+        """每個向量的過濾欄位，編碼方式與 LexicalIndex.facets 相同。"""
+        if self._facets is None:
+            self._facets = {name: self._array(f"facet_{name}") for name in FACET_ARRAYS} if len(self) else {}
+        return self._facets
+
+    def allowed_rows(self, filters: dict | None) -> np.ndarray | None:
+        """符合過濾條件的列遮罩，依 filters_key 快取；沒有過濾條件時回傳 None。"""
+        if not filters:
+            return None
+        key = filters_key(filters)
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = facet_mask(self.facets, self.manifest.get("facets", {}), filters, len(self))
+            if len(self._filter_masks) >= FILTER_MASK_CACHE_SIZE:
+                self._filter_masks.clear()
+            self._filter_masks[key] = mask
+        return mask
+
+    def _is_reusable(self) -> bool:
+        return (
+            self.exists()
+            and self.manifest.get("version") == FORMAT_VERSION
+            and self.manifest.get("dtype") == self.dtype
+            and self.manifest.get("space") == self.space
+        )
+
+    def is_stale(self, collection) -> bool:
+        """尚未建立、格式版本、量化格式或距離定義已更換，或 chunk ID 與 collection 不一致時視為過期。
+
+        與 LexicalIndex.is_stale 相同，先比較向量數，數量相同時再比較 manifest 中的 ID 集合指紋。
+        """
+        return (
+            not self._is_reusable()
+            or len(self) != collection.count()
+            or self.manifest.get("fingerprint") != ids_fingerprint(collection.get(include=[])['ids'])
+        )
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.space == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1.0, norms)
+        return vectors
+
+    def _write(
+        self, ids: list[str], codes: np.ndarray, scales: np.ndarray | None, sq_norms: np.ndarray,
+        facets: dict[str, np.ndarray], vocabulary: dict[str, list]
+    ):
+        """寫入新一組陣列後才以 manifest 切換，最後刪除舊的檔案。"""
+        os.makedirs(self.path, exist_ok=True)
+        old_prefix = self.manifest.get("prefix")
+        prefix = uuid.uuid4().hex[:12]
+        with open(self._file("ids.json", prefix), 'w', encoding='utf-8') as f:
+            json.dump(ids, f, ensure_ascii=False)
+        np.save(self._file("vectors.npy", prefix), codes)
+        np.save(self._file("sq_norms.npy", prefix), sq_norms)
+        if scales is not None:
+            np.save(self._file("scales.npy", prefix), scales)
+        for name in FACET_ARRAYS:
+            np.save(self._file(f"facet_{name}.npy", prefix), facets[name])
+        self.manifest = {
+            "version": FORMAT_VERSION, "dtype": self.dtype, "space": self.space,
+            "n": len(ids), "prefix": prefix, "facets": vocabulary, "fingerprint": ids_fingerprint(ids)
+        }
+        write_json(os.path.join(self.path, MANIFEST_FILE), self.manifest)
+        self._reset_cache()
+        if old_prefix:
+            for name in ("ids.json", "vectors.npy", "sq_norms.npy", "scales.npy", *(f"facet_{name}.npy" for name in FACET_ARRAYS)):
+                path = self._file(name, old_prefix)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def sync_with_collection(self, collection, batch_size: int = 1000):
+        """比對 Chroma 中的 chunk ID，保留仍存在的向量並量化新增的向量（連同 metadata 的過濾欄位）。"""
+        reusable = self._is_reusable()
+        known = {doc_id: row for row, doc_id in enumerate(self.ids)} if reusable else {}
+        current_ids = collection.get(include=[])['ids']
+        kept_rows = [known[doc_id] for doc_id in current_ids if doc_id in known]
+        added = [doc_id for doc_id in current_ids if doc_id not in known]
+        if reusable and not added and len(kept_rows) == len(self):
+            # 沒有指紋的舊 manifest 只需補上指紋，向量不必重寫
+            if "fingerprint" not in self.manifest:
+                self.manifest["fingerprint"] = ids_fingerprint(self.ids)
+                write_json(os.path.join(self.path, MANIFEST_FILE), self.manifest)
+            return
+
+        ids = [self.ids[row] for row in kept_rows]
+        codes = [np.asarray(self.vectors[kept_rows])] if kept_rows else []
+        scales = [np.asarray(self.scales[kept_rows])] if kept_rows and self.scales is not None else []
+        sq_norms = [np.asarray(self.sq_norms[kept_rows])] if kept_rows else []
+        facets = {name: [np.asarray(self.facets[name][kept_rows])] if kept_rows else [] for name in FACET_ARRAYS}
+        vocabulary = dict(self.manifest.get("facets", {})) if reusable else {}
+        for start in range(0, len(added), batch_size):
+            batch = collection.get(ids=added[start:start + batch_size], include=["embeddings", "metadatas"])
+            vectors = self._prepare(batch['embeddings'])
+            batch_codes, batch_scales = quantize(vectors, self.dtype)
+            ids.extend(batch['ids'])
+            codes.append(batch_codes)
+            sq_norms.append(np.einsum('ij,ij->i', vectors, vectors))
+            if batch_scales is not None:
+                scales.append(batch_scales)
+            for name, column in encode_facets(batch['metadatas'], vocabulary).items():
+                facets[name].append(column)
+        if not ids:
+            print("Quantized vector index: collection is empty.")
+            return
+
+        self._write(
+            ids,
+            np.concatenate(codes),
+            np.concatenate(scales) if scales else None,
+            np.concatenate(sq_norms).astype(np.float32),
+            {name: np.concatenate(columns) for name, columns in facets.items()},
+            vocabulary
+        )
+        print(f"Quantized vector index synced: {len(ids)} vectors ({self.dtype}), "
+              f"+{len(added)} / -{len(known) - len(kept_rows)}.")
+
+    def _distances(self, queries: np.ndarray, vectors: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+        """回傳 (向量數, 查詢數) 的距離，l2 省略每個查詢固定的 ||q||²。"""
+        dots = vectors @ queries.T
+        if self.space == "l2":
+            return sq_norms[:, None] - 2 * dots
+        return -dots
+
+    def _approximate_candidates(self, queries: np.ndarray, n_candidates: int, allowed_rows: np.ndarray | None = None) -> np.ndarray:
+        """以量化向量分塊計算近似距離，回傳每個查詢的候選列號 (查詢數, n_candidates)；allowed_rows 為可選的列遮罩。"""
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_dist = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self), SCAN_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            if self.scales is not None:
+                block *= self.scales[start:start + SCAN_BLOCK_ROWS, None]
+            dist = self._distances(queries, block, self.sq_norms[start:start + SCAN_BLOCK_ROWS]).T
+            if allowed_rows is not None:
+                dist[:, ~allowed_rows[start:start + len(block)]] = np.inf
+            rows = np.broadcast_to(np.arange(start, start + len(block)), dist.shape)
+            best_dist = np.concatenate([best_dist, dist], axis=1)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+            if best_dist.shape[1] > n_candidates:
+                keep = np.argpartition(best_dist, n_candidates - 1, axis=1)[:, :n_candidates]
+                best_dist = np.take_along_axis(best_dist, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        return best_rows
+
+    def search(
+        self, collection, query_vectors, k: int, rescore_factor: int = QUANTIZED_RESCORE_FACTOR, filters: dict | None = None
+    ) -> list[tuple[list[str], np.ndarray]]:
+        """回傳每個查詢的 (top-k chunk ID, 距離)；rescore_factor 為 0 時只用量化向量排序，不重新評分。
+
+        提供 filters（由 metadata_filters.normalize_filters 整理）時只在符合條件的 chunk 中搜尋。
+        """
+        allowed_rows = self.allowed_rows(filters)
+        n_allowed = len(self) if allowed_rows is None else int(allowed_rows.sum())
+        if not n_allowed or k <= 0:
+            return [([], np.empty(0, dtype=np.float32)) for _ in query_vectors]
+        queries = self._prepare(query_vectors)
+        n_candidates = min(n_allowed, k * max(rescore_factor, 1))
+        candidates = self._approximate_candidates(queries, n_candidates, allowed_rows)
+
+        if rescore_factor:
+            # 從 Chroma 一次取回所有查詢候選的原始向量
+            candidate_ids = list(dict.fromkeys(self.ids[row] for row in candidates.ravel()))
+            fetched = collection.get(ids=candidate_ids, include=["embeddings"])
+            exact = dict(zip(fetched['ids'], self._prepare(fetched['embeddings'])))
+
+        results = []
+        for query, rows in zip(queries, candidates):
+            if rescore_factor:
+                ids = [self.ids[row] for row in rows if self.ids[row] in exact]
+                vectors = np.stack([exact[doc_id] for doc_id in ids]) if ids else np.empty((0, queries.shape[1]), dtype=np.float32)
+                sq_norms = np.einsum('ij,ij->i', vectors, vectors)
+            else:
+                rows = np.sort(rows)
+                ids = [self.ids[row] for row in rows]
+                vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+                if self.scales is not None:
+                    vectors *= self.scales[rows, None]
+                sq_norms = self.sq_norms[rows]
+            # 換算成與 Chroma 相同的距離：l2 為平方距離，ip 與 cosine 為 1 - 內積
+            dist = self._distances(query[None, :], vectors, sq_norms)[:, 0]
+            dist = dist + float(query @ query) if self.space == "l2" else 1 + dist
+            order = np.argsort(dist, kind="stable")[:k]
+            results.append(([ids[i] for i in order], dist[order]))
+        return results
@@ -0,0 +1,106 @@
+# main_batch_check.py
+"""離線批次查核：串流讀取 JSONL 輸入，逐批查核並以 JSONL 逐筆寫出結果。
+
+輸出檔同時是檢查點：中斷後以相同參數重新執行，會略過輸出檔中已有結果的輸入。
+
+用法：
+    python main_batch_check.py claims.jsonl results.jsonl --fields claim --mode claim
+    python main_batch_check.py requests.jsonl results.jsonl --fields title body --id-field request_id
+"""
+import argparse
+import json
+from collections.abc import Iterator
+
+from knowledge_base.metadata_filters import normalize_filters
+from reasoning.batch_checker import BatchChecker, ResultLog
+from utils.config import BATCH_CHECK_BATCH_SIZE, BATCH_CHECK_LLM_WORKERS
+
+
+def read_inputs(path: str, fields: list[str], id_field: str, skip_ids: set[str]) -> Iterator[tuple[str, str | None]]:
+    """逐行讀取輸入，交出 (輸入 ID, 文字)；沒有 ID 欄位時以行號作為 ID，多個欄位以換行連接。
+
+    無法解析或不是物件、字串的行會被略過。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping malformed JSON on line {line_number}.")
+                continue
+            if not isinstance(record, (dict, str)):
+                print(f"Skipping unsupported record on line {line_number}.")
+                continue
+            item_id = str(record.get(id_field, line_number)) if isinstance(record, dict) else str(line_number)
+            if item_id in skip_ids:
+                continue
+            if isinstance(record, str):
+                text = record
+            else:
+                text = "\n".join(record[field] for field in fields if isinstance(record.get(field), str) and record[field].strip())
+            yield item_id, text.strip() or None
+
+
+def _format_stats(stats: dict) -> str:
+    return (f"{stats['items']} items, {stats['claims']} claims, {stats['alignments']} alignments "
+            f"({stats['llm_alignments']} via LLM, {stats['prescreen_dropped']} evidence dropped by pre-screen) "
+            f"in {stats['seconds']:.1f}s | {stats['items_per_second']:.2f} items/s, "
+            f"{stats['claims_per_second']:.2f} claims/s, {stats['alignments_per_second']:.2f} alignments/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="離線批次查核 JSONL 檔案中的主張。")
+    parser.add_argument("input", help="輸入 JSONL，每行一個物件（或字串）")
+    parser.add_argument("output", help="輸出 JSONL；已存在時從中斷處繼續")
+    parser.add_argument("--fields", nargs="+", default=["query"], help="要查核的文字欄位，多個欄位以換行連接")
+    parser.add_argument("--id-field", default="id", help="輸入 ID 欄位，用於續跑時辨識已完成的輸入")
+    parser.add_argument("--mode", choices=["full", "claim"], default="full",
+                        help="full：改寫查詢並抽取主張；claim：每筆輸入直接視為單一主張")
+    parser.add_argument("--batch-size", type=int, default=BATCH_CHECK_BATCH_SIZE)
+    parser.add_argument("--llm-workers", type=int, default=BATCH_CHECK_LLM_WORKERS)
+    parser.add_argument("--k", type=int, default=5, help="每個主張檢索的證據數")
+    parser.add_argument("--date-from", help="只使用此日期（含）之後發布的證據，例如 2025-01-01")
+    parser.add_argument("--date-to", help="只使用此日期（含）之前發布的證據")
+    parser.add_argument("--source", nargs="+", help="只使用這些來源的證據")
+    parser.add_argument("--status", nargs="+", help="只使用這些查核結果的報告作為證據，例如 錯誤")
+    parser.add_argument("--stats-output", help="把最終的吞吐量統計寫成 JSON 檔")
+    args = parser.parse_args()
+
+    log = ResultLog(args.output)
+    done = log.completed_ids()
+    if done:
+        print(f"Resuming: {len(done)} inputs already have results in {args.output}.")
+
+    filters = {"date_from": args.date_from, "date_to": args.date_to, "source": args.source, "status": args.status}
+    try:
+        filters = normalize_filters(filters)
+    except ValueError as e:
+        parser.error(str(e))
+
+    checker = BatchChecker(
+        mode=args.mode, batch_size=args.batch_size, llm_workers=args.llm_workers, k=args.k, filters=filters
+    )
+    if not checker.fact_checker.collection:
+        print("Knowledge base not available. Please run main_indexing.py first.")
+        return
+    try:
+        records = log.write(checker.run(read_inputs(args.input, args.fields, args.id_field, done)))
+        for count, _ in enumerate(records, start=1):
+            if count % args.batch_size == 0:
+                print(_format_stats(checker.stats.snapshot()))
+    finally:
+        checker.close()
+
+    stats = checker.stats.snapshot()
+    if checker.fact_checker.llm_cache:
+        stats["llm_cache"] = checker.fact_checker.llm_cache.stats()
+    print(f"Finished: {_format_stats(stats)}")
+    if args.stats_output:
+        with open(args.stats_output, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
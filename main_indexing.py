@@ -1,49 +1,64 @@
 # main_indexing.py
-import json
-import os
+import argparse
+from collections.abc import Iterator
 from scraper.scrapers import TFCScraper
-from knowledge_base.indexing import build_knowledge_base
-from utils.config import PROCESSED_DATA_PATH, DATA_DIR
+from scraper.crawl_engine import CrawlLedger
+from knowledge_base.article_store import ArticleStore
+from knowledge_base.indexing import index_articles
+from utils.config import PROCESSED_DATA_PATH, SCRAPER_CHECKPOINT_PATH, CRAWL_LEDGER_PATH
 
-def run_scrapers():
-    """執行所有爬蟲並將結果合併。"""
-    all_articles = []
+def run_scrapers(ledger: CrawlLedger | None = None, incremental: bool = True) -> Iterator[dict]:
+    """執行所有爬蟲並逐篇交出文章；增量模式下只交出新增或有變動的文章，完整模式下只把結果記錄到 ledger。"""
 
     # --- TFC Scraper ---
     # 使用新的爬蟲，從指定的分類頁面開始爬取
     # 您可以更改 max_pages 來決定要爬取多少頁
     tfc_scraper = TFCScraper()
     tfc_base_url = "https://tfc-taiwan.org.tw/fact-check-reports-all/"
-    tfc_articles = tfc_scraper.scrape(base_url=tfc_base_url, max_pages=5) # 先爬取 2 頁作為範例
-    all_articles.extend(tfc_articles)
+    # 中斷後重新執行會從檢查點繼續，不會重抓已完成的文章
+    yield from tfc_scraper.iter_scrape(
+        base_url=tfc_base_url,
+        max_pages=5, # 先爬取 2 頁作為範例
+        checkpoint_path=SCRAPER_CHECKPOINT_PATH,
+        ledger=ledger,
+        incremental=incremental
+    )
 
-
-
-    return all_articles
-
-def main():
-    """完整流程：爬取資料 -> 儲存 -> 建立知識庫。"""
+def main(incremental: bool = True):
+    """完整流程：爬取資料 -> 儲存 -> 建立知識庫，各階段以串流方式逐批處理。"""
     print("Starting the full indexing pipeline...")
     
-    # 1. 爬取資料
-    articles = run_scrapers()
-    if not articles:
-        print("No articles were scraped. Exiting.")
-        return
+    # 1. 爬取資料（增量模式下只取得新增或有變動的文章）
+    ledger = CrawlLedger(CRAWL_LEDGER_PATH)
+    if incremental:
+        print(f"Incremental mode: {len(ledger)} articles already in the crawl ledger.")
+    else:
+        # 完整重建會取代文章庫，帳本也改為只記錄這次爬到的文章與它們最新的驗證標頭
+        ledger.clear()
+    articles = run_scrapers(ledger, incremental)
 
-    # 2. 儲存處理過的資料
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
-        
-    with open(PROCESSED_DATA_PATH, 'w', encoding='utf-8') as f:
-        json.dump(articles, f, ensure_ascii=False, indent=4)
-    print(f"Successfully saved {len(articles)} articles to {PROCESSED_DATA_PATH}")
+    # 2. 每篇文章先追加寫入文章庫再交給索引流程；完整模式下串流結束後才取代舊的文章庫
+    store = ArticleStore()
+    articles = store.tee(articles, overwrite=not incremental)
 
-    # 3. 建立知識庫 (向量索引)
+    # 3. 建立知識庫 (向量索引)，增量模式下只處理新增或有變動的文章
     print("\nBuilding knowledge base from the scraped data...")
-    build_knowledge_base() 
+    stats = index_articles(articles, full_rebuild=not incremental)
+    if not stats["articles"]:
+        print("No new or changed articles were scraped.")
+    elif incremental:
+        # 移除文章庫中已被新版本取代的舊文章
+        print(f"Saved {stats['articles']} new or changed articles; {store.compact()} articles in {PROCESSED_DATA_PATH}")
+    else:
+        print(f"Saved {stats['articles']} articles to {PROCESSED_DATA_PATH}")
+
+    # 索引成功後才提交帳本，失敗時下次會重新處理這些文章
+    ledger.save()
     
     print("\nPipeline finished successfully!")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="爬取事實查核報告並建立知識庫。")
+    parser.add_argument("--full", action="store_true", help="不使用帳本，重新爬取所有文章並重建知識庫；帳本改寫為這次爬取的結果")
+    args = parser.parse_args()
+    main(incremental=not args.full)
@@ -0,0 +1,175 @@
+# reasoning/batch_checker.py
+import json
+import os
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from .fact_checker import FactChecker
+from utils import telemetry
+from utils.serialization import json_default
+from knowledge_base.metadata_filters import normalize_filters
+from utils.config import BATCH_CHECK_BATCH_SIZE, BATCH_CHECK_LLM_WORKERS
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class ResultLog:
+    """以 JSON Lines 逐筆寫入查核結果；輸出檔本身就是檢查點，重新執行時略過已有結果的輸入。"""
+    def __init__(self, path: str):
+        self.path = path
+
+    def completed_ids(self) -> set[str]:
+        """讀取已完成的輸入 ID，並截掉中斷時寫到一半的最後一行。"""
+        done = set()
+        if not os.path.exists(self.path):
+            return done
+        valid_end = 0
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b"\n"):
+                    break
+                valid_end = offset
+                try:
+                    done.add(str(json.loads(line)["id"]))
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+        if valid_end < os.path.getsize(self.path):
+            with open(self.path, 'rb+') as f:
+                f.truncate(valid_end)
+        return done
+
+    def write(self, records: Iterable[dict]) -> Iterator[dict]:
+        """逐筆追加寫入並立即 flush，讓被中斷的工作最多只損失正在處理的那一批。"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=json_default) + "\n")
+                f.flush()
+                yield record
+
+
+class BatchStats:
+    """累計批次查核的處理量，計算吞吐量。"""
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.items = 0
+        self.claims = 0
+        self.alignments = 0
+        self.skipped_alignments = 0
+        # 實際交給 LLM 的比對數，以及被證據預篩捨棄的證據數（由每批的 Trace 計數器累計）
+        self.llm_alignments = 0
+        self.prescreen_dropped = 0
+        self.errors = 0
+
+    def snapshot(self) -> dict:
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            "items": self.items,
+            "claims": self.claims,
+            "alignments": self.alignments,
+            "skipped_alignments": self.skipped_alignments,
+            "llm_alignments": self.llm_alignments,
+            "prescreen_dropped": self.prescreen_dropped,
+            "errors": self.errors,
+            "seconds": elapsed,
+            "items_per_second": self.items / elapsed if elapsed else 0.0,
+            "claims_per_second": self.claims / elapsed if elapsed else 0.0,
+            "alignments_per_second": self.alignments / elapsed if elapsed else 0.0
+        }
+
+
+class BatchChecker:
+    """大量輸入的離線查核：逐批處理，同一批的主張一起檢索，LLM 請求交給固定大小的執行緒池。
+
+    mode 為 "full" 時每筆輸入都先改寫查詢並抽取主張（與 check 相同）；
+    為 "claim" 時每筆輸入直接視為單一主張，不呼叫改寫與抽取的 LLM。
+    下一批的改寫與抽取會在目前這批進行證據比對時先送進執行緒池，讓 LLM 不會在批次之間閒置。
+    filters 套用到所有輸入的證據檢索（見 FactChecker.retrieve_evidence_batch）。
+    """
+    def __init__(
+        self,
+        fact_checker: FactChecker | None = None,
+        mode: str = "full",
+        batch_size: int = BATCH_CHECK_BATCH_SIZE,
+        llm_workers: int = BATCH_CHECK_LLM_WORKERS,
+        k: int = 5,
+        filters: dict | None = None
+    ):
+        if mode not in ("full", "claim"):
+            raise ValueError(f"Unknown batch check mode: {mode}")
+        self.filters = normalize_filters(filters)
+        self.fact_checker = fact_checker or FactChecker(startup="eager")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.k = k
+        # 改寫、抽取與證據比對共用這個執行緒池；比對時以參數傳入，不更動 fact_checker 自己的執行緒池
+        self.llm_executor = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="batch-llm")
+        self.stats = BatchStats()
+
+    def close(self):
+        self.llm_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _prepare(self, text: str) -> tuple[str, list[str]]:
+        if self.mode == "claim":
+            return text, [text]
+        return self.fact_checker.understand_query(text)
+
+    def _submit(self, batch: list[tuple[str, str | None]] | None) -> list | None:
+        if batch is None:
+            return None
+        return [
+            (item_id, text, self.llm_executor.submit(self._prepare, text) if text else None)
+            for item_id, text in batch
+        ]
+
+    def _finish(self, submitted: list) -> Iterator[dict]:
+        """等待這一批的主張抽取完成，合併檢索後比對再交出結果；沒有文字的輸入直接交出錯誤紀錄。"""
+        prepared = []
+        for item_id, text, future in submitted:
+            if future is None:
+                self.stats.items += 1
+                self.stats.errors += 1
+                yield {"id": item_id, "error": "Input has no text to check."}
+                continue
+            rewritten_query, claims = future.result()
+            prepared.append((item_id, text, rewritten_query, claims))
+
+        all_claims = [claim for *_, claims in prepared for claim in claims]
+        with telemetry.start_trace("batch_check") as trace:
+            evidence = self.fact_checker.retrieve_evidence_batch(all_claims, self.k, self.filters)
+            alignments, skipped = self.fact_checker.align_claims(all_claims, evidence, executor=self.llm_executor)
+        self.stats.llm_alignments += trace.counters.get("alignment_llm_pairs", 0)
+        self.stats.prescreen_dropped += trace.counters.get("prescreen_dropped", 0)
+
+        start = 0
+        for item_id, text, rewritten_query, claims in prepared:
+            end = start + len(claims)
+            result = self.fact_checker.assemble_result(
+                text, rewritten_query, claims, evidence[start:end], alignments[start:end], skipped[start:end]
+            )
+            # 快取統計是整個行程的累計值，改在整體統計中回報
+            result.pop("llm_cache", None)
+            self.stats.items += 1
+            self.stats.claims += len(claims)
+            self.stats.alignments += sum(len(claim_evidence) for claim_evidence in evidence[start:end]) - result["skipped_alignments"]
+            self.stats.skipped_alignments += result["skipped_alignments"]
+            start = end
+            yield {"id": item_id, "result": result}
+
+    def run(self, items: Iterable[tuple[str, str | None]]) -> Iterator[dict]:
+        """依序處理 (輸入 ID, 文字)，逐筆交出 {"id", "result"} 或 {"id", "error"}。"""
+        batches = _batched(items, self.batch_size)
+        current = self._submit(next(batches, None))
+        while current is not None:
+            upcoming = self._submit(next(batches, None))
+            yield from self._finish(current)
+            current = upcoming
+
@@ -0,0 +1,62 @@
+# reasoning/components.py
+import threading
+import time
+from concurrent.futures import Future
+
+
+class LazyComponent:
+    """延遲載入的元件：可交給背景執行緒預先載入，第一次使用時若尚未載入完成則等待。
+
+    載入失敗時 get() 回傳 None，錯誤訊息保留在 status() 中，不會在每次使用時重新嘗試。
+    """
+    def __init__(self, name: str, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._future = None
+        self._started_at = None
+        self.seconds = None
+        self.error = None
+
+    def _claim(self) -> Future | None:
+        """取得載入的執行權；已經有人在載入或已載入完成時回傳 None。"""
+        with self._lock:
+            if self._future is not None:
+                return None
+            self._future = Future()
+            return self._future
+
+    def start(self, executor):
+        """交給執行緒池在背景載入。"""
+        future = self._claim()
+        if future is not None:
+            executor.submit(self._run, future)
+
+    def _run(self, future: Future):
+        self._started_at = time.perf_counter()
+        try:
+            future.set_result(self._loader())
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"Error loading {self.name}: {self.error}")
+            future.set_result(None)
+        finally:
+            self.seconds = time.perf_counter() - self._started_at
+
+    def get(self):
+        future = self._claim()
+        if future is not None:
+            self._run(future)
+        return self._future.result()
+
+    def status(self) -> dict:
+        if self._future is None:
+            state = "pending"
+        elif not self._future.done():
+            state = "loading"
+        else:
+            state = "error" if self.error else "ready"
+        seconds = self.seconds
+        if seconds is None and self._started_at is not None:
+            seconds = time.perf_counter() - self._started_at
+        return {"status": state, "seconds": seconds, "error": self.error}
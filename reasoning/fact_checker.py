@@ -1,83 +1,298 @@
 
 # reasoning/fact_checker.py
 import json
-import ollama
-import chromadb
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from rank_bm25 import BM25Okapi
+import queue
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# ollama、chromadb 與 langchain 的匯入成本高，延到對應元件載入時才匯入
+from knowledge_base.lexical_index import LexicalIndex
+from knowledge_base.vector_index import QuantizedVectorIndex, apply_hnsw_search_params
+from knowledge_base.metadata_filters import normalize_filters, to_chroma_where
+from knowledge_base.text_processing import clean_text
+from .components import LazyComponent
+from .prescreen import EvidencePrescreener
+from .llm_cache import LLMCache, template_fingerprint
+from utils import telemetry
 
 from utils.config import (
     OLLAMA_MODEL,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_IN_FLIGHT,
+    LLM_STREAM_TOKENS,
+    OLLAMA_HOST,
+    ALIGNMENT_EARLY_EXIT,
+    EARLY_EXIT_MIN_CONFIDENCE,
+    ALIGNMENT_MODE,
+    QUERY_UNDERSTANDING_MODE,
+    QUERY_SKIP_ATOMIC,
+    QUERY_ATOMIC_MAX_CHARS,
+    LLM_CACHE_ENABLED,
     EMBEDDING_MODEL,
+    EMBEDDING_CACHE_SIZE,
+    FACT_CHECKER_STARTUP,
+    VECTOR_BACKEND,
+    PRESCREEN_ENABLED,
     CHROMA_PATH,
     COLLECTION_NAME,
     FACT_ALIGNMENT_PROMPT_TEMPLATE,
+    FACT_ALIGNMENT_BATCH_PROMPT_TEMPLATE,
     CLAIM_EXTRACTION_PROMPT_TEMPLATE,
-    QUERY_REWRITING_PROMPT_TEMPLATE
+    QUERY_REWRITING_PROMPT_TEMPLATE,
+    QUERY_UNDERSTANDING_PROMPT_TEMPLATE
 )
 
+# 標記因判決已確定而未執行的比對
+_NOT_RUN = object()
+# 比對結果的合法標籤
+_ALIGNMENT_LABELS = ("支持", "矛盾", "中立")
+# LLM 呼叫區段的 prompt 屬性
+_PROMPT_NAMES = {
+    FACT_ALIGNMENT_PROMPT_TEMPLATE: "alignment",
+    FACT_ALIGNMENT_BATCH_PROMPT_TEMPLATE: "alignment_batch",
+    CLAIM_EXTRACTION_PROMPT_TEMPLATE: "claim_extraction",
+    QUERY_REWRITING_PROMPT_TEMPLATE: "query_rewriting",
+    QUERY_UNDERSTANDING_PROMPT_TEMPLATE: "query_understanding"
+}
+# 句中出現這些標點表示輸入不只一個子句或句子
+_CLAUSE_BREAKS = re.compile(r'[。！？!?；;，,、：:\n]')
+
+
+def is_atomic_claim(text: str, max_chars: int = QUERY_ATOMIC_MAX_CHARS) -> bool:
+    """粗略判斷輸入是否已是單一主張：不超過 max_chars 個字，去掉句尾標點後沒有句子或子句的分隔。"""
+    text = text.strip()
+    if not text or len(text) > max_chars:
+        return False
+    return not _CLAUSE_BREAKS.search(text.rstrip('。！？!?.… '))
+
 class FactChecker:
-    """整合了檢索和生成，進行事實查核的核心類別。"""
-    def __init__(self):
+    """整合了檢索和生成，進行事實查核的核心類別。
+
+    Ollama 用戶端、嵌入模型、ChromaDB 與 BM25 索引都是延遲載入的元件；startup 決定何時載入：
+    "background" 在背景執行緒平行載入並立即返回，"eager" 平行載入並等待完成，"lazy" 第一次使用時才載入。
+    """
+    def __init__(
+        self,
+        startup: str = FACT_CHECKER_STARTUP,
+        alignment_mode: str = ALIGNMENT_MODE,
+        query_mode: str = QUERY_UNDERSTANDING_MODE
+    ):
         print("Initializing FactChecker...")
-        self.ollama_client = ollama.Client()
-        self.embedding_function = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
-        
+        if alignment_mode not in ("per_pair", "batched"):
+            raise ValueError(f"Unknown alignment mode: {alignment_mode}")
+        if query_mode not in ("separate", "fused"):
+            raise ValueError(f"Unknown query understanding mode: {query_mode}")
+        self.alignment_mode = alignment_mode
+        self.query_mode = query_mode
+        self.skip_atomic_queries = QUERY_SKIP_ATOMIC
+        # 比對請求的執行緒池；ollama.Client 底層的 httpx 連線池可在多執行緒間共用
+        self.llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY) if LLM_MAX_CONCURRENCY > 1 else None
+        self._llm_slots = threading.BoundedSemaphore(LLM_MAX_IN_FLIGHT)
+        self.llm_cache = None
+        if LLM_CACHE_ENABLED:
+            self.llm_cache = LLMCache()
+        self._embedding_cache = OrderedDict()
+        self._embedding_cache_lock = threading.Lock()
         self.db_client = None
-        self.collection = None
-        self.bm25_index = None
-        self.chunk_corpus = []
 
+        self._components = {
+            "llm_client": LazyComponent("Ollama client", self._load_ollama_client),
+            "embedding_model": LazyComponent("embedding model", self._load_embedding_function),
+            "vector_store": LazyComponent("ChromaDB", self._load_collection),
+            "lexical_index": LazyComponent("BM25 index", self._load_lexical_index),
+        }
+        if VECTOR_BACKEND == "quantized":
+            self._components["vector_index"] = LazyComponent("quantized vector index", self._load_vector_index)
+        if PRESCREEN_ENABLED:
+            self._components["prescreen"] = LazyComponent("evidence pre-screen models", EvidencePrescreener)
+        if startup not in ("background", "eager", "lazy"):
+            raise ValueError(f"Unknown startup mode: {startup}")
+        if startup != "lazy":
+            executor = ThreadPoolExecutor(max_workers=len(self._components), thread_name_prefix="fact-checker-init")
+            for component in self._components.values():
+                component.start(executor)
+            # 已送出的載入工作會繼續執行完，完成後執行緒即結束
+            executor.shutdown(wait=False)
+        if startup == "eager":
+            self.wait_until_ready()
+
+    @property
+    def ollama_client(self):
+        return self._components["llm_client"].get()
+
+    @property
+    def embedding_function(self):
+        return self._components["embedding_model"].get()
+
+    @property
+    def collection(self):
+        return self._components["vector_store"].get()
+
+    @property
+    def bm25_index(self) -> LexicalIndex | None:
+        return self._components["lexical_index"].get()
+
+    @property
+    def vector_index(self) -> QuantizedVectorIndex | None:
+        """VECTOR_BACKEND 為 "quantized" 時的本地量化向量索引，否則為 None（使用 Chroma 的 HNSW 搜尋）。"""
+        component = self._components.get("vector_index")
+        return component.get() if component else None
+
+    @property
+    def prescreener(self) -> EvidencePrescreener | None:
+        """PRESCREEN_ENABLED 時在 LLM 比對前篩選證據的 cross-encoder；停用或載入失敗時為 None。"""
+        component = self._components.get("prescreen")
+        return component.get() if component else None
+
+    def wait_until_ready(self) -> bool:
+        """等待所有元件載入完成（lazy 模式下會依序載入），回傳是否全部成功。"""
+        for component in self._components.values():
+            component.get()
+        return self.health()["ready"]
+
+    def health(self) -> dict:
+        """回傳各元件的載入狀態（pending / loading / ready / error）與耗時，不會觸發載入。"""
+        components = {name: component.status() for name, component in self._components.items()}
+        return {
+            "ready": all(status["status"] == "ready" for status in components.values()),
+            "components": components
+        }
+
+    def _load_ollama_client(self):
+        import ollama
+        return ollama.Client(host=OLLAMA_HOST)
+
+    def _load_embedding_function(self):
+        from langchain_community.embeddings import SentenceTransformerEmbeddings
+        # 查核時只嵌入使用者的主張，這些文字不會出現在以 chunk 內容為鍵的嵌入儲存中，
+        # 因此不開啟 embedding_store/；主張的向量由記憶體的 LRU 快取重複利用
+        return SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+
+    def _load_collection(self):
+        import chromadb
         try:
             self.db_client = chromadb.PersistentClient(path=CHROMA_PATH)
-            self.collection = self.db_client.get_collection(name=COLLECTION_NAME)
-            print("Successfully connected to ChromaDB.")
-            self._initialize_bm25_from_chroma()
-        except Exception as e:
-            print(f"Error connecting to ChromaDB or initializing BM25: {e}")
+            collection = self.db_client.get_collection(name=COLLECTION_NAME)
+        except Exception:
             print(f"Please make sure you have run the indexing script first.")
+            raise
+        apply_hnsw_search_params(collection)
+        print("Successfully connected to ChromaDB.")
+        return collection
 
-    def _initialize_bm25_from_chroma(self):
-        if not self.collection:
-            return
-        print("Initializing BM25 index from ChromaDB documents...")
-        try:
-            all_docs = self.collection.get(include=["documents", "metadatas"])
-            self.chunk_corpus = [
-                {"id": all_docs['ids'][i], "content": doc, "metadata": all_docs['metadatas'][i]}
-                for i, doc in enumerate(all_docs['documents'])
-            ]
-            tokenized_corpus = [doc['content'].split() for doc in self.chunk_corpus]
-            self.bm25_index = BM25Okapi(tokenized_corpus)
-            print(f"Successfully initialized BM25 index with {len(self.chunk_corpus)} documents.")
-        except Exception as e:
-            print(f"Error initializing BM25 index: {e}")
-
-    def _call_llm(self, prompt: str, json_format: bool = True) -> dict | str:
-        """呼叫本地 Ollama 模型。"""
-        try:
-            response = self.ollama_client.chat(
-                model=OLLAMA_MODEL,
-                messages=[{'role': 'user', 'content': prompt}],
-                format='json' if json_format else ''
-            )
-            content = response['message']['content']
-            if json_format:
-                return json.loads(content)
-            else:
-                return content
-        except Exception as e:
-            print(f"Error calling LLM: {e}")
-            return None
+    def _load_lexical_index(self) -> LexicalIndex | None:
+        """載入磁碟上的 BM25 索引；若與 ChromaDB 不一致則只補上差異的部分。"""
+        collection = self.collection
+        if not collection:
+            raise RuntimeError("ChromaDB is not available")
+        print("Loading BM25 index from disk...")
+        lexical_index = LexicalIndex()
+        if lexical_index.is_stale(collection):
+            print("BM25 index is missing or out of date. Syncing with ChromaDB...")
+            lexical_index.sync_with_collection(collection)
+        print(f"Successfully loaded BM25 index with {len(lexical_index)} documents.")
+        return lexical_index
+
+    def _load_vector_index(self) -> QuantizedVectorIndex:
+        collection = self.collection
+        if not collection:
+            raise RuntimeError("ChromaDB is not available")
+        vector_index = QuantizedVectorIndex()
+        if vector_index.is_stale(collection):
+            print("Quantized vector index is missing or out of date. Syncing with ChromaDB...")
+            vector_index.sync_with_collection(collection)
+        return vector_index
+
+    def _fetch_chunks(self, chunk_ids: list[str]) -> list[dict]:
+        """依照給定順序從 ChromaDB 取回 chunk 的內容與元資料。"""
+        if not chunk_ids:
+            return []
+        with telemetry.span("fetch_chunks", chunks=len(chunk_ids)):
+            fetched = self.collection.get(ids=chunk_ids, include=["documents", "metadatas"])
+        chunks_by_id = {
+            doc_id: {"id": doc_id, "content": fetched['documents'][i], "metadata": fetched['metadatas'][i]}
+            for i, doc_id in enumerate(fetched['ids'])
+        }
+        return [chunks_by_id[doc_id] for doc_id in chunk_ids if doc_id in chunks_by_id]
+
+    def _call_llm(self, template: str, inputs: dict, json_format: bool = True, on_token=None, validate=None) -> dict | str:
+        """以模板與輸入組成 prompt 並呼叫本地 Ollama 模型，成功的回應會寫入快取。
+
+        提供 on_token 時以串流模式呼叫，每收到一段 token 就以該段文字呼叫 on_token；快取命中時不會呼叫。
+        提供 validate 時只快取通過它的回應，一次偶發的不良生成不會讓同一輸入在 TTL 內都走備援流程。
+        """
+        with telemetry.span("llm", prompt=_PROMPT_NAMES.get(template, "other")) as attributes:
+            cache_key = None
+            if self.llm_cache:
+                fingerprint = template_fingerprint(OLLAMA_MODEL, template)
+                cache_key = self.llm_cache.make_key(fingerprint, inputs, json_format)
+                cached = self.llm_cache.get(cache_key)
+                if cached is not None:
+                    attributes["cache_hit"] = True
+                    telemetry.count("llm_cache_hits")
+                    return cached
+            attributes["cache_hit"] = False
+            telemetry.count("llm_calls")
+
+            prompt = template.format(**inputs)
+            try:
+                # 所有呼叫端（比對執行緒池、API 服務的並行請求）共用同一個在途請求上限
+                with self._llm_slots:
+                    response = self.ollama_client.chat(
+                        model=OLLAMA_MODEL,
+                        messages=[{'role': 'user', 'content': prompt}],
+                        format='json' if json_format else '',
+                        stream=on_token is not None
+                    )
+                    if on_token is None:
+                        content = response['message']['content']
+                    else:
+                        parts = []
+                        for chunk in response:
+                            text = chunk['message']['content']
+                            if text:
+                                parts.append(text)
+                                on_token(text)
+                            # token 數只出現在最後一個片段
+                            response = chunk
+                        content = ''.join(parts)
+                # Ollama 回報的 prompt 與生成 token 數
+                prompt_tokens, completion_tokens = response.get('prompt_eval_count'), response.get('eval_count')
+                if prompt_tokens or completion_tokens:
+                    attributes["prompt_tokens"], attributes["completion_tokens"] = prompt_tokens or 0, completion_tokens or 0
+                    telemetry.count("llm_prompt_tokens", prompt_tokens or 0)
+                    telemetry.count("llm_completion_tokens", completion_tokens or 0)
+                if json_format:
+                    result = json.loads(content)
+                else:
+                    result = content
+            except Exception as e:
+                print(f"Error calling LLM: {e}")
+                attributes["error"] = type(e).__name__
+                telemetry.count("llm_errors")
+                return None
+
+        if cache_key and (validate is None or validate(result)):
+            self.llm_cache.set(cache_key, fingerprint, result)
+        return result
+
+    @staticmethod
+    def _valid_rewrite(response) -> bool:
+        return isinstance(response, str) and bool(response.strip())
 
-    def rewrite_query(self, query: str) -> str:
+    @staticmethod
+    def _valid_claims(claims) -> bool:
+        return isinstance(claims, list) and bool(claims) and all(isinstance(claim, str) and claim.strip() for claim in claims)
+
+    def rewrite_query(self, query: str, on_token=None) -> str:
         """為更好的檢索重寫使用者查詢。"""
         print(f"Original query: {query}")
-        prompt = QUERY_REWRITING_PROMPT_TEMPLATE.format(user_input=query)
-        
-        rewritten_query = self._call_llm(prompt, json_format=False)
+        rewritten_query = self._call_llm(QUERY_REWRITING_PROMPT_TEMPLATE, {"user_input": query}, json_format=False,
+                                         on_token=on_token, validate=self._valid_rewrite)
         
-        if rewritten_query and rewritten_query.strip():
+        if self._valid_rewrite(rewritten_query):
             rewritten_query = rewritten_query.strip()
             print(f"Rewritten query: {rewritten_query}")
             return rewritten_query
@@ -85,13 +300,13 @@ class FactChecker:
             print("Query rewriting failed. Using original query.")
             return query
 
-    def extract_claims(self, query: str) -> list[str]:
+    def extract_claims(self, query: str, on_token=None) -> list[str]:
         """使用 LLM 從使用者輸入中抽取核心主張。"""
         print(f"Extracting claims from: {query}")
-        prompt = CLAIM_EXTRACTION_PROMPT_TEMPLATE.format(user_input=query)
-        response_json = self._call_llm(prompt)
+        response_json = self._call_llm(CLAIM_EXTRACTION_PROMPT_TEMPLATE, {"user_input": query}, on_token=on_token,
+                                       validate=lambda response: isinstance(response, dict) and self._valid_claims(response.get('claims')))
         
-        if response_json and 'claims' in response_json and isinstance(response_json['claims'], list):
+        if isinstance(response_json, dict) and self._valid_claims(response_json.get('claims')):
             claims = response_json['claims']
             print(f"Extracted claims: {claims}")
             return claims
@@ -99,6 +314,60 @@ class FactChecker:
             print("Failed to extract claims, using the original query as a single claim.")
             return [query]
 
+    def rewrite_and_extract(self, query: str, on_token=None) -> tuple[str, list[str]]:
+        """以單一 LLM 呼叫同時改寫查詢並抽取主張，回傳 (改寫後的查詢, 主張列表)。"""
+        print(f"Rewriting query and extracting claims from: {query}")
+        response_json = self._call_llm(
+            QUERY_UNDERSTANDING_PROMPT_TEMPLATE, {"user_input": query}, on_token=on_token,
+            validate=lambda response: isinstance(response, dict) and self._valid_rewrite(response.get('rewritten_query'))
+            and self._valid_claims(response.get('claims'))
+        )
+        if not isinstance(response_json, dict):
+            response_json = {}
+
+        rewritten_query = response_json.get('rewritten_query')
+        if self._valid_rewrite(rewritten_query):
+            rewritten_query = rewritten_query.strip()
+            print(f"Rewritten query: {rewritten_query}")
+        else:
+            print("Query rewriting failed. Using original query.")
+            rewritten_query = query
+        claims = response_json.get('claims')
+        if self._valid_claims(claims):
+            print(f"Extracted claims: {claims}")
+        else:
+            print("Failed to extract claims, using the original query as a single claim.")
+            claims = [query]
+        return rewritten_query, claims
+
+    def understand_query(self, query: str, on_token=None, on_rewritten=None) -> tuple[str, list[str]]:
+        """改寫查詢並抽取主張，回傳 (改寫後的查詢, 主張列表)。
+
+        skip_atomic_queries 啟用且輸入已是單一主張（見 is_atomic_claim）時不呼叫 LLM，直接把輸入當成唯一的主張；
+        否則依 query_mode 以一次（"fused"）或兩次（"separate"）LLM 呼叫完成，各自記錄為一個耗時區段。
+        on_token(stage) 回傳該階段的 token 串流回呼（stage 為 "rewrite"、"claims" 或 "understand"），
+        on_rewritten(改寫後的查詢) 在取得改寫結果時立即呼叫。
+        """
+        on_token = on_token or (lambda stage: None)
+        on_rewritten = on_rewritten or (lambda rewritten_query: None)
+        if self.skip_atomic_queries and is_atomic_claim(query):
+            print(f"Input is a single short claim, skipping query rewriting and claim extraction: {query}")
+            telemetry.count("query_llm_skipped")
+            query = query.strip()
+            on_rewritten(query)
+            return query, [query]
+        if self.query_mode == "fused":
+            with telemetry.span("rewrite_and_extract"):
+                rewritten_query, claims = self.rewrite_and_extract(query, on_token=on_token("understand"))
+            on_rewritten(rewritten_query)
+            return rewritten_query, claims
+        with telemetry.span("rewrite_query"):
+            rewritten_query = self.rewrite_query(query, on_token=on_token("rewrite"))
+        on_rewritten(rewritten_query)
+        with telemetry.span("extract_claims"):
+            claims = self.extract_claims(rewritten_query, on_token=on_token("claims"))
+        return rewritten_query, claims
+
     def _rerank_with_rrf(self, results_list: list[list[dict]], rrf_k: int = 60) -> list[dict]:
         """使用倒數排序融合 (Reciprocal Rank Fusion) 重新排序搜尋結果。"""
         scores = {}
@@ -119,102 +388,509 @@ class FactChecker:
 
         return [all_docs_map[doc_id] for doc_id in sorted_doc_ids]
 
-    def retrieve_evidence(self, claim: str, k: int = 5) -> list[dict]:
+    def _embed_claims(self, claims: list[str]) -> list[list[float]]:
+        """以一次批次前向運算嵌入所有主張；正規化後相同的主張直接取用 LRU 快取，其次是磁碟上的嵌入向量儲存。"""
+        keys = [clean_text(claim) for claim in claims]
+        embeddings = {}
+        with self._embedding_cache_lock:
+            for key in keys:
+                if key in self._embedding_cache:
+                    self._embedding_cache.move_to_end(key)
+                    embeddings[key] = self._embedding_cache[key]
+
+        missing = list(dict.fromkeys(key for key in keys if key not in embeddings))
+        telemetry.count("embedding_cache_hits", len(keys) - len(missing))
+        telemetry.count("embedding_cache_misses", len(missing))
+        if missing:
+            with telemetry.span("embed", texts=len(missing)):
+                embedded = self.embedding_function.embed_documents(missing)
+            for key, embedding in zip(missing, embedded):
+                embeddings[key] = list(map(float, embedding))
+            with self._embedding_cache_lock:
+                for key in missing:
+                    self._embedding_cache[key] = embeddings[key]
+                    self._embedding_cache.move_to_end(key)
+                while len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+                    self._embedding_cache.popitem(last=False)
+        return [embeddings[key] for key in keys]
+
+    def _vector_search_batch(self, claims: list[str], k: int, filters: dict | None = None) -> list[list[dict]]:
+        """以單一次多查詢的 collection.query（或本地量化索引）檢索所有主張的 top-k chunk；過濾條件轉成 where 子句。"""
+        query_embeddings = self._embed_claims(claims)
+        where = to_chroma_where(filters)
+        if self.vector_index is not None:
+            with telemetry.span("vector_search", backend="quantized", queries=len(claims), filtered=where is not None):
+                hits = self.vector_index.search(self.collection, query_embeddings, k, filters=filters)
+            chunks_by_id = {
+                chunk['id']: chunk
+                for chunk in self._fetch_chunks(list(dict.fromkeys(doc_id for ids, _ in hits for doc_id in ids)))
+            }
+            return [[chunks_by_id[doc_id] for doc_id in ids if doc_id in chunks_by_id] for ids, _ in hits]
+
+        with telemetry.span("vector_search", backend="chroma", queries=len(claims), filtered=where is not None):
+            vector_results_raw = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=k,
+                where=where,
+                include=["metadatas", "documents"]
+            )
+        
+        results_per_claim = []
+        for query_index in range(len(claims)):
+            vector_results = []
+            if vector_results_raw and vector_results_raw['ids'][query_index]:
+                for i, doc_id in enumerate(vector_results_raw['ids'][query_index]):
+                    vector_results.append({
+                        "id": doc_id,
+                        "content": vector_results_raw['documents'][query_index][i],
+                        "metadata": vector_results_raw['metadatas'][query_index][i]
+                    })
+            results_per_claim.append(vector_results)
+        return results_per_claim
+
+    def _lexical_search_batch(self, claims: list[str], k: int, filters: dict | None = None) -> list[list[dict]]:
+        """以 BM25 批次評分檢索所有主張的 top-k chunk，內容一次從 ChromaDB 取回；過濾條件以索引中的位元遮罩套用。"""
+        with telemetry.span("bm25_search", queries=len(claims), filtered=filters is not None):
+            bm25_hits = self.bm25_index.batch_top_k(self.bm25_index.tokenizer.encode_batch(claims), k, filters)
+        bm25_ids = [[self.bm25_index.doc_ids[i] for i in doc_indices] for doc_indices, _ in bm25_hits]
+        chunks_by_id = {
+            chunk['id']: chunk
+            for chunk in self._fetch_chunks(list(dict.fromkeys(doc_id for ids in bm25_ids for doc_id in ids)))
+        }
+        return [[chunks_by_id[doc_id] for doc_id in ids if doc_id in chunks_by_id] for ids in bm25_ids]
+
+    def retrieve_evidence(self, claim: str, k: int = 5, filters: dict | None = None) -> list[dict]:
         """執行混合搜尋 (Vector + BM25) 以檢索 top-k 相關證據。"""
-        if not self.collection or not self.bm25_index:
+        return self.retrieve_evidence_batch([claim], k=k, filters=filters)[0]
+
+    def retrieve_evidence_batch(self, claims: list[str], k: int = 5, filters: dict | None = None) -> list[list[dict]]:
+        """為多個主張執行混合搜尋；所有主張的嵌入、向量查詢與 BM25 評分各只需一次呼叫。
+
+        filters 可限制證據的發布日期範圍、來源與查核結果（格式見 knowledge_base.metadata_filters），
+        在兩種檢索評分前就排除不符合的 chunk；條件格式錯誤時拋出 ValueError。
+        """
+        evidence_per_claim, retrieved_per_claim = self.search_evidence_batch(claims, k, filters)
+        self.count_evidence(evidence_per_claim, retrieved_per_claim)
+        return evidence_per_claim
+
+    def count_evidence(self, evidence_per_claim: list[list[dict]], retrieved_per_claim: list[int]):
+        """把證據數與預篩的配對、捨棄數累加到目前的 Trace。
+
+        與 search_evidence_batch 分開，讓 API 服務在跨請求的批次檢索之後，於各自請求的 Trace 中計數。
+        """
+        if self.prescreener is not None:
+            pairs = sum(retrieved_per_claim)
+            telemetry.count("prescreen_pairs", pairs)
+            telemetry.count("prescreen_dropped", pairs - sum(map(len, evidence_per_claim)))
+        telemetry.count("evidence", sum(map(len, evidence_per_claim)))
+
+    def search_evidence_batch(self, claims: list[str], k: int = 5, filters: dict | None = None) -> tuple[list[list[dict]], list[int]]:
+        """retrieve_evidence_batch 的檢索部分，不更新計數器；回傳 (每個主張的證據, 每個主張預篩前的證據數)。"""
+        filters = normalize_filters(filters)
+        if not self.collection or self.bm25_index is None:
             print("Search components not initialized.")
-            return []
+            return [[] for _ in claims], [0] * len(claims)
+        if not claims:
+            return [], []
+
+        vector_results_per_claim = self._vector_search_batch(claims, k, filters)
+        bm25_results_per_claim = self._lexical_search_batch(claims, k, filters)
+
+        evidence_per_claim = []
+        for claim, vector_results, bm25_results in zip(claims, vector_results_per_claim, bm25_results_per_claim):
+            print(f"Performing hybrid search for claim: '{claim}'")
+
+            if not vector_results and not bm25_results:
+                print("No evidence found from any search method.")
+                evidence_per_claim.append([])
+                continue
             
-        print(f"Performing hybrid search for claim: '{claim}'")
+            reranked_results = self._rerank_with_rrf([vector_results, bm25_results])
+            
+            final_results = reranked_results[:k]
+            print(f"Retrieved {len(final_results)} pieces of evidence after reranking.")
+            evidence_per_claim.append(final_results)
 
-        claim_embedding = self.embedding_function.embed_query(claim)
-        vector_results_raw = self.collection.query(
-            query_embeddings=[claim_embedding],
-            n_results=k,
-            include=["metadatas", "documents"]
-        )
-        
-        vector_results = []
-        if vector_results_raw and vector_results_raw['ids'][0]:
-            for i, doc_id in enumerate(vector_results_raw['ids'][0]):
-                vector_results.append({
-                    "id": doc_id,
-                    "content": vector_results_raw['documents'][0][i],
-                    "metadata": vector_results_raw['metadatas'][0][i]
-                })
-
-        tokenized_query = claim.split()
-        bm25_scores = self.bm25_index.get_scores(tokenized_query)
-        
-        top_n_indices = sorted(range(len(bm25_scores)), key=lambda i: bm25_scores[i], reverse=True)[:k]
-        bm25_results = [self.chunk_corpus[i] for i in top_n_indices if bm25_scores[i] > 0]
+        retrieved_per_claim = [len(evidence_list) for evidence_list in evidence_per_claim]
+        prescreener = self.prescreener
+        if prescreener is not None:
+            pairs = sum(retrieved_per_claim)
+            with telemetry.span("prescreen", pairs=pairs) as attributes:
+                evidence_per_claim, dropped = prescreener.screen(claims, evidence_per_claim)
+                attributes["dropped"] = dropped
+            print(f"Pre-screen dropped {dropped} of {pairs} low-relevance evidence chunks.")
+        return evidence_per_claim, retrieved_per_claim
 
-        if not vector_results and not bm25_results:
-            print("No evidence found from any search method.")
-            return []
-        
-        reranked_results = self._rerank_with_rrf([vector_results, bm25_results])
-        
-        final_results = reranked_results[:k]
-        print(f"Retrieved {len(final_results)} pieces of evidence after reranking.")
-        return final_results
+    def _prescreened_alignment(self, evidence: dict) -> dict | None:
+        """預篩的 NLI 結果已達門檻時回傳該結果，否則回傳 None。"""
+        prescreener = self.prescreener
+        if prescreener is None:
+            return None
+        alignment = prescreener.resolve(evidence)
+        if alignment is not None:
+            telemetry.count("prescreen_resolved")
+        return alignment
 
-    def align_claim_with_evidence(self, claim: str, evidence: dict) -> dict:
-        """使用 LLM 判斷單一主張與單一證據之間的關係。"""
+    def _llm_align(self, claim: str, evidence: dict) -> dict:
         publication_date = evidence.get('metadata', {}).get('publication_date', 'N/A')
-        prompt = FACT_ALIGNMENT_PROMPT_TEMPLATE.format(
-            claim=claim, 
-            evidence=evidence['content'],
-            publication_date=publication_date
+        return self._call_llm(FACT_ALIGNMENT_PROMPT_TEMPLATE, {
+            "claim": claim,
+            "evidence": evidence['content'],
+            "publication_date": publication_date
+        }, validate=lambda response: self._validate_alignment(response) is not None)
+
+    def align_claim_with_evidence(self, claim: str, evidence: dict) -> dict:
+        """使用 LLM 判斷單一主張與單一證據之間的關係；預篩的 NLI 結果已達門檻時直接採用，不呼叫 LLM。"""
+        alignment = self._prescreened_alignment(evidence)
+        if alignment is not None:
+            return alignment
+        telemetry.count("alignment_llm_pairs")
+        return self._llm_align(claim, evidence)
+
+    @staticmethod
+    def _validate_alignment(item) -> dict | None:
+        """檢查比對結果（或批次回應中的單一項目）是否符合逐一比對的格式，回傳整理過的結果；不符合時回傳 None。"""
+        if not isinstance(item, dict) or item.get('label') not in _ALIGNMENT_LABELS:
+            return None
+        reasoning = item.get('reasoning')
+        try:
+            confidence = float(item.get('confidence_score'))
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(reasoning, str) or not 0.0 <= confidence <= 1.0:
+            return None
+        return {"label": item['label'], "reasoning": reasoning, "confidence_score": confidence}
+
+    @staticmethod
+    def _format_evidence_list(evidence_list: list[dict]) -> str:
+        return "\n\n".join(
+            f"[{number}] 發布日期: {evidence.get('metadata', {}).get('publication_date') or 'N/A'}\n{evidence['content']}"
+            for number, evidence in enumerate(evidence_list, start=1)
         )
-        return self._call_llm(prompt)
 
-    def check(self, query: str) -> dict:
-        """執行完整的事實查核流程。"""
+    def _llm_align_batch(self, claim: str, evidence_list: list[dict]) -> list[dict | None]:
+        """以一次 LLM 呼叫比對主張與多段證據，回傳與 evidence_list 對應的結果；缺漏或格式不符的項目為 None。
+
+        Ollama 的 JSON 模式傾向回傳物件，因此同時接受 {"results": [...]} 與直接回傳的列表；
+        項目以 index 對應證據編號，沒有 index 時依列表中的位置對應。
+        """
+        count = len(evidence_list)
+        response = self._call_llm(FACT_ALIGNMENT_BATCH_PROMPT_TEMPLATE, {
+            "claim": claim,
+            "count": count,
+            "evidence_list": self._format_evidence_list(evidence_list)
+        }, validate=lambda response: None not in self._parse_alignment_batch(response, count))
+        return self._parse_alignment_batch(response, count)
+
+    def _parse_alignment_batch(self, response, count: int) -> list[dict | None]:
+        items = response.get('results') if isinstance(response, dict) else response
+        by_number = {}
+        for position, item in enumerate(items if isinstance(items, list) else [], start=1):
+            if not isinstance(item, dict):
+                continue
+            try:
+                number = int(item.get('index', position))
+            except (TypeError, ValueError):
+                continue
+            by_number.setdefault(number, item)
+        return [self._validate_alignment(by_number.get(number)) for number in range(1, count + 1)]
+
+    def align_claim_with_evidence_batch(self, claim: str, evidence_list: list[dict]) -> list:
+        """以單一 prompt 比對主張與它的所有證據，回傳依排名排列的比對結果。
+
+        預篩已解決的配對不放進 prompt；批次回應中無法使用的項目改以逐一比對補上，
+        補比對時若排名更前面的結果已使判決確定，其餘項目標記為未執行。
+        """
+        raw_alignments = [self._prescreened_alignment(evidence) for evidence in evidence_list]
+        pending = [rank for rank, alignment in enumerate(raw_alignments) if alignment is None]
+        telemetry.count("alignment_llm_pairs", len(pending))
+        if len(pending) > 1:
+            batch = self._llm_align_batch(claim, [evidence_list[rank] for rank in pending])
+            for rank, alignment in zip(pending, batch):
+                raw_alignments[rank] = alignment
+            pending = [rank for rank in pending if raw_alignments[rank] is None]
+            if pending:
+                telemetry.count("alignment_batch_fallbacks", len(pending))
+        for rank in pending:
+            if self._decision_rank(raw_alignments[:rank]) is not None:
+                raw_alignments[rank] = _NOT_RUN
+            else:
+                raw_alignments[rank] = self._llm_align(claim, evidence_list[rank])
+        return raw_alignments
+
+    @staticmethod
+    def _is_decisive(alignment) -> bool:
+        """高信心的「矛盾」已足以把判決定為 False，之後的證據不可能再改變結論。"""
+        if not isinstance(alignment, dict) or alignment.get('label') != '矛盾':
+            return False
+        try:
+            return float(alignment.get('confidence_score', 0)) >= EARLY_EXIT_MIN_CONFIDENCE
+        except (TypeError, ValueError):
+            return False
+
+    def _decision_rank(self, raw_alignments: list) -> int | None:
+        """回傳判決確定時的證據排名；排名更前面的證據都必須已經比對完成。"""
+        if not ALIGNMENT_EARLY_EXIT:
+            return None
+        for rank, alignment in enumerate(raw_alignments):
+            if alignment is _NOT_RUN:
+                return None
+            if self._is_decisive(alignment):
+                return rank
+        return None
+
+    def _finalize_alignments(self, evidence_list: list[dict], raw_alignments: list) -> list[dict]:
+        """截斷在判決確定的排名，並為每個成功的比對結果附上對應的證據。"""
+        decision_rank = self._decision_rank(raw_alignments)
+        if decision_rank is not None:
+            evidence_list, raw_alignments = evidence_list[:decision_rank + 1], raw_alignments[:decision_rank + 1]
+        alignments = []
+        for evidence, alignment in zip(evidence_list, raw_alignments):
+            if isinstance(alignment, dict):
+                alignment['evidence'] = evidence
+                alignments.append(alignment)
+        return alignments
+
+    def _align_sequentially(self, claims, evidence_per_claim, on_alignment, on_claim) -> tuple[list[list], list[int]]:
+        """依 RRF 排名逐一比對，判決確定後即停止該主張的比對。"""
+        alignments_per_claim, skipped_per_claim = [], []
+        for i, (claim, evidence_list) in enumerate(zip(claims, evidence_per_claim)):
+            raw_alignments = [_NOT_RUN] * len(evidence_list)
+            for rank, evidence in enumerate(evidence_list):
+                raw_alignments[rank] = self.align_claim_with_evidence(claim, evidence)
+                on_alignment(i, rank, raw_alignments[rank])
+                if self._decision_rank(raw_alignments) is not None:
+                    break
+            alignments_per_claim.append(self._finalize_alignments(evidence_list, raw_alignments))
+            skipped_per_claim.append(raw_alignments.count(_NOT_RUN))
+            on_claim(i, alignments_per_claim[i], skipped_per_claim[i])
+        return alignments_per_claim, skipped_per_claim
+
+    def _align_concurrently(self, claims, evidence_per_claim, on_alignment, on_claim, executor) -> tuple[list[list], list[int]]:
+        """將所有配對送進執行緒池，某個主張的判決確定後取消其尚未開始的比對。"""
+        raw_per_claim = [[_NOT_RUN] * len(evidence_list) for evidence_list in evidence_per_claim]
+        alignments_per_claim = [None] * len(claims)
+        skipped_per_claim = [0] * len(claims)
+        futures_per_claim = [{} for _ in claims]
+        futures = {}
+        # 依排名交錯送出，讓每個主張排名最前的證據最先被比對
+        order = sorted((rank, i) for i, evidence_list in enumerate(evidence_per_claim) for rank in range(len(evidence_list)))
+        for rank, i in order:
+            future = executor.submit(telemetry.bind(self.align_claim_with_evidence), claims[i], evidence_per_claim[i][rank])
+            futures[future] = (i, rank)
+            futures_per_claim[i][rank] = future
+
+        def finish(i):
+            alignments_per_claim[i] = self._finalize_alignments(evidence_per_claim[i], raw_per_claim[i])
+            on_claim(i, alignments_per_claim[i], skipped_per_claim[i])
+
+        remaining = [len(evidence_list) for evidence_list in evidence_per_claim]
+        for i in range(len(claims)):
+            if not remaining[i]:
+                finish(i)
+        for future in as_completed(futures):
+            i, rank = futures[future]
+            remaining[i] -= 1
+            if alignments_per_claim[i] is not None or future.cancelled():
+                continue
+            raw_per_claim[i][rank] = future.result()
+            on_alignment(i, rank, raw_per_claim[i][rank])
+            decision_rank = self._decision_rank(raw_per_claim[i])
+            if decision_rank is not None:
+                for later_rank, later_future in futures_per_claim[i].items():
+                    if later_rank > decision_rank and later_future.cancel():
+                        skipped_per_claim[i] += 1
+            if decision_rank is not None or not remaining[i]:
+                finish(i)
+        return alignments_per_claim, skipped_per_claim
+
+    def _align_batched(self, claims, evidence_per_claim, on_alignment, on_claim, executor) -> tuple[list[list], list[int]]:
+        """每個主張以一次批次 prompt 比對所有證據；有執行緒池時不同主張並行送出。"""
+        alignments_per_claim = [None] * len(claims)
+        skipped_per_claim = [0] * len(claims)
+        if executor:
+            futures = {executor.submit(telemetry.bind(self.align_claim_with_evidence_batch), claim, evidence_list): i
+                       for i, (claim, evidence_list) in enumerate(zip(claims, evidence_per_claim))}
+            completed = ((futures[future], future.result()) for future in as_completed(futures))
+        else:
+            completed = ((i, self.align_claim_with_evidence_batch(claim, evidence_list))
+                         for i, (claim, evidence_list) in enumerate(zip(claims, evidence_per_claim)))
+        for i, raw_alignments in completed:
+            for rank, alignment in enumerate(raw_alignments):
+                if alignment is not _NOT_RUN:
+                    on_alignment(i, rank, alignment)
+            alignments_per_claim[i] = self._finalize_alignments(evidence_per_claim[i], raw_alignments)
+            skipped_per_claim[i] = raw_alignments.count(_NOT_RUN)
+            on_claim(i, alignments_per_claim[i], skipped_per_claim[i])
+        return alignments_per_claim, skipped_per_claim
+
+    def align_claims(
+        self,
+        claims: list[str],
+        evidence_per_claim: list[list[dict]],
+        on_alignment=None,
+        on_claim=None,
+        executor=None
+    ) -> tuple[list[list[dict]], list[int]]:
+        """為所有 (主張, 證據) 配對執行比對，回傳 (每個主張的比對結果, 每個主張略過的 LLM 呼叫次數)。
+
+        證據依 RRF 排名比對；啟用 ALIGNMENT_EARLY_EXIT 時，一旦出現高信心的「矛盾」，
+        該主張其餘的比對就會略過。並行模式下結果會截斷在同一個排名，因此輸出與逐一比對相同。
+        alignment_mode 為 "batched" 時每個主張的所有證據在同一次 LLM 呼叫中比對，結果同樣截斷在判決確定的排名。
+        每完成一次比對會呼叫 on_alignment(主張索引, 排名, 比對結果)，
+        某個主張的結果確定時呼叫 on_claim(主張索引, 比對結果, 略過次數)，兩者都在呼叫端的執行緒中執行。
+        executor 為送出 LLM 請求的執行緒池，未提供時使用 self.llm_executor。
+        """
+        executor = executor or self.llm_executor
+        on_alignment = on_alignment or (lambda i, rank, alignment: None)
+        on_claim = on_claim or (lambda i, alignments, skipped: None)
+        with telemetry.span("align", pairs=sum(map(len, evidence_per_claim))):
+            if self.alignment_mode == "batched":
+                alignments_per_claim, skipped_per_claim = self._align_batched(claims, evidence_per_claim, on_alignment, on_claim, executor)
+            elif executor:
+                alignments_per_claim, skipped_per_claim = self._align_concurrently(claims, evidence_per_claim, on_alignment, on_claim, executor)
+            else:
+                alignments_per_claim, skipped_per_claim = self._align_sequentially(claims, evidence_per_claim, on_alignment, on_claim)
+        telemetry.count("alignments_skipped", sum(skipped_per_claim))
+        return alignments_per_claim, skipped_per_claim
+
+    def check(self, query: str, filters: dict | None = None, k: int = 5) -> dict:
+        """執行完整的事實查核流程；filters 限制檢索的證據（見 retrieve_evidence_batch），k 為每個主張的證據數。"""
+        return self._run_check(query, filters=filters, k=k)
+
+    def check_stream(self, query: str, filters: dict | None = None, k: int = 5):
+        """與 check 相同的流程，但以產生器逐步回傳各階段的事件，最後一個事件是 "result" 或 "error"。
+
+        事件都是帶有 "type" 的 dict：
+        - "token": 查詢改寫與主張抽取的 LLM 串流片段（stage、text；stage 見 understand_query）
+        - "rewritten_query"、"claims"：改寫後的查詢與抽取出的主張
+        - "evidence": 某個主張的檢索結果（claim_index、claim、evidence）
+        - "alignment": 單次證據比對的結果（claim_index、rank、alignment，LLM 失敗時為 None）
+        - "claim_result": 某個主張的最終判決，格式與 check 結果中的 results_per_claim 相同
+        - "result": 與 check 相同的完整結果
+
+        查核在背景執行緒中執行；提前停止迭代時，背景的查核仍會執行完畢。
+        """
+        events = queue.Queue()
+        done = object()
+
+        def run():
+            try:
+                self._run_check(query, events.put, filters, k)
+            except Exception as e:
+                events.put({"type": "error", "error": f"{type(e).__name__}: {e}"})
+            finally:
+                events.put(done)
+
+        threading.Thread(target=run, name="fact-check-stream", daemon=True).start()
+        while (event := events.get()) is not done:
+            yield event
+
+    def _run_check(self, query: str, emit=None, filters: dict | None = None, k: int = 5) -> dict:
+        """check 與 check_stream 共用的流程；提供 emit 時在每個階段完成時以事件呼叫它。
+
+        各階段的耗時與計數器附在結果的 "telemetry" 欄位（格式見 utils.telemetry.Trace.to_dict）。
+        """
+        # 先檢查過濾條件，格式錯誤時不必等到 LLM 呼叫之後才失敗
+        filters = normalize_filters(filters)
+        with telemetry.start_trace("fact_check") as trace:
+            result = self.run_pipeline(query, emit, filters, k)
+        if "error" in result:
+            if emit:
+                emit({"type": "error", "error": result["error"]})
+            return result
+        result["telemetry"] = trace.to_dict()
+        if emit:
+            emit({"type": "result", "result": result})
+        return result
+
+    def run_pipeline(self, query: str, emit=None, filters: dict | None = None, k: int = 5, retrieve=None) -> dict:
+        """查核流程本身（查詢理解、檢索、比對與彙整），在呼叫端的 Trace 下執行；知識庫無法使用時回傳 {"error": ...}。
+
+        提供 emit 時以中間事件（格式見 check_stream，不含最後的 "result" 與 "error"）呼叫它。
+        retrieve(主張列表, k, filters) 的格式與 search_evidence_batch 相同，預設即為該方法；
+        API 服務以它把檢索交給跨請求的微批次處理，證據與預篩的計數仍記在這次查核的 Trace。filters 須已由 normalize_filters 整理過。
+        """
         if not self.collection:
             return {"error": "Knowledge base not available."}
+        retrieve = retrieve or self.search_evidence_batch
+        # 只有呼叫端會接收事件時才使用 Ollama 的 token 串流
+        stream_tokens = LLM_STREAM_TOKENS and emit is not None
+        emit = emit or (lambda event: None)
 
-        rewritten_query = self.rewrite_query(query)
-        claims = self.extract_claims(rewritten_query)
-        final_results = {"query": query, "rewritten_query": rewritten_query, "results_per_claim": []}
+        def on_token(stage):
+            if not stream_tokens:
+                return None
+            return lambda text: emit({"type": "token", "stage": stage, "text": text})
 
-        for claim in claims:
-            evidence_list = self.retrieve_evidence(claim)
-            if not evidence_list:
-                claim_result = {
-                    "claim": claim,
-                    "final_verdict": "Abstain",
-                    "reasoning": "Could not find any relevant evidence in the knowledge base.",
-                    "evidence": []
-                }
-                final_results["results_per_claim"].append(claim_result)
-                continue
+        rewritten_query, claims = self.understand_query(
+            query, on_token, lambda rewritten_query: emit({"type": "rewritten_query", "rewritten_query": rewritten_query})
+        )
+        telemetry.count("claims", len(claims))
+        emit({"type": "claims", "claims": claims})
+        with telemetry.span("retrieve", claims=len(claims)):
+            evidence_per_claim, retrieved_per_claim = retrieve(claims, k, filters)
+        self.count_evidence(evidence_per_claim, retrieved_per_claim)
+        for i, (claim, evidence_list) in enumerate(zip(claims, evidence_per_claim)):
+            emit({"type": "evidence", "claim_index": i, "claim": claim, "evidence": evidence_list})
+        alignments_per_claim, skipped_per_claim = self.align_claims(
+            claims, evidence_per_claim,
+            on_alignment=lambda i, rank, alignment: emit(
+                {"type": "alignment", "claim_index": i, "rank": rank, "alignment": alignment}
+            ),
+            on_claim=lambda i, alignments, skipped: emit({
+                "type": "claim_result", "claim_index": i,
+                "result": self.claim_result(claims[i], evidence_per_claim[i], alignments, skipped)
+            })
+        )
+        return self.assemble_result(query, rewritten_query, claims, evidence_per_claim, alignments_per_claim, skipped_per_claim)
 
-            alignments = []
-            for evidence in evidence_list:
-                alignment = self.align_claim_with_evidence(claim, evidence)
-                if alignment:
-                    alignment['evidence'] = evidence
-                    alignments.append(alignment)
-            
-            final_verdict = "Neutral"
-            final_reasoning = "證據與主張相關，但無法得出明確結論。"
-            contradictions = [a for a in alignments if a.get('label') == '矛盾']
-            entailments = [a for a in alignments if a.get('label') == '支持']
-
-            if contradictions:
-                final_verdict = "False"
-                final_reasoning = contradictions[0]['reasoning']
-            elif entailments:
-                final_verdict = "True"
-                final_reasoning = entailments[0]['reasoning']
-
-            claim_result = {
+    @staticmethod
+    def claim_result(claim: str, evidence_list: list[dict], alignments: list[dict], skipped: int) -> dict:
+        """由單一主張的證據比對結果決定它的最終判決。"""
+        if not evidence_list:
+            return {
                 "claim": claim,
-                "final_verdict": final_verdict,
-                "reasoning": final_reasoning,
-                "evidence_alignments": alignments
+                "final_verdict": "Abstain",
+                "reasoning": "Could not find any relevant evidence in the knowledge base.",
+                "evidence": [],
+                "skipped_alignments": 0
             }
-            final_results["results_per_claim"].append(claim_result)
 
+        final_verdict = "Neutral"
+        final_reasoning = "證據與主張相關，但無法得出明確結論。"
+        contradictions = [a for a in alignments if a.get('label') == '矛盾']
+        entailments = [a for a in alignments if a.get('label') == '支持']
+
+        if contradictions:
+            final_verdict = "False"
+            final_reasoning = contradictions[0]['reasoning']
+        elif entailments:
+            final_verdict = "True"
+            final_reasoning = entailments[0]['reasoning']
+
+        return {
+            "claim": claim,
+            "final_verdict": final_verdict,
+            "reasoning": final_reasoning,
+            "evidence_alignments": alignments,
+            "skipped_alignments": skipped
+        }
+
+    def assemble_result(
+        self,
+        query: str,
+        rewritten_query: str,
+        claims: list[str],
+        evidence_per_claim: list[list[dict]],
+        alignments_per_claim: list[list[dict]],
+        skipped_per_claim: list[int]
+    ) -> dict:
+        """由各階段的結果彙整每個主張的最終判決。"""
+        final_results = {"query": query, "rewritten_query": rewritten_query, "results_per_claim": []}
+        final_results["skipped_alignments"] = sum(skipped_per_claim)
+        if self.llm_cache:
+            final_results["llm_cache"] = self.llm_cache.stats()
+        for claim, evidence_list, alignments, skipped in zip(claims, evidence_per_claim, alignments_per_claim, skipped_per_claim):
+            final_results["results_per_claim"].append(self.claim_result(claim, evidence_list, alignments, skipped))
         return final_results
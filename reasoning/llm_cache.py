@@ -0,0 +1,121 @@
+# reasoning/llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.config import (
+    LLM_CACHE_PATH,
+    LLM_CACHE_MEMORY_ITEMS,
+    LLM_CACHE_MAX_ITEMS,
+    LLM_CACHE_TTL_SECONDS
+)
+
+# 每寫入這麼多筆才檢查一次磁碟容量，避免每次寫入都計數
+_EVICTION_INTERVAL = 256
+
+
+def template_fingerprint(model: str, template: str) -> str:
+    """模型名稱加上 prompt 模板的雜湊；任一者改變時舊的快取就不會再被命中。"""
+    return hashlib.sha256(f"{model}\0{template}".encode('utf-8')).hexdigest()[:16]
+
+
+class LLMCache:
+    """以內容定址的 LLM 回應快取：記憶體 LRU 加上 SQLite 磁碟層。
+
+    鍵由模型、模板指紋、輸入內容與輸出格式組成。磁碟層的項目有 TTL，
+    並在超過容量上限時淘汰最久未使用者。舊指紋的項目不會再被命中，但不在建立時刪除：
+    共用同一個快取檔的其他行程（不同模型或模板）可能仍在使用，交給 TTL 與容量淘汰回收。
+    """
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        memory_items: int = LLM_CACHE_MEMORY_ITEMS,
+        max_items: int = LLM_CACHE_MAX_ITEMS,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS
+    ):
+        self.path = path
+        self.memory_items = memory_items
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(fingerprint: str, inputs: dict, json_format: bool) -> str:
+        payload = json.dumps({"inputs": inputs, "json": json_format}, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(f"{fingerprint}\0{payload}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """回傳快取的回應；每次都回傳新的物件，呼叫端修改結果不會影響快取。"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return json.loads(entry[0])
+
+            row = self._conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] >= self.ttl_seconds:
+                self.counters["misses"] += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._remember(key, row[0], row[1])
+            self.counters["disk_hits"] += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, fingerprint: str, value):
+        now = time.time()
+        serialized = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, serialized, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, fingerprint, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, fingerprint, serialized, now, now)
+            )
+            self._writes += 1
+            if self._writes % _EVICTION_INTERVAL == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _remember(self, key: str, serialized: str, created_at: float):
+        self._memory[key] = (serialized, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        if count > self.max_items:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_items,)
+            )
+
+    def stats(self) -> dict:
+        """回傳命中與未命中次數以及命中率。"""
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
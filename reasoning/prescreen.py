@@ -0,0 +1,111 @@
+# reasoning/prescreen.py
+"""證據預篩：在 LLM 比對之前，以 CPU 上的小型 cross-encoder 為所有 (主張, 證據) 配對批次評分。
+
+相關性分數低於門檻的證據直接捨棄，其餘依分數重新排序；NLI 模型判定為高信心蘊含或矛盾的配對
+直接產生比對結果，不必再送往 Ollama。
+"""
+import numpy as np
+
+from utils.config import (
+    PRESCREEN_RERANK_MODEL,
+    PRESCREEN_MIN_RELEVANCE,
+    PRESCREEN_NLI_MODEL,
+    PRESCREEN_NLI_THRESHOLD,
+    PRESCREEN_BATCH_SIZE,
+    PRESCREEN_MAX_LENGTH
+)
+
+# NLI 模型的輸出標籤（依前綴比對）對應到比對結果的標籤與說明
+_NLI_LABELS = {
+    "entailment": ("entail", "支持", "證據支持此主張"),
+    "contradiction": ("contradict", "矛盾", "證據與此主張矛盾")
+}
+
+
+class EvidencePrescreener:
+    """以相關性 cross-encoder 篩選證據，並以 NLI cross-encoder 解決明確的配對。"""
+    def __init__(
+        self,
+        rerank_model: str = PRESCREEN_RERANK_MODEL,
+        nli_model: str | None = PRESCREEN_NLI_MODEL,
+        min_relevance: float = PRESCREEN_MIN_RELEVANCE,
+        nli_threshold: float = PRESCREEN_NLI_THRESHOLD,
+        batch_size: int = PRESCREEN_BATCH_SIZE,
+        max_length: int = PRESCREEN_MAX_LENGTH
+    ):
+        # sentence-transformers 的匯入成本高，只在啟用預篩時才匯入
+        from sentence_transformers import CrossEncoder
+        self.reranker = CrossEncoder(rerank_model, max_length=max_length, device="cpu")
+        self.nli = CrossEncoder(nli_model, max_length=max_length, device="cpu") if nli_model else None
+        self.nli_columns = self._label_columns(self.nli.config.id2label) if self.nli else {}
+        self.min_relevance = min_relevance
+        self.nli_threshold = nli_threshold
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _label_columns(id2label: dict) -> dict[str, int]:
+        """由模型設定的 id2label 找出蘊含與矛盾機率所在的輸出欄位。"""
+        columns = {}
+        for index, label in id2label.items():
+            for name, (prefix, *_) in _NLI_LABELS.items():
+                if str(label).lower().startswith(prefix):
+                    columns[name] = int(index)
+        if len(columns) != len(_NLI_LABELS):
+            raise ValueError(f"NLI model labels {id2label} do not include entailment and contradiction.")
+        return columns
+
+    def score(self, pairs: list[tuple[str, str]]) -> list[dict]:
+        """為 (主張, 證據文字) 配對評分；通過相關性門檻的配對另外附上 NLI 的蘊含與矛盾機率。"""
+        if not pairs:
+            return []
+        relevance = np.asarray(
+            self.reranker.predict(pairs, batch_size=self.batch_size, show_progress_bar=False), dtype=np.float32
+        ).reshape(len(pairs))
+        scores = [{"relevance": float(value)} for value in relevance]
+        if self.nli is not None:
+            kept = [i for i, value in enumerate(relevance) if value >= self.min_relevance]
+            if kept:
+                # NLI 的前提是證據，假設是主張
+                probabilities = self.nli.predict(
+                    [(pairs[i][1], pairs[i][0]) for i in kept],
+                    batch_size=self.batch_size, apply_softmax=True, show_progress_bar=False
+                )
+                for i, row in zip(kept, np.asarray(probabilities, dtype=np.float32)):
+                    for name, column in self.nli_columns.items():
+                        scores[i][name] = float(row[column])
+        return scores
+
+    def screen(self, claims: list[str], evidence_per_claim: list[list[dict]]) -> tuple[list[list[dict]], int]:
+        """所有主張的證據一起評分，捨棄相關性不足的證據並依分數重新排序，回傳 (篩選後的證據, 捨棄數)。
+
+        保留的證據是附上 "prescreen" 分數的副本，同一個 chunk 在不同主張下的分數互不影響。
+        """
+        pairs = [(claim, evidence['content']) for claim, evidence_list in zip(claims, evidence_per_claim) for evidence in evidence_list]
+        scores = iter(self.score(pairs))
+        screened, dropped = [], 0
+        for evidence_list in evidence_per_claim:
+            scored = [dict(evidence, prescreen=next(scores)) for evidence in evidence_list]
+            kept = [evidence for evidence in scored if evidence["prescreen"]["relevance"] >= self.min_relevance]
+            dropped += len(scored) - len(kept)
+            screened.append(sorted(kept, key=lambda evidence: evidence["prescreen"]["relevance"], reverse=True))
+        return screened, dropped
+
+    def resolve(self, evidence: dict) -> dict | None:
+        """NLI 機率達門檻時回傳與 LLM 比對相同格式的結果，否則回傳 None。"""
+        scores = evidence.get("prescreen") or {}
+        for name, (_, label, description) in _NLI_LABELS.items():
+            probability = scores.get(name, 0.0)
+            if probability >= self.nli_threshold:
+                return {
+                    "label": label,
+                    "reasoning": f"NLI 模型判定{description}（機率 {probability:.2f}），未經 LLM 比對。",
+                    "confidence_score": probability,
+                    "prescreened": True
+                }
+        return None
+
+
+def llm_pair_fraction(counters: dict) -> float | None:
+    """由 Trace 的計數器算出檢索到的 (主張, 證據) 配對中實際交給 LLM 比對的比例；沒有配對時回傳 None。"""
+    pairs = counters.get("prescreen_pairs", counters.get("evidence", 0))
+    return counters.get("alignment_llm_pairs", 0) / pairs if pairs else None
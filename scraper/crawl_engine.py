@@ -0,0 +1,205 @@
+# scraper/crawl_engine.py
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.config import (
+    SCRAPER_USER_AGENT,
+    SCRAPER_MAX_PER_HOST,
+    SCRAPER_MIN_INTERVAL,
+    SCRAPER_MAX_RETRIES,
+    SCRAPER_BACKOFF_FACTOR,
+    SCRAPER_TIMEOUT,
+    SCRAPER_VERIFY_SSL
+)
+
+
+class PoliteSession:
+    """共用連線池的 HTTP 工作階段，限制每個主機的並行數與請求間隔，並以指數退避重試。"""
+    def __init__(
+        self,
+        max_per_host: int = SCRAPER_MAX_PER_HOST,
+        min_interval: float = SCRAPER_MIN_INTERVAL,
+        max_retries: int = SCRAPER_MAX_RETRIES,
+        backoff_factor: float = SCRAPER_BACKOFF_FACTOR,
+        timeout: float = SCRAPER_TIMEOUT,
+        verify: bool = SCRAPER_VERIFY_SSL
+    ):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.verify = verify
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            respect_retry_after_header=True
+        )
+        # 連線池大小與每主機並行數一致，同一主機的 TCP/TLS 連線可被重複使用
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max_per_host, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({'User-Agent': SCRAPER_USER_AGENT})
+
+        self._lock = threading.Lock()
+        self._host_slots = defaultdict(lambda: threading.BoundedSemaphore(self.max_per_host))
+        self._next_request_at = defaultdict(float)
+
+        if not verify:
+            import urllib3
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    @contextmanager
+    def _host_slot(self, host: str):
+        with self._lock:
+            slot = self._host_slots[host]
+        with slot:
+            self._wait_for_turn(host)
+            yield
+
+    def _wait_for_turn(self, host: str):
+        """保證對同一主機的請求之間至少間隔 min_interval 秒。"""
+        with self._lock:
+            now = time.monotonic()
+            scheduled = max(now, self._next_request_at[host])
+            self._next_request_at[host] = scheduled + self.min_interval
+        if scheduled > now:
+            time.sleep(scheduled - now)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        host = urlparse(url).netloc
+        with self._host_slot(host):
+            return self.session.get(url, timeout=self.timeout, verify=self.verify, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class CrawlCheckpoint:
+    """以 JSON Lines 追加寫入的爬取進度，程式中斷後可從上次停止的地方繼續。
+
+    每完成一篇文章或一個列表頁就寫入一行；重新啟動時讀回已完成的部分。
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.articles = {}
+        self.page_articles = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中斷時可能留下寫到一半的最後一行
+                    continue
+                if record.get("type") == "article":
+                    self.articles[record["article"]["url"]] = record["article"]
+                elif record.get("type") == "page":
+                    self.page_articles[record["url"]] = record["articles"]
+        if self.articles or self.page_articles:
+            print(f"Resuming crawl from checkpoint: {len(self.page_articles)} pages, {len(self.articles)} articles done.")
+        # 確保之後追加的紀錄從新的一行開始
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+
+    def _append(self, record: dict):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def add_article(self, article: dict):
+        self.articles[article["url"]] = article
+        self._append({"type": "article", "article": article})
+
+    def complete_page(self, url: str, article_urls: list[str]):
+        """列表頁的所有文章都已處理完畢後才標記完成，續爬時不必再抓這個列表頁。"""
+        self.page_articles[url] = article_urls
+        self._append({"type": "page", "url": url, "articles": article_urls})
+        # 這一頁的文章已交給下游，不再保留在記憶體中
+        for article_url in article_urls:
+            self.articles.pop(article_url, None)
+
+    def take_page(self, url: str) -> list[dict]:
+        """取出續爬時已完成列表頁的文章，取出後即從記憶體釋放。"""
+        return [self.articles.pop(u) for u in self.page_articles[url] if u in self.articles]
+
+    def clear(self):
+        """整個爬取順利完成後移除檢查點。"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class CrawlLedger:
+    """已爬取文章的帳本：網址、內容雜湊、ETag/Last-Modified 與爬取時間。
+
+    增量爬取時以帳本送出條件式請求並判斷文章是否有變動；完整爬取時只記錄，不讀取。
+    帳本只在呼叫 save() 時寫回磁碟，讓呼叫端可以等下游的索引建立成功後再提交。
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, url: str) -> dict | None:
+        return self.entries.get(url)
+
+    def clear(self):
+        """清空帳本（完整重建時使用），同樣要等 save() 才寫回磁碟。"""
+        with self._lock:
+            self.entries = {}
+
+    def record(self, url: str, content_hash: str, scraped_at: str, etag: str | None = None, last_modified: str | None = None):
+        with self._lock:
+            self.entries[url] = {
+                "content_hash": content_hash,
+                "etag": etag,
+                "last_modified": last_modified,
+                "scraped_at": scraped_at
+            }
+
+    def touch(self, url: str, etag: str | None = None, last_modified: str | None = None):
+        """文章沒有變動時，只更新驗證標頭。"""
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return
+            entry["etag"] = etag or entry.get("etag")
+            entry["last_modified"] = last_modified or entry.get("last_modified")
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
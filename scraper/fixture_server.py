@@ -0,0 +1,72 @@
+# scraper/fixture_server.py
+"""在本機提供 sample_data/tfc_site 頁面的 HTTP 伺服器，用來測試爬蟲而不連線到 TFC。
+
+用法：
+    python -m scraper.fixture_server --port 8765            # 只啟動伺服器
+    python -m scraper.fixture_server --crawl --fail-every 3  # 啟動伺服器並實際爬取一次
+"""
+import argparse
+import functools
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from utils.config import SAMPLE_SITE_DIR
+
+
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    """提供靜態頁面；可設定每 N 個請求回傳一次 503，以測試重試機制。"""
+    fail_every = 0
+    latency = 0.0
+    _request_count = 0
+    _count_lock = threading.Lock()
+
+    def do_GET(self):
+        with FixtureRequestHandler._count_lock:
+            FixtureRequestHandler._request_count += 1
+            count = FixtureRequestHandler._request_count
+        if self.latency:
+            threading.Event().wait(self.latency)
+        if self.fail_every and count % self.fail_every == 0:
+            self.send_error(503, "Injected failure")
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server(root: str = SAMPLE_SITE_DIR, port: int = 0, fail_every: int = 0, latency: float = 0.0):
+    """在背景執行緒啟動伺服器，回傳 (server, base_url)；port 為 0 時自動選擇可用埠號。"""
+    handler = functools.partial(FixtureRequestHandler, directory=root)
+    FixtureRequestHandler.fail_every = fail_every
+    FixtureRequestHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-every", type=int, default=0, help="每 N 個請求回傳一次 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求的模擬延遲（秒）")
+    parser.add_argument("--crawl", action="store_true", help="啟動後以 TFCScraper 爬取一次並結束")
+    args = parser.parse_args()
+
+    server, base_url = start_fixture_server(port=args.port, fail_every=args.fail_every, latency=args.latency)
+    print(f"Serving {SAMPLE_SITE_DIR} at {base_url}")
+    if args.crawl:
+        from .scrapers import TFCScraper
+        articles = TFCScraper().scrape(base_url=f"{base_url}/fact-check-reports-all/", max_pages=3)
+        for article in articles:
+            print(f"  [{article['status']}] {article['title']} ({article['publication_date']})")
+        server.shutdown()
+        return
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,256 @@
-
 # scraper/scrapers.py
+import datetime
+import hashlib
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
 import requests
 from bs4 import BeautifulSoup
-import datetime
-import json
 from .base_scraper import BaseScraper
+from .crawl_engine import PoliteSession, CrawlCheckpoint, CrawlLedger
+from utils.config import SCRAPER_MAX_WORKERS, INCREMENTAL_STOP_AFTER_KNOWN
 
 class BaseScraper:
     def scrape(self, **kwargs):
         raise NotImplementedError
 
 class TFCScraper(BaseScraper):
-    def scrape(self, base_url: str, max_pages: int = 1) -> list[dict]:
-        all_articles = []
+    def __init__(self, session: PoliteSession | None = None, max_workers: int = SCRAPER_MAX_WORKERS):
+        # 所有請求共用同一個具連線池的工作階段，避免每篇文章都重新建立 TCP/TLS 連線
+        self.http = session or PoliteSession()
+        self.max_workers = max_workers
+        self._counts = {}
+        self._counts_lock = threading.Lock()
+
+    def _count(self, kind: str):
+        with self._counts_lock:
+            self._counts[kind] = self._counts.get(kind, 0) + 1
+
+    def scrape(
+        self,
+        base_url: str,
+        max_pages: int = 1,
+        checkpoint_path: str | None = None,
+        ledger: CrawlLedger | None = None,
+        stop_after_known: int = INCREMENTAL_STOP_AFTER_KNOWN,
+        incremental: bool = True
+    ) -> list[dict]:
+        """一次取得所有文章的串列；參數與 iter_scrape 相同，大量爬取時請改用 iter_scrape。"""
+        return list(self.iter_scrape(base_url, max_pages, checkpoint_path, ledger, stop_after_known, incremental))
+
+    def iter_scrape(
+        self,
+        base_url: str,
+        max_pages: int = 1,
+        checkpoint_path: str | None = None,
+        ledger: CrawlLedger | None = None,
+        stop_after_known: int = INCREMENTAL_STOP_AFTER_KNOWN,
+        incremental: bool = True
+    ) -> Iterator[dict]:
+        """依序抓取列表頁，文章頁則交給執行緒池並行抓取；提供 checkpoint_path 時可中斷續爬。
+
+        以產生器逐頁交出文章：抓取下一個列表頁時，前一頁的文章在背景下載，
+        記憶體中最多只保留兩頁的文章。
+        提供 ledger 時為增量模式：已知文章以 ETag/Last-Modified 送出條件式請求，
+        只交出新增或內容有變動的文章，並在連續遇到 stop_after_known 篇已知文章後停止翻頁。
+        incremental 為 False 時不讀取 ledger，照常抓取所有文章，只把爬取結果記錄到 ledger 中。
+        """
         if not base_url.endswith('/'):
             base_url += '/'
+        checkpoint = CrawlCheckpoint(checkpoint_path) if checkpoint_path else None
+        self._counts = {"new": 0, "changed": 0, "unchanged": 0}
+        known_run = 0
+        reached_known = False
+        total = 0
+
+        # 上一個列表頁的 (頁面網址, 文章 futures)，等下一頁開始抓取後才收集結果
+        pending = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for page_num in range(1, max_pages + 1):
+                if page_num > 1:
+                    url = f"{base_url}page/{page_num}/"
+                else:
+                    url = base_url
+
+                if checkpoint and url in checkpoint.page_articles:
+                    print(f"Skipping TFC page already in checkpoint: {url}")
+                    page = (url, None)
+                else:
+                    print(f"Scraping TFC page: {url}")
+                    try:
+                        response = self.http.get(url)
+                        response.raise_for_status()
+                    except requests.exceptions.RequestException as e:
+                        print(f"Error fetching page {url}: {e}")
+                        continue
+
+                    entries = self.parse_listing(response.content, url)
+                    if entries is None:
+                        print(f"No articles found on page {page_num}. The structure might have changed or it's the last page.")
+                        break
+
+                    if ledger is not None and incremental:
+                        # 列表由新到舊排列，連續出現已知文章代表已經接上次爬過的範圍
+                        for i, entry in enumerate(entries):
+                            known_run = known_run + 1 if entry['url'] in ledger else 0
+                            if known_run >= stop_after_known:
+                                entries = entries[:i + 1]
+                                reached_known = True
+                                break
+
+                    # 文章頁在背景抓取的同時，主執行緒繼續抓下一個列表頁
+                    futures = [executor.submit(self._scrape_entry, entry, checkpoint, ledger, incremental) for entry in entries]
+                    page = (url, futures)
+
+                if pending is not None:
+                    page_articles = self._collect_page(*pending, checkpoint)
+                    total += len(page_articles)
+                    yield from page_articles
+                pending = page
+                if reached_known:
+                    print(f"Reached {known_run} already-known articles in a row. Stopping pagination.")
+                    break
+
+            if pending is not None:
+                page_articles = self._collect_page(*pending, checkpoint)
+                total += len(page_articles)
+                yield from page_articles
+
+        if checkpoint:
+            checkpoint.clear()
+        if ledger is not None and incremental:
+            print(f"Incremental crawl: {self._counts['new']} new, {self._counts['changed']} changed, "
+                  f"{self._counts['unchanged']} unchanged articles.")
+        print(f"Total articles scraped from TFC: {total}")
+
+    def _collect_page(self, url: str, futures: list | None, checkpoint: CrawlCheckpoint | None) -> list[dict]:
+        """等待一個列表頁的文章抓取完成，並在檢查點中標記該頁已完成。"""
+        if futures is None:
+            return checkpoint.take_page(url)
+        page_articles = [article for article in (f.result() for f in futures) if article]
+        if checkpoint:
+            checkpoint.complete_page(url, [article['url'] for article in page_articles])
+        return page_articles
+
+    def parse_listing(self, html: bytes | str, page_url: str) -> list[dict] | None:
+        """解析列表頁，回傳文章的網址、標題與狀態；找不到文章容器時回傳 None。"""
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # --- 核心修正 #1: 使用正確的標籤 <li> 和 class 'kb-query-item' ---
+        article_containers = soup.find_all('li', class_='kb-query-item')
+        if not article_containers:
+            return None
+
+        entries = []
+        for container in article_containers:
+            # --- 核心修正 #2: 使用新的選擇器來找資料 ---
             
-        for page_num in range(1, max_pages + 1):
-            if page_num > 1:
-                url = f"{base_url}page/{page_num}/"
-            else:
-                url = base_url
-
-            print(f"Scraping TFC page: {url}")
-            try:
-                # 移除 verify=False，解決 InsecureRequestWarning 警告
-                response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'},verify=False)
-                response.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching page {url}: {e}")
+            # 找狀態 (例如："錯誤", "部分錯誤")
+            status_tag = container.find('a', class_='kb-dynamic-list-item-link')
+            status = status_tag.text.strip() if status_tag else 'N/A'
+
+            # 找標題
+            title_tag = container.find('div', class_='kb-dynamic-html-id-88164_c2c307-ab')
+            title = title_tag.text.strip() if title_tag else 'N/A'
+
+            # 找文章連結（相對連結以列表頁網址補齊）
+            url_tag = container.find('a', class_='kb-section-link-overlay')
+            article_url = urljoin(page_url, url_tag['href']) if url_tag and 'href' in url_tag.attrs else None
+
+            if not article_url:
                 continue
+            entries.append({"url": article_url, "title": title, "status": status})
+        return entries
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # --- 核心修正 #1: 使用正確的標籤 <li> 和 class 'kb-query-item' ---
-            article_containers = soup.find_all('li', class_='kb-query-item')
+    def _scrape_entry(
+        self, entry: dict, checkpoint: CrawlCheckpoint | None, ledger: CrawlLedger | None = None, incremental: bool = True
+    ) -> dict | None:
+        """抓取單篇文章；已存在檢查點中的文章直接沿用，增量模式下沒有變動的文章回傳 None。"""
+        url = entry['url']
+        if checkpoint and url in checkpoint.articles:
+            article = checkpoint.articles[url]
+            if ledger is not None and article.get('content_hash'):
+                ledger.record(url, article['content_hash'], article['scraped_at'])
+            return article
 
-            if not article_containers:
-                print(f"No articles found on page {page_num}. The structure might have changed or it's the last page.")
-                break
+        known = ledger.get(url) if ledger is not None and incremental else None
+        headers = {}
+        if known:
+            if known.get('etag'):
+                headers['If-None-Match'] = known['etag']
+            if known.get('last_modified'):
+                headers['If-Modified-Since'] = known['last_modified']
 
-            for container in article_containers:
-                # --- 核心修正 #2: 使用新的選擇器來找資料 ---
-                
-                # 找狀態 (例如："錯誤", "部分錯誤")
-                status_tag = container.find('a', class_='kb-dynamic-list-item-link')
-                status = status_tag.text.strip() if status_tag else 'N/A'
-
-                # 找標題
-                title_tag = container.find('div', class_='kb-dynamic-html-id-88164_c2c307-ab')
-                title = title_tag.text.strip() if title_tag else 'N/A'
-
-                # 找文章連結
-                url_tag = container.find('a', class_='kb-section-link-overlay')
-                article_url = url_tag['href'] if url_tag and 'href' in url_tag.attrs else None
-
-                if not article_url:
-                    continue
-                
-                # 抓取單一文章的詳細內容和發布日期
-                article_content, publication_date = self.scrape_article_content(article_url)
-                
-                if article_content:
-                    article = {
-                        "url": article_url,
-                        "title": title,
-                        "content": article_content,
-                        "status": status,
-                        "source": "台灣事實查核中心",
-                        "scraped_at": datetime.datetime.now().isoformat(),
-                        "publication_date": publication_date
-                    }
-                    all_articles.append(article)
-        
-        print(f"Total articles scraped from TFC: {len(all_articles)}")
-        return all_articles
+        try:
+            response = self.http.get(url, headers=headers)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching article content from {url}: {e}")
+            return None
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if response.status_code == 304:
+            ledger.touch(url, etag, last_modified)
+            self._count("unchanged")
+            return None
+
+        # 抓取單一文章的詳細內容和發布日期
+        article_content, publication_date = self.parse_article(response.content)
+        if not article_content:
+            return None
+
+        content_hash = hashlib.sha256(article_content.encode('utf-8')).hexdigest()
+        if known and known.get('content_hash') == content_hash:
+            ledger.touch(url, etag, last_modified)
+            self._count("unchanged")
+            return None
+        self._count("changed" if known else "new")
+
+        article = {
+            "url": url,
+            "title": entry['title'],
+            "content": article_content,
+            "status": entry['status'],
+            "source": "台灣事實查核中心",
+            "scraped_at": datetime.datetime.now().isoformat(),
+            "publication_date": publication_date,
+            "content_hash": content_hash
+        }
+        if ledger is not None:
+            ledger.record(url, content_hash, article['scraped_at'], etag, last_modified)
+        if checkpoint:
+            checkpoint.add_article(article)
+        return article
 
     def scrape_article_content(self, url: str) -> tuple[str | None, str | None]:
         """輔助函式：抓取單一文章頁面的內文和發布日期。"""
         try:
-            response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'},verify=False)
+            response = self.http.get(url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 內文容器的 class 依然是 'entry-content'
-            content_div = soup.find('div', class_='entry-content')
-            content = content_div.get_text(separator='\n', strip=True) if content_div else ""
-
-            publication_date = None
-            # 根據使用者提供的 class 和文字內容尋找發布日期
-            headings = soup.find_all('div', class_='wp-block-kadence-advancedheading')
-            for heading in headings:
-                if '發佈日期' in heading.get_text():
-                    date_text = heading.get_text(strip=True)
-                    if '：' in date_text:
-                        publication_date = date_text.split('：')[1].strip()
-                    break
-            
-            return content, publication_date
+            return self.parse_article(response.content)
 
         except requests.exceptions.RequestException as e:
             print(f"Error fetching article content from {url}: {e}")
             return "", None
 
+    def parse_article(self, html: bytes | str) -> tuple[str, str | None]:
+        """解析文章頁面的內文和發布日期。"""
+        # 傳入原始位元組，讓 BeautifulSoup 依 <meta charset> 判斷編碼
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # 內文容器的 class 依然是 'entry-content'
+        content_div = soup.find('div', class_='entry-content')
+        content = content_div.get_text(separator='\n', strip=True) if content_div else ""
+
+        publication_date = None
+        # 根據使用者提供的 class 和文字內容尋找發布日期
+        headings = soup.find_all('div', class_='wp-block-kadence-advancedheading')
+        for heading in headings:
+            if '發佈日期' in heading.get_text():
+                date_text = heading.get_text(strip=True)
+                if '：' in date_text:
+                    publication_date = date_text.split('：')[1].strip()
+                break
+        
+        return content, publication_date
@@ -9,6 +9,7 @@ root_dir = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.append(root_dir)
 
 from reasoning.fact_checker import FactChecker
+from reasoning.prescreen import llm_pair_fraction
 
 # --- 頁面設定 ---
 st.set_page_config(page_title="RAG 假新聞偵測系統", layout="wide", initial_sidebar_state="expanded")
@@ -43,9 +44,119 @@ def load_fact_checker():
 
 fact_checker = load_fact_checker()
 
+# 元件在背景平行載入，側邊欄顯示目前的載入狀態
+with st.sidebar:
+    health = fact_checker.health()
+    if health["ready"]:
+        st.caption("✅ 所有元件已就緒")
+    else:
+        for name, status in health["components"].items():
+            st.caption(f"{name}: {status['status']}" + (f" ({status['error']})" if status["error"] else ""))
+
+def render_overall_verdict(claim_results: list[dict]):
+    all_verdicts = [res['final_verdict'] for res in claim_results]
+    with final_verdict_placeholder.container():
+        st.header("📝 總結報告")
+        with st.container(border=True):
+            if "False" in all_verdicts:
+                st.error("## ‼️‼️ 這是假新聞 ‼️‼️")
+            elif all(v == "True" for v in all_verdicts):
+                st.success("## ✅✅ 這是真新聞 ✅✅")
+            else:
+                st.warning("## ❔❔ 中立/資訊不足 ❔❔")
+        st.markdown("--- ") # 在總結報告下方加上分隔線
+
+
+def render_claim_result(claim_result: dict):
+    """在目前的容器中顯示單一主張的判決與證據比對。"""
+    col1, col2 = st.columns([1, 2.5])
+
+    with col1:
+        verdict = claim_result['final_verdict']
+        if verdict == "True":
+            st.success("#### ✅ 真實 (True)")
+        elif verdict == "False":
+            st.error("#### ❌ 錯誤 (False)")
+        elif verdict == "Abstain":
+            st.warning("#### ⚠️ 放棄判斷 (Abstain)")
+        else:
+            st.info("#### ❔ 中立/資訊不足 (Neutral)")
+
+        st.write("**判斷理由:**")
+        st.info(f"{claim_result['reasoning']}")
+
+    with col2:
+        st.write("**相關證據比對:**")
+        alignments = claim_result.get("evidence_alignments", [])
+        if not alignments:
+            st.write("沒有找到可用於比對的證據。")
+        else:
+            for align in alignments:
+                evidence = align['evidence']
+                with st.container(border=True):
+                    label = align.get('label', 'N/A')
+                    if label == "支持":
+                        st.markdown(f"**比對結果: <span style='color:green; font-weight:bold;'>{label}</span>**", unsafe_allow_html=True)
+                    elif label == "矛盾":
+                        st.markdown(f"**比對結果: <span style='color:red; font-weight:bold;'>{label}</span>**", unsafe_allow_html=True)
+                    else:
+                        st.markdown(f"**比對結果: <span style='color:orange; font-weight:bold;'>{label}</span>**", unsafe_allow_html=True)
+
+                    st.markdown(f"**來源:** {evidence['metadata'].get('source', 'N/A')} | **發布日期:** {evidence['metadata'].get('publication_date', 'N/A')} | **查核結果:** {evidence['metadata'].get('status') or 'N/A'}")
+                    st.markdown(f"**標題:** [{evidence['metadata'].get('title', 'N/A')}]({evidence['metadata'].get('url', '#')})", unsafe_allow_html=True)
+
+                    with st.expander("查看證據原文與 LLM 分析"):
+                        st.code(evidence['content'], language=None)
+                        st.write("**LLM 分析 JSON:**")
+                        st.json(align)
+                st.markdown("<br>", unsafe_allow_html=True)
+
+
+def render_timing(telemetry: dict):
+    """以可展開的面板顯示各階段耗時與 LLM、快取的計數器。"""
+    counters = telemetry.get("counters", {})
+    with st.expander(f"⏱️ 各階段耗時（總計 {telemetry['total_ms'] / 1000:.2f} 秒）"):
+        # 只列出最上層的階段；檢索與比對內部的區段彙整在下方的統計
+        top_level = [span for span in telemetry["spans"] if span["parent_id"] is None]
+        st.table([
+            {"階段": span["name"], "開始 (ms)": round(span["start_ms"]), "耗時 (ms)": round(span["duration_ms"]),
+             "佔比": f"{span['duration_ms'] / telemetry['total_ms']:.0%}"}
+            for span in top_level
+        ])
+        stages = telemetry.get("stages", {})
+        st.caption("細部區段（並行的 LLM 呼叫會重疊）：" + "、".join(
+            f"{name} ×{stage['count']} {stage['total_ms']:.0f} ms"
+            for name, stage in stages.items() if name not in {span["name"] for span in top_level}
+        ))
+        llm_requests = counters.get("llm_calls", 0) + counters.get("llm_cache_hits", 0)
+        embedding_requests = counters.get("embedding_cache_hits", 0) + counters.get("embedding_cache_misses", 0)
+        cols = st.columns(4)
+        cols[0].metric("LLM 呼叫", counters.get("llm_calls", 0))
+        cols[1].metric("LLM 快取命中率", f"{counters.get('llm_cache_hits', 0) / llm_requests:.0%}" if llm_requests else "—")
+        cols[2].metric("Token（prompt / 生成）",
+                       f"{counters.get('llm_prompt_tokens', 0)} / {counters.get('llm_completion_tokens', 0)}")
+        cols[3].metric("證據數", counters.get("evidence", 0))
+        if embedding_requests:
+            st.caption(f"主張嵌入快取命中率：{counters.get('embedding_cache_hits', 0) / embedding_requests:.0%}")
+        if counters.get("query_llm_skipped"):
+            st.caption("輸入已是單一主張，略過了查詢改寫與主張抽取的 LLM 呼叫。")
+        if "prescreen_pairs" in counters:
+            st.caption(f"證據預篩：捨棄 {counters.get('prescreen_dropped', 0)} 筆、NLI 直接判定 {counters.get('prescreen_resolved', 0)} 筆，"
+                       f"送往 LLM 比對的配對比例 {llm_pair_fraction(counters):.0%}")
+
+
 # --- 輸入區塊 ---
 st.subheader("請輸入您想查核的內容")
 user_query = st.text_area("輸入文本：", "", height=150, placeholder="例如：昨晚高雄因大雷雨停電，導致數千戶居民無電可用。")
+with st.expander("證據過濾條件（選填）"):
+    date_col, status_col = st.columns([2, 1])
+    with date_col:
+        date_from = st.date_input("最早發布日期", value=None)
+        date_to = st.date_input("最晚發布日期", value=None)
+    with status_col:
+        # 台灣事實查核中心報告的查核結果
+        statuses = st.multiselect("查核結果", ["錯誤", "部分錯誤", "正確", "事實釐清"])
+filters = {"date_from": date_from, "date_to": date_to, "status": statuses}
 
 if st.button("開始查核", type="primary", use_container_width=True):
     # 清空上一次的頂部結論
@@ -53,77 +164,67 @@ if st.button("開始查核", type="primary", use_container_width=True):
 
     if not user_query.strip():
         st.warning("請輸入內容後再點擊查核。")
+    elif date_from and date_to and date_from > date_to:
+        st.warning("最早發布日期不能晚於最晚發布日期。")
     elif not fact_checker.collection:
         st.error("知識庫尚未建立或載入失敗，請先執行 `main_indexing.py`。")
     else:
-        with st.spinner("系統正在分析中，請稍候... (這可能需要一點時間)"):
-            results = fact_checker.check(user_query)
+        # --- 結果顯示區塊：依查核事件逐步更新 ---
+        status = st.status("系統正在分析中，請稍候...", expanded=False)
+        st.markdown(f"**原始查詢:** `{user_query}`")
+        rewritten_placeholder = st.empty()
+        skipped_placeholder = st.empty()
+        st.markdown("--- ")
+        claims_area = st.container()
+
+        streamed = {"rewrite": "", "claims": "", "understand": ""}
+        claims, claim_slots, progress = [], [], []
+        results = None
+        for event in fact_checker.check_stream(user_query, filters):
+            kind = event["type"]
+            if kind == "token":
+                streamed[event["stage"]] += event["text"]
+                if event["stage"] == "rewrite":
+                    rewritten_placeholder.markdown(f"**優化後查詢:** `{streamed['rewrite']}▌`")
+                else:
+                    status.update(label="正在抽取主張...")
+            elif kind == "rewritten_query":
+                rewritten_placeholder.markdown(f"**優化後查詢:** `{event['rewritten_query']}`")
+                status.update(label="正在抽取主張...")
+            elif kind == "claims":
+                claims = event["claims"]
+                status.update(label=f"已抽取 {len(claims)} 個主張，正在檢索證據...")
+                with claims_area:
+                    for i, claim in enumerate(claims):
+                        st.subheader(f"查核主張 {i+1}: `{claim}`")
+                        claim_slots.append(st.empty())
+                        claim_slots[i].caption("正在檢索證據...")
+                progress = [[0, 0] for _ in claims]
+            elif kind == "evidence":
+                i = event["claim_index"]
+                progress[i][1] = len(event["evidence"])
+                claim_slots[i].caption(f"找到 {progress[i][1]} 筆證據，正在進行比對...")
+                status.update(label="正在比對主張與證據...")
+            elif kind == "alignment":
+                i = event["claim_index"]
+                progress[i][0] += 1
+                claim_slots[i].caption(f"證據比對中... ({progress[i][0]}/{progress[i][1]})")
+            elif kind == "claim_result":
+                with claim_slots[event["claim_index"]].container():
+                    render_claim_result(event["result"])
+            elif kind == "result":
+                results = event["result"]
+            elif kind == "error":
+                results = {"error": event["error"]}
 
-        st.success("分析完成！")
-        
-        # --- 結果顯示區塊 ---
         if results and results.get("results_per_claim"):
+            status.update(label="分析完成！", state="complete")
             # --- FINAL OVERALL VERDICT (顯示在頂部) ---
-            all_verdicts = [res['final_verdict'] for res in results["results_per_claim"]]
-            with final_verdict_placeholder.container():
-                st.header("📝 總結報告")
-                with st.container(border=True):
-                    if "False" in all_verdicts:
-                        st.error("## ‼️‼️ 這是假新聞 ‼️‼️")
-                    elif all(v == "True" for v in all_verdicts):
-                        st.success("## ✅✅ 這是真新聞 ✅✅")
-                    else:
-                        st.warning("## ❔❔ 中立/資訊不足 ❔❔")
-                st.markdown("--- ") # 在總結報告下方加上分隔線
-
-            # --- 詳細分析 ---
-            st.markdown(f"**原始查詢:** `{results.get('query')}`")
-            st.markdown(f"**優化後查詢:** `{results.get('rewritten_query')}`")
-            st.markdown("--- ")
-
-            for i, claim_result in enumerate(results["results_per_claim"]):
-                st.subheader(f"查核主張 {i+1}: `{claim_result['claim']}`")
-                
-                col1, col2 = st.columns([1, 2.5])
-
-                with col1:
-                    verdict = claim_result['final_verdict']
-                    if verdict == "True":
-                        st.success("#### ✅ 真實 (True)")
-                    elif verdict == "False":
-                        st.error("#### ❌ 錯誤 (False)")
-                    elif verdict == "Abstain":
-                        st.warning("#### ⚠️ 放棄判斷 (Abstain)")
-                    else:
-                        st.info("#### ❔ 中立/資訊不足 (Neutral)")
-                    
-                    st.write("**判斷理由:**")
-                    st.info(f"{claim_result['reasoning']}")
-
-                with col2:
-                    st.write("**相關證據比對:**")
-                    alignments = claim_result.get("evidence_alignments", [])
-                    if not alignments:
-                        st.write("沒有找到可用於比對的證據。")
-                    else:
-                        for align in alignments:
-                            evidence = align['evidence']
-                            with st.container(border=True):
-                                label = align.get('label', 'N/A')
-                                if label == "支持":
-                                    st.markdown(f"**比對結果: <span style='color:green; font-weight:bold;'>{label}</span>**", unsafe_allow_html=True)
-                                elif label == "矛盾":
-                                    st.markdown(f"**比對結果: <span style='color:red; font-weight:bold;'>{label}</span>**", unsafe_allow_html=True)
-                                else:
-                                    st.markdown(f"**比對結果: <span style='color:orange; font-weight:bold;'>{label}</span>**", unsafe_allow_html=True)
-
-                                st.markdown(f"**來源:** {evidence['metadata'].get('source', 'N/A')} | **發布日期:** {evidence['metadata'].get('publication_date', 'N/A')}")
-                                st.markdown(f"**標題:** [{evidence['metadata'].get('title', 'N/A')}]({evidence['metadata'].get('url', '#')})", unsafe_allow_html=True)
-                                
-                                with st.expander("查看證據原文與 LLM 分析"):
-                                    st.code(evidence['content'], language=None)
-                                    st.write("**LLM 分析 JSON:**")
-                                    st.json(align)
-                            st.markdown("<br>", unsafe_allow_html=True)
+            render_overall_verdict(results["results_per_claim"])
+            if results.get('skipped_alignments'):
+                skipped_placeholder.caption(f"判決已提前確定，略過了 {results['skipped_alignments']} 次 LLM 證據比對。")
+            if results.get("telemetry"):
+                render_timing(results["telemetry"])
         else:
-            st.error("處理時發生錯誤，無法取得結果。")
\ No newline at end of file
+            status.update(label="分析失敗", state="error")
+            st.error("處理時發生錯誤，無法取得結果。")
@@ -6,22 +6,157 @@ import os
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # LLM and Embedding Models
-OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
 OLLAMA_MODEL = "gemma3:4b" # 或者 gemma:7b, mistral, etc.
 EMBEDDING_MODEL = "shibing624/text2vec-base-chinese" 
+EMBEDDING_CACHE_SIZE = 4096 # 主張嵌入向量的 LRU 快取項目數
+
+# Embedding Workers
+# 建索引時的嵌入行程數；大於 1 時以多行程分片嵌入，適合多核心、沒有 GPU 的主機
+EMBEDDING_WORKERS = 1
+EMBEDDING_BATCH_SIZE = 64 # 每個分片的 chunk 數，也是工作行程呼叫模型時的批次大小
+EMBEDDING_THREADS_PER_WORKER = 1 # 每個工作行程的 PyTorch 執行緒數；行程數乘上此值不宜超過核心數
+
+# Embedding Store
+# 以內容雜湊為鍵的嵌入向量磁碟儲存，依模型名稱與維度分開存放；模型與文字不變時重建知識庫不必重新嵌入
+EMBEDDING_STORE_ENABLED = True
+EMBEDDING_STORE_PATH = os.path.join(ROOT_DIR, "embedding_store")
+EMBEDDING_DIMENSION = 768 # EMBEDDING_MODEL 輸出的向量維度
+EMBEDDING_STORE_DTYPE = "float32" # 改為 "float16" 可省一半空間，但取回的向量會有些微誤差
+EMBEDDING_STORE_MAX_GARBAGE_RATIO = 0.5 # 完整同步後，未被引用的向量超過此比例時壓縮儲存
+
+# LLM Concurrency
+# 同時送往 Ollama 的比對請求上限，設為 1 則逐一執行
+# 伺服器端需設定 OLLAMA_NUM_PARALLEL 才能真正並行處理
+LLM_MAX_CONCURRENCY = 4
+LLM_MAX_IN_FLIGHT = 8 # 整個行程同時送往 Ollama 的請求上限（API 服務的多個並行查核共用）
+LLM_STREAM_TOKENS = True # 串流查核時，查詢改寫與主張抽取是否以 token 串流逐段回傳
+
+# Early-Exit Verdict Aggregation
+# 依 RRF 排名比對證據；出現信心分數達門檻的「矛盾」時判決已確定，略過其餘比對
+# 門檻設為 0.0 表示任何「矛盾」都會立即停止
+ALIGNMENT_EARLY_EXIT = True
+EARLY_EXIT_MIN_CONFIDENCE = 0.8
+
+# Query Understanding
+# "separate": 依序呼叫查詢改寫與主張抽取，共兩次 LLM 往返
+# "fused": 以單一 prompt 同時取得改寫後的查詢與主張列表，只需一次 LLM 往返
+QUERY_UNDERSTANDING_MODE = "separate"
+# 啟用時，不超過 QUERY_ATOMIC_MAX_CHARS 個字、只有一句且沒有子句分隔的輸入直接作為唯一的主張，不呼叫 LLM
+QUERY_SKIP_ATOMIC = False
+QUERY_ATOMIC_MAX_CHARS = 40
+
+# Alignment Mode
+# "per_pair": 每個 (主張, 證據) 配對各呼叫一次 LLM
+# "batched": 同一主張的所有證據編號並附上日期放進同一個 prompt，一次取得全部的比對結果，
+# 指令與主張只需 prefill 一次；回應中缺漏或格式不符的項目改以逐一比對補上
+ALIGNMENT_MODE = "per_pair"
+
+# Evidence Pre-screening
+# 在 RRF 之後、LLM 比對之前，以 CPU 上的 cross-encoder 為所有 (主張, 證據) 配對批次評分：
+# 相關性低於門檻的證據直接捨棄，NLI 模型判定為高信心蘊含或矛盾的配對不必再送往 Ollama
+PRESCREEN_ENABLED = False
+PRESCREEN_RERANK_MODEL = "BAAI/bge-reranker-base" # 相關性 cross-encoder（分數經 sigmoid 落在 0~1）
+PRESCREEN_MIN_RELEVANCE = 0.05 # 相關性低於此值的證據不進行比對
+PRESCREEN_NLI_MODEL = "MoritzLaurer/mDeBERTa-v3-base-xnli-multilingual-nli-2mil7" # 設為 None 則只做相關性篩選
+PRESCREEN_NLI_THRESHOLD = 0.95 # 蘊含或矛盾的機率達此值時直接作為比對結果
+PRESCREEN_BATCH_SIZE = 16
+PRESCREEN_MAX_LENGTH = 512 # cross-encoder 的最大輸入 token 數
+
+# FactChecker Startup
+# "background": 建立後立即返回，各元件在背景執行緒平行載入，第一次使用時若尚未完成才等待
+# "eager": 平行載入並等待全部完成；"lazy": 第一次使用時才載入
+FACT_CHECKER_STARTUP = "background"
 
 
 # Vector Database
 CHROMA_PATH = os.path.join(ROOT_DIR, "chroma_db")
 COLLECTION_NAME = "fact_checking_collection"
 
+# Vector Index (HNSW)
+# space、M 與 ef_construction 只在建立 collection 時生效，更改後需執行 `python -m knowledge_base.indexing --recreate` 重建
+# ef_search 可隨時調整，越大召回率越高、查詢越慢
+HNSW_SPACE = "l2" # "l2"、"ip" 或 "cosine"
+HNSW_M = 16 # 每個節點的鄰居數（Chroma 的 max_neighbors）
+HNSW_EF_CONSTRUCTION = 100
+HNSW_EF_SEARCH = 100
+
+# Quantized Vector Backend
+# "chroma" 使用 Chroma 的 HNSW 搜尋；"quantized" 改用本地的量化向量索引暴力搜尋，再以 Chroma 中的原始向量重新評分
+VECTOR_BACKEND = "chroma"
+QUANTIZED_INDEX_PATH = os.path.join(ROOT_DIR, "vector_index")
+QUANTIZED_INDEX_DTYPE = "int8" # "int8" 或 "float16"
+QUANTIZED_RESCORE_FACTOR = 4 # 以量化向量取出 k 的幾倍候選再重新評分；0 表示不重新評分
+UPSERT_BATCH_SIZE = 256 # 每次嵌入並寫入 Chroma 的 chunk 數，也是串流建索引時的批次大小
+
+# Lexical (BM25) Index
+LEXICAL_INDEX_PATH = os.path.join(ROOT_DIR, "lexical_index")
+BM25_K1 = 1.5
+BM25_B = 0.75
+LEXICAL_MAX_SEGMENTS = 8 # 分段數超過此值時自動合併
+LEXICAL_MAX_DELETED_RATIO = 0.2 # 已刪除文件比例超過此值時自動合併
+LEXICAL_FLUSH_CHUNKS = 20000 # 串流建索引時累積這麼多個 chunk 才寫成一個 BM25 分段
+LEXICAL_TOKENIZER = "char_ngram" # "char_ngram" (字元 n-gram) 或 "jieba" (詞典斷詞，需安裝 jieba)
+TOKENIZER_NGRAM_RANGE = (1, 2) # 中文字元 n-gram 的長度範圍
+TOKENIZER_USER_DICT = None # jieba 自訂詞典路徑
+
 # Data Paths
 DATA_DIR = os.path.join(ROOT_DIR, "data")
-PROCESSED_DATA_PATH = os.path.join(DATA_DIR, "processed_articles.json")
+PROCESSED_DATA_PATH = os.path.join(DATA_DIR, "processed_articles.jsonl") # 以 JSON Lines 追加寫入的文章庫
+LEGACY_PROCESSED_DATA_PATH = os.path.join(DATA_DIR, "processed_articles.json") # 舊版的 JSON 陣列檔，首次讀取時自動轉存
+
+# Scraper
+SCRAPER_USER_AGENT = 'Mozilla/5.0'
+SCRAPER_MAX_WORKERS = 8 # 並行抓取文章頁的執行緒數
+SCRAPER_MAX_PER_HOST = 4 # 對同一主機同時進行的請求上限
+SCRAPER_MIN_INTERVAL = 0.25 # 對同一主機兩次請求之間的最小間隔（秒）
+SCRAPER_MAX_RETRIES = 3
+SCRAPER_BACKOFF_FACTOR = 0.5 # 重試等待時間為 backoff_factor * 2^(重試次數 - 1) 秒
+SCRAPER_TIMEOUT = 20
+SCRAPER_VERIFY_SSL = False
+SCRAPER_CHECKPOINT_PATH = os.path.join(DATA_DIR, "scrape_checkpoint.jsonl")
+CRAWL_LEDGER_PATH = os.path.join(DATA_DIR, "crawl_ledger.json") # 增量爬取用的網址帳本
+INCREMENTAL_STOP_AFTER_KNOWN = 10 # 增量爬取時，連續遇到這麼多篇已知文章就停止翻頁
+SAMPLE_SITE_DIR = os.path.join(ROOT_DIR, "sample_data", "tfc_site") # 本機測試用的 TFC 網站頁面
+
+# HTTP API
+API_HOST = "127.0.0.1"
+API_PORT = 8000
+API_WORKER_THREADS = 16 # 執行同步 FactChecker 呼叫的執行緒數
+API_MAX_CONCURRENT_CHECKS = 8 # 同時進行的完整查核數，超過的請求排隊等待
+API_BATCH_MAX_SIZE = 32 # 合併多個請求的檢索時，每批最多的主張數
+API_BATCH_MAX_WAIT_MS = 10 # 第一個檢索請求到達後，最多等待多久以湊成一批
+API_JOB_TTL_SECONDS = 3600 # 已完成的非同步查核結果保留時間
+API_MAX_JOBS = 10000 # 同時保留的查核工作上限
+
+# Batch Fact-Checking
+# 離線批次查核：每批的輸入筆數，同一批的主張一起嵌入、向量查詢與 BM25 評分
+BATCH_CHECK_BATCH_SIZE = 64
+BATCH_CHECK_LLM_WORKERS = 8 # 批次查核送出 LLM 請求的執行緒數，實際在途數仍受 LLM_MAX_IN_FLIGHT 限制
+
+# LLM Response Cache
+# 快取鍵包含模型名稱與 prompt 模板的雜湊，更換 OLLAMA_MODEL 或修改模板後舊的快取會自動失效
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = os.path.join(DATA_DIR, "llm_cache.sqlite3")
+LLM_CACHE_MEMORY_ITEMS = 1024 # 記憶體 LRU 層的項目數
+LLM_CACHE_MAX_ITEMS = 100000 # 磁碟層的項目上限，超過時淘汰最久未使用者
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# Telemetry
+# 各階段的耗時區段與計數器會附在每個查核結果的 "telemetry" 欄位，並累計成 Prometheus 指標（API 的 GET /metrics）
+TELEMETRY_ENABLED = True
+TELEMETRY_MAX_SPANS = 500 # 每條 Trace 保留的區段上限，超過的只累計到各階段的總和（避免建索引時無限增長）
+TELEMETRY_PROMETHEUS_TEXTFILE = None # 設定路徑時，建索引結束後把指標寫成 node_exporter textfile collector 的檔案
 
 # Text Chunking
 CHUNK_SIZE = 512
 CHUNK_OVERLAP = 50
+STRIP_BOILERPLATE = True # 切塊前移除 TFC 報告的頁首與分享按鈕，並把查核結果、發佈日期、報告編號存入元資料
+NEAR_DUPLICATE_DETECTION = True # 以 MinHash 略過與其他文章的 chunk 近似重複的 chunk
+NEAR_DUPLICATE_THRESHOLD = 0.8 # 估計的 Jaccard 相似度達到此值即視為重複
+NEAR_DUPLICATE_NUM_PERM = 64 # MinHash 簽章長度
+NEAR_DUPLICATE_BANDS = 16 # LSH 分段數；每段 4 個值時，相似度 0.8 的配對幾乎一定會成為候選
+NEAR_DUPLICATE_SHINGLE_SIZE = 3 # 字元 shingle 長度
 
 # Fact-Checking Reasoning
 # 用於讓 LLM 判斷 "主張" 與 "證據" 之間的關係
@@ -48,6 +183,33 @@ FACT_ALIGNMENT_PROMPT_TEMPLATE = """
 你的 JSON 回應：
 """
 
+# 用於 ALIGNMENT_MODE = "batched"：一次判斷一個「主張」與多段編號「證據」之間的關係
+FACT_ALIGNMENT_BATCH_PROMPT_TEMPLATE = """
+你是一位事實查核專家。你的任務是根據下列 {count} 段編號的「證據」和它們各自的「發布日期」，逐一判斷一個「主張」的真偽。
+針對每一段證據，你必須將主張歸類為以下三種類型之一：「支持」、「矛盾」或「中立」。
+
+- 「支持」(Entailment): 該段證據直接支持或證明了該主張。
+- 「矛盾」(Contradiction): 該段證據直接反駁或否定了該主張。
+- 「中立」(Neutral): 該段證據與主張相關，但未提供足夠資訊來支持或反駁它。
+
+每段證據必須獨立判斷，不要引用其他證據的內容。在做決定時，請務必考慮證據的「時效性」。一篇過時的文章可能與近期發生的事件無關。
+
+你必須以 JSON 物件格式回應。JSON 物件應包含一個鍵「results」，其值為一個列表，每段證據對應一個元素，依編號排列。
+每個元素包含四個欄位：「index」、「label」、「reasoning」和「confidence_score」。
+- 「index」: 證據的編號 (1 到 {count} 的整數)。
+- 「label」: 你的分類結果 (「支持」、「矛盾」或「中立」)。
+- 「reasoning」: 一句簡短的解釋，說明你為何如此判斷。如果證據的發布日期是判斷的關鍵，請在理由中提及。
+- 「confidence_score」: 一個介於 0.0 和 1.0 之間的浮點數，代表你的信心指數。
+
+資料如下：
+主張 (Claim): {claim}
+
+證據列表 (Evidence List):
+{evidence_list}
+
+你的 JSON 回應：
+"""
+
 # 用於從使用者輸入中抽取核心主張
 CLAIM_EXTRACTION_PROMPT_TEMPLATE = """
 你是一位資訊分析專家。你的任務是從使用者輸入的文本中，提取出核心、可供查證的「主張」。
@@ -78,3 +240,27 @@ QUERY_REWRITING_PROMPT_TEMPLATE = """
 
 改寫後的查詢:
 """
+
+# 用於 QUERY_UNDERSTANDING_MODE = "fused"：在一次回應中完成查詢改寫與主張抽取
+QUERY_UNDERSTANDING_PROMPT_TEMPLATE = """
+你是一位查詢優化與資訊分析專家。請對使用者輸入完成以下兩項任務：
+
+1. 查詢改寫：將輸入改寫成一個清晰、簡潔、獨立的問題，以優化事實查核系統的檢索結果。
+   改寫後的查詢應該是一個中立、客觀的問題；如果輸入本身已經是一個好的查詢，直接使用即可。
+   如果輸入是口語化的、包含代名詞或語意模糊，請將其改寫成一個具體的、自身完整的問題。
+2. 主張抽取：從輸入中提取出核心、可供查證的「主張」。一個「主張」應該是一個可以被獨立驗證的簡單陳述句。
+   請將複雜的句子拆解成多個原子性的主張。
+
+例如，如果輸入是「昨天，台北因颱風發生大規模停電，影響了數千戶家庭。」，你應該提取出：
+1. 台北昨天發生了大規模停電。
+2. 停電是由颱風引起的。
+3. 數千戶家庭受到了停電的影響。
+
+你必須以 JSON 物件格式回應，包含兩個鍵：
+- 「rewritten_query」: 改寫後的查詢字串。
+- 「claims」: 一個包含所有主張字串的列表。
+
+使用者輸入: "{user_input}"
+
+你的 JSON 回應：
+"""
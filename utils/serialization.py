@@ -0,0 +1,19 @@
+# utils/serialization.py
+"""寫入 JSON 時共用的小工具。"""
+import json
+import os
+
+
+def json_default(value):
+    """json.dumps 的 default：檢索分數可能是 NumPy 純量，轉成 Python 數值。"""
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def write_json(path: str, data) -> None:
+    """先寫入暫存檔再原子性地取代，避免讀取端看到寫到一半的檔案。"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
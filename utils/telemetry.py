@@ -0,0 +1,268 @@
+# utils/telemetry.py
+"""輕量的計時與計數工具：每次查核（或建索引）記錄一條 Trace，同時累計到行程層級的 Prometheus 指標。
+
+目前的 Trace 以 contextvars 傳遞；送進執行緒池的工作要以 bind() 包裝，區段才會記到同一條 Trace。
+沒有進行中的 Trace 時，span() 與 count() 只更新行程層級的指標。
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.config import TELEMETRY_ENABLED, TELEMETRY_MAX_SPANS
+
+SERVICE_NAME = "rag-fact-checker"
+# 區段耗時直方圖的上界（秒）
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_trace = contextvars.ContextVar("telemetry_trace", default=None)
+_current_span = contextvars.ContextVar("telemetry_span", default=None)
+
+
+class MetricsRegistry:
+    """行程層級的計數器與直方圖，以 Prometheus 文字格式輸出。"""
+    def __init__(self, buckets: tuple = HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @staticmethod
+    def _labels(labels: tuple, extra: dict | None = None) -> str:
+        pairs = list(labels) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {**value, "buckets": list(value["buckets"])} for key, value in self._histograms.items()}
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{self._labels(labels)} {value}")
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(self.buckets, histogram["buckets"]):
+                    lines.append(f"{name}_bucket{self._labels(labels, {'le': bound})} {bucket_count}")
+                lines.append(f"{name}_bucket{self._labels(labels, {'le': '+Inf'})} {histogram['count']}")
+                lines.append(f"{name}_sum{self._labels(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{self._labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """寫成 node_exporter textfile collector 可讀取的檔案（先寫暫存檔再取代）。"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+metrics = MetricsRegistry()
+
+
+class Trace:
+    """一次請求的時間區段與計數器。區段超過 TELEMETRY_MAX_SPANS 後只累計到各階段的總和。"""
+    def __init__(self, name: str, max_spans: int = TELEMETRY_MAX_SPANS):
+        self.name = name
+        self.trace_id = os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.max_spans = max_spans
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.dropped_spans = 0
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _record(self, span: dict):
+        with self._lock:
+            stage = self.stages.setdefault(span["name"], {"count": 0, "total_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] += span["duration_ms"]
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped_spans += 1
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._origin
+
+    def to_dict(self) -> dict:
+        """可直接放進結果 dict 的 JSON 格式。"""
+        with self._lock:
+            return {
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "name": self.name,
+                "started_at": self.started_at,
+                "total_ms": (self.duration if self.duration is not None else time.perf_counter() - self._origin) * 1000,
+                "spans": [dict(span) for span in self.spans],
+                "dropped_spans": self.dropped_spans,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": dict(self.counters)
+            }
+
+
+def to_otlp(trace: dict) -> dict:
+    """把 Trace.to_dict() 的結果轉成 OTLP/JSON 格式，可直接 POST 到 OpenTelemetry Collector 的 /v1/traces。"""
+    started_ns = int(trace["started_at"] * 1e9)
+
+    def attributes(values: dict) -> list[dict]:
+        result = []
+        for key, value in values.items():
+            if isinstance(value, bool):
+                result.append({"key": key, "value": {"boolValue": value}})
+            elif isinstance(value, int):
+                result.append({"key": key, "value": {"intValue": str(value)}})
+            elif isinstance(value, float):
+                result.append({"key": key, "value": {"doubleValue": value}})
+            else:
+                result.append({"key": key, "value": {"stringValue": str(value)}})
+        return result
+
+    root_id = trace["span_id"]
+    spans = [{
+        "traceId": trace["trace_id"],
+        "spanId": root_id,
+        "name": trace["name"],
+        "kind": 1,
+        "startTimeUnixNano": str(started_ns),
+        "endTimeUnixNano": str(started_ns + int(trace["total_ms"] * 1e6)),
+        "attributes": attributes(trace["counters"])
+    }]
+    for span in trace["spans"]:
+        start_ns = started_ns + int(span["start_ms"] * 1e6)
+        spans.append({
+            "traceId": trace["trace_id"],
+            "spanId": span["span_id"],
+            "parentSpanId": span["parent_id"] or root_id,
+            "name": span["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int(span["duration_ms"] * 1e6)),
+            "attributes": attributes(span.get("attributes", {}))
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": attributes({"service.name": SERVICE_NAME})},
+        "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": spans}]
+    }]}
+
+
+@contextmanager
+def start_trace(name: str):
+    """開始一條新的 Trace 並設為目前的 Trace；結束時記錄總耗時。"""
+    trace = Trace(name)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        if TELEMETRY_ENABLED:
+            metrics.observe("fact_checker_trace_seconds", trace.duration, trace=name)
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """記錄一個時間區段；可在區段內以 yield 的 dict 補充屬性。"""
+    if not TELEMETRY_ENABLED:
+        yield attributes
+        return
+    trace = _current_trace.get()
+    parent_id = _current_span.get()
+    span_id = os.urandom(8).hex()
+    token = _current_span.set(span_id)
+    start = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        end = time.perf_counter()
+        _current_span.reset(token)
+        metrics.observe("fact_checker_stage_seconds", end - start, trace=trace.name if trace else "", stage=name)
+        if trace is not None:
+            trace._record({
+                "name": name,
+                "span_id": span_id,
+                "parent_id": parent_id,
+                "start_ms": (start - trace._origin) * 1000,
+                "duration_ms": (end - start) * 1000,
+                "thread": threading.current_thread().name,
+                "attributes": attributes
+            })
+
+
+def count(name: str, value: float = 1):
+    """累加目前 Trace 與行程層級的計數器。"""
+    if not TELEMETRY_ENABLED or not value:
+        return
+    metrics.inc(f"fact_checker_{name}_total", value)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count(name, value)
+
+
+def format_stages(stages: dict, total_ms: float) -> str:
+    """以文字表格列出各階段的次數與累計耗時；並行的區段會重疊，總和可能超過總耗時。"""
+    lines = [f"{'stage':<24} | {'count':>6} | {'total ms':>10} | {'share':>6}"]
+    for name, stage in sorted(stages.items(), key=lambda item: item[1]["total_ms"], reverse=True):
+        share = stage["total_ms"] / total_ms if total_ms else 0.0
+        lines.append(f"{name:<24} | {stage['count']:>6} | {stage['total_ms']:>10.1f} | {share:>6.1%}")
+    lines.append(f"{'total':<24} | {'':>6} | {total_ms:>10.1f} |")
+    return "\n".join(lines)
+
+
+def bind(fn):
+    """包裝要送進執行緒池的函式，讓它在目前的 Trace 與區段下執行。"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def timed(iterable, name: str):
+    """逐項產生 iterable 的內容，並把取得每一項的時間記成一個區段（用於串流的產生器）。"""
+    iterator = iter(iterable)
+    while True:
+        with span(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item